@@ -0,0 +1,75 @@
+"""
+Measures the throughput of multipart (S3 ETag) checksums of a file,
+hashed serially and by concurrent workers:
+
+    python benchmarks/md5sum.py [--size-mb N] [--chunk-mb N] [--workers N]
+
+The file is read once before timing, so that it is in the page cache
+and the benchmark measures hashing rather than disk reads.
+
+workers=1 is the serial read loop that md5sum() used before blocks were
+hashed concurrently, so the speedup is measured against it.
+
+Example output (1 GiB file, 64 MiB blocks, on a single core, where
+the speedup comes from hashing the memory map without copying blocks;
+with more cores, blocks are also hashed in parallel):
+
+    workers=1                       3.005 s     341 MiB/s
+    workers=2                       2.167 s     472 MiB/s
+    workers=4                       2.129 s     481 MiB/s
+    speedup: 1.4x
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Run against the working tree (rather than an installed solvebio)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from solvebio.utils.md5sum import md5sum
+
+
+def run(path, size, chunksize, workers):
+    start = time.perf_counter()
+    checksum = md5sum(path, chunksize, chunksize, workers=workers)
+    elapsed = time.perf_counter() - start
+    print('{:<28} {:8.3f} s  {:6.0f} MiB/s'.format(
+        'workers={0}'.format(workers), elapsed,
+        size / elapsed / 1024 / 1024))
+    return elapsed, checksum
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--chunk-mb', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    chunksize = args.chunk_mb * 1024 * 1024
+    with tempfile.NamedTemporaryFile(suffix='.bin') as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            f.write(block)
+        f.flush()
+
+        # Warm the page cache
+        with open(f.name, 'rb') as warm:
+            while warm.read(chunksize):
+                pass
+
+        baseline, expected = run(f.name, size, chunksize, 1)
+        workers = 2
+        while workers < args.workers:
+            run(f.name, size, chunksize, workers)
+            workers *= 2
+        fast, checksum = run(f.name, size, chunksize, args.workers)
+        assert checksum == expected, (checksum, expected)
+        print('speedup: {:.1f}x'.format(baseline / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures the per-result overhead of iterating through a Query,
+using an in-memory client (no network requests):
+
+    python benchmarks/query_iteration.py [--records N] [--page-size N]
+
+Example output (500,000 results, pages of 1,000):
+
+    iter(query)                     2.486 s      4973 ns/result
+    query.iter_pages()              0.039 s        79 ns/result
+    query.iter_results()            0.027 s        55 ns/result
+    speedup: 90.6x
+"""
+import argparse
+import os
+import sys
+import time
+
+# Run against the working tree (rather than an installed solvebio)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from solvebio import Query
+from solvebio.test.client_mocks import FakeQueryClient
+
+
+def run(name, records, iterate):
+    start = time.perf_counter()
+    n = 0
+    for _ in iterate():
+        n += 1
+    elapsed = time.perf_counter() - start
+    assert n == len(records), (name, n)
+    print('{:<28} {:8.3f} s  {:8.0f} ns/result'.format(
+        name, elapsed, elapsed / n * 1e9))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=500000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    records = [{'i': i} for i in range(args.records)]
+
+    def query():
+        return Query(1, page_size=args.page_size,
+                     client=FakeQueryClient(records))
+
+    def pages():
+        for page in query().iter_pages():
+            for result in page:
+                yield result
+
+    baseline = run('iter(query)', records, lambda: iter(query()))
+    run('query.iter_pages()', records, pages)
+    fast = run('query.iter_results()', records,
+               lambda: query().iter_results())
+    print('speedup: {:.1f}x'.format(baseline / fast))
+
+
+if __name__ == '__main__':
+    main()
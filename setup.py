@@ -19,8 +19,19 @@ recipes_requires = [
     'click==7.1.2',
     'ruamel.yaml==0.16.12'
 ]
+# The asyncio client (AsyncSolveClient) requires aiohttp
+async_requires = [
+    'aiohttp>=3.8'
+]
+# Columnar query results (Query.to_arrow/to_pandas) require pyarrow
+arrow_requires = [
+    'pyarrow>=8.0',
+    'pandas'
+]
 extras_requires = {
-    "recipes": recipes_requires
+    "recipes": recipes_requires,
+    "async": async_requires,
+    "arrow": arrow_requires
 }
 
 with open('README.md') as f:
@@ -137,10 +137,12 @@ def print_deprecation_notice():
     print(f"{message}")
 
 
-from .query import Query, BatchQuery, Filter, GenomicFilter
+from .query import Query, BatchQuery, MultiQuery, Filter, GenomicFilter
+from .cache import QueryCache
+from .regions import RegionSet
 from .global_search import GlobalSearch
 from .annotate import Annotator, Expression
-from .client import client, SolveClient
+from .client import client, SolveClient, AsyncSolveClient
 from .resource import (
     Application,
     Beacon,
@@ -236,6 +238,7 @@ get_api_host()
 __all__ = [
     'Annotator',
     'Application',
+    'AsyncSolveClient',
     'Expression',
     'BatchQuery',
     'Beacon',
@@ -254,9 +257,12 @@ __all__ = [
     'GlobalSearch',
     'Group',
     'Manifest',
+    'MultiQuery',
     'Object',
     'ObjectCopyTask',
     'Query',
+    'QueryCache',
+    'RegionSet',
     'SavedQuery',
     'SolveClient',
     'SolveError',
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
 from .client import client
+from .utils.executor import ordered_map
 
 import logging
+import queue
+import threading
+
 logger = logging.getLogger('solvebio')
 
 
@@ -10,17 +14,24 @@ class Annotator(object):
     """
     Runs the synchronous annotate endpoint against
     batches of results from a query.
+
+    With `workers` > 1, up to `workers` chunks are annotated concurrently
+    (results are still returned in order). With `prefetch` > 0, up to
+    `prefetch` chunks of input records are read ahead in a background
+    thread (e.g. to fetch query pages while chunks are annotated).
     """
     CHUNK_SIZE = 100
 
     # Allows pre-setting a SolveClient
     _client = None
 
-    def __init__(self, fields, **kwargs):
+    def __init__(self, fields, workers=1, prefetch=0, **kwargs):
         self._client = kwargs.pop('client', None) or self._client or client
 
         self.buffer = []
         self.fields = fields
+        self.workers = workers
+        self.prefetch = prefetch
 
         # Pop annotator_params from kwargs
         annotator_param_keys = [
@@ -37,32 +48,106 @@ class Annotator(object):
 
         self.data = kwargs.get('data')
 
-    def annotate(self, records, **kwargs):
+    def annotate(self, records, workers=None, prefetch=None, **kwargs):
         """Annotate a set of records with stored fields.
 
         Args:
             records: A list or iterator (can be a Query object)
             chunk_size: The number of records to annotate at once (max 500).
+            workers: The number of chunks to annotate concurrently.
+            prefetch: The number of chunks of records to read ahead.
 
         Returns:
             A generator that yields one annotated record at a time.
         """
+        workers = self.workers if workers is None else workers
+        prefetch = self.prefetch if prefetch is None else prefetch
+        if workers < 1:
+            raise Exception('\'workers\' parameter must be >= 1')
+        if prefetch < 0:
+            raise Exception('\'prefetch\' parameter must be >= 0')
+
         # Update annotator_params with any kwargs
         self.annotator_params.update(**kwargs)
         chunk_size = self.annotator_params.get('chunk_size', self.CHUNK_SIZE)
 
+        chunks = self._chunks(records, chunk_size)
+        if prefetch:
+            chunks = self._prefetch(chunks, prefetch)
+
+        if workers == 1:
+            for chunk in chunks:
+                for r in self._execute(chunk):
+                    yield r
+            return
+
+        for r in self._execute_concurrently(chunks, workers):
+            yield r
+
+    @staticmethod
+    def _chunks(records, chunk_size):
         chunk = []
         for i, record in enumerate(records):
             chunk.append(record)
             if (i + 1) % chunk_size == 0:
-                for r in self._execute(chunk):
-                    yield r
+                yield chunk
                 chunk = []
 
         if chunk:
-            for r in self._execute(chunk):
+            yield chunk
+
+    @staticmethod
+    def _prefetch(chunks, prefetch):
+        """
+        Reads up to `prefetch` chunks ahead in a background thread.
+        """
+        done = object()
+        chunk_queue = queue.Queue(maxsize=prefetch)
+        stopped = threading.Event()
+
+        def _put(item):
+            # Stop waiting for space once the consumer is gone
+            while not stopped.is_set():
+                try:
+                    chunk_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def _read():
+            try:
+                for chunk in chunks:
+                    if not _put(chunk):
+                        return
+                _put(done)
+            except Exception as e:
+                _put(e)
+
+        thread = threading.Thread(target=_read, name='solvebio-annotate')
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                item = chunk_queue.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+
+    def _execute_concurrently(self, chunks, workers):
+        """
+        Annotates up to `workers` chunks at once, returning results
+        in the order of the chunks (see utils.executor.ordered_map).
+        """
+        results = ordered_map(lambda c: list(self._execute(c)), chunks,
+                              workers, thread_name_prefix='solvebio-annotate')
+        for chunk_results in results:
+            for r in chunk_results:
                 yield r
-            chunk = []
 
     def _execute(self, chunk):
         data = {
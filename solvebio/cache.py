@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger('solvebio')
+
+
+class QueryCache(object):
+    """
+    A persistent (SQLite) cache of query responses, used by Query and
+    QueryFile requests when enabled:
+
+        cache = QueryCache()
+        Query(dataset_id, cache=cache)
+        # or, for all queries made with a client:
+        client.enable_query_cache()
+
+    Responses are keyed by a hash of the API host, the credentials and
+    the canonical (sorted JSON) request parameters, which include the
+    dataset, filters, fields, offset and limit. Entries expire after
+    `ttl` seconds, and the least recently used entries are evicted past
+    `max_entries` or `max_bytes`.
+
+    Dataset query responses are also invalidated when the latest commit
+    of the dataset changes, which is checked at most once every
+    `validate_interval` seconds for each API host and credentials.
+    """
+    DEFAULT_PATH = '~/.solvebio/query_cache.sqlite3'
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path=None, ttl=24 * 3600, max_entries=10000,
+                 max_bytes=512 * 1024 * 1024, validate_interval=60):
+        self.path = os.path.expanduser(path or self.DEFAULT_PATH)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.validate_interval = validate_interval
+        self.hits = 0
+        self.misses = 0
+
+        # The latest known version of each (client key, scope)
+        # (and when it was checked)
+        self._versions = {}
+        self._lock = threading.RLock()
+
+        if self.path != ':memory:':
+            dirname = os.path.dirname(self.path)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, scope TEXT, version TEXT, '
+                'created REAL, accessed REAL, size INTEGER, value BLOB, '
+                'client_key TEXT)')
+            columns = [row[1] for row in self._db.execute(
+                'PRAGMA table_info(responses)')]
+            if 'client_key' not in columns:
+                # Caches created by older versions
+                self._db.execute(
+                    'ALTER TABLE responses ADD COLUMN client_key TEXT')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS responses_accessed '
+                'ON responses (accessed)')
+
+    def __repr__(self):
+        return '<QueryCache {0} ({1} hits, {2} misses)>'.format(
+            self.path, self.hits, self.misses)
+
+    @classmethod
+    def default(cls):
+        """Returns the shared cache stored in DEFAULT_PATH."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @staticmethod
+    def make_key(*parts):
+        """Returns a hash of the canonical JSON of `parts`."""
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'),
+                               default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def credentials_key(client):
+        """
+        Returns a hash of the credentials (token) of `client`, so that
+        cached responses are not shared between users.
+        """
+        auth = getattr(client, '_auth', None)
+        token = getattr(auth, 'token', None)
+        if not token:
+            return None
+        credentials = '{0} {1}'.format(auth.token_type, token)
+        return hashlib.sha256(credentials.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def client_key(cls, client):
+        """
+        Returns a hash of the API host and credentials of `client`,
+        which scopes the versions of cached responses.
+        """
+        return cls.make_key(getattr(client, '_host', None),
+                            cls.credentials_key(client))
+
+    def version(self, scope, get_version, client_key=None):
+        """
+        Returns the current version of `scope` for `client_key`, calling
+        `get_version()` if it was not checked in the last
+        `validate_interval` seconds.
+        """
+        now = time.time()
+        with self._lock:
+            checked = self._versions.get((client_key, scope))
+            if checked and now - checked[1] < self.validate_interval:
+                return checked[0]
+
+        version = get_version()
+        with self._lock:
+            self._versions[(client_key, scope)] = (version, now)
+        return version
+
+    def get(self, key, version=None):
+        """
+        Returns the cached response for `key`, or None if there is no
+        (unexpired) entry for the current `version`.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                'SELECT version, created, value FROM responses WHERE key = ?',
+                (key,)).fetchone()
+
+            if row is None or row[0] != version or \
+                    (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+
+            with self._db:
+                self._db.execute(
+                    'UPDATE responses SET accessed = ? WHERE key = ?',
+                    (now, key))
+            self.hits += 1
+
+        return json.loads(zlib.decompress(row[2]).decode('utf-8'))
+
+    def set(self, key, response, scope=None, version=None, client_key=None):
+        """
+        Caches a response. Any entries of `scope` and `client_key` with
+        a different `version` are removed.
+        """
+        value = zlib.compress(json.dumps(response).encode('utf-8'))
+        now = time.time()
+        with self._lock, self._db:
+            if scope is not None:
+                self._db.execute(
+                    'DELETE FROM responses WHERE scope = ? AND '
+                    'client_key IS ? AND version IS NOT ?',
+                    (scope, client_key, version))
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, scope, version, '
+                'created, accessed, size, value, client_key) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, scope, version, now, now, len(value), value,
+                 client_key))
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl:
+            self._db.execute('DELETE FROM responses WHERE created < ?',
+                             (now - self.ttl,))
+
+        # Remove the least recently used entries
+        count, size = self._db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        evicted = 0
+        if self.max_entries and count > self.max_entries:
+            evicted = count - self.max_entries
+            self._db.execute(
+                'DELETE FROM responses WHERE rowid IN (SELECT rowid '
+                'FROM responses ORDER BY accessed LIMIT ?)', (evicted,))
+            size = self._db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+        if self.max_bytes and size > self.max_bytes:
+            # Only the rows to evict are read from the cursor
+            rowids = []
+            rows = self._db.execute(
+                'SELECT rowid, size FROM responses ORDER BY accessed')
+            for rowid, entry_size in rows:
+                if size <= self.max_bytes:
+                    break
+                rowids.append((rowid,))
+                size -= entry_size
+            rows.close()
+            self._db.executemany('DELETE FROM responses WHERE rowid = ?',
+                                 rowids)
+            evicted += len(rowids)
+
+        if evicted:
+            logger.debug('query cache: evicted %d entries' % evicted)
+
+    def invalidate(self, scope=None, client_key=None):
+        """
+        Removes the cached responses of `scope` (e.g. a dataset's data URL),
+        optionally only those of `client_key` (see client_key()),
+        or all cached responses.
+        """
+        with self._lock, self._db:
+            if scope is None:
+                self._db.execute('DELETE FROM responses')
+                self._versions.clear()
+            elif client_key is None:
+                self._db.execute('DELETE FROM responses WHERE scope = ?',
+                                 (scope,))
+                for version_key in list(self._versions):
+                    if version_key[1] == scope:
+                        del self._versions[version_key]
+            else:
+                self._db.execute(
+                    'DELETE FROM responses WHERE scope = ? AND '
+                    'client_key = ?', (scope, client_key))
+                self._versions.pop((client_key, scope), None)
+
+    clear = invalidate
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SchemaCache(object):
+    """
+    An in-memory cache of dataset and file schemas (i.e. fields),
+    shared by all queries made with a SolveClient (`client.schema_cache`).
+
+    Keys are tuples starting with the kind and ID of the resource,
+    e.g. ('dataset', 123, ...) or ('object', 456, ...). Entries expire
+    after `ttl` seconds, when a DatasetField of the dataset is created,
+    updated or deleted with the client, or can be invalidated explicitly
+    (e.g. after an import changes the fields of a dataset):
+
+        client.schema_cache.invalidate('dataset', 123)
+        client.schema_cache.invalidate()  # everything
+    """
+    DEFAULT_TTL = 300
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<SchemaCache ({0} entries)>'.format(len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the cached value of `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+
+    def get_or_load(self, key, load):
+        """Returns the cached value of `key`, caching `load()` on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, *prefix):
+        """Removes the entries whose keys start with `prefix` (or all)."""
+        # IDs are stored as strings
+        prefix = tuple(str(p) if i == 1 else p for i, p in enumerate(prefix))
+        with self._lock:
+            for key in list(self._entries):
+                if key[:len(prefix)] == prefix:
+                    del self._entries[key]
+
+
+class ChecksumCache(object):
+    """
+    A persistent (SQLite) cache of local file checksums (see md5sum()).
+
+    Entries are keyed by the absolute path, inode, size and modification
+    time (in nanoseconds) of a file, and by the multipart parameters of
+    the checksum, so a file is only hashed again once it changes.
+    Entries of a path are replaced when the file changes, and the least
+    recently used entries are evicted past `max_entries`.
+    """
+    DEFAULT_PATH = '~/.solvebio/checksum_cache.sqlite3'
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path=None, max_entries=100000):
+        self.path = os.path.expanduser(path or self.DEFAULT_PATH)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+        if self.path != ':memory:':
+            dirname = os.path.dirname(self.path)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS checksums ('
+                'path TEXT, inode INTEGER, size INTEGER, mtime_ns INTEGER, '
+                'params TEXT, digest TEXT, block_count INTEGER, '
+                'accessed REAL, PRIMARY KEY (path, params))')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS checksums_accessed '
+                'ON checksums (accessed)')
+
+    def __repr__(self):
+        return '<ChecksumCache {0} ({1} hits, {2} misses)>'.format(
+            self.path, self.hits, self.misses)
+
+    @classmethod
+    def default(cls):
+        """
+        Returns the shared cache stored in DEFAULT_PATH, or None if it
+        cannot be opened (e.g. on a read-only home directory).
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                try:
+                    cls._default = cls()
+                except (OSError, sqlite3.Error) as e:
+                    logger.debug('checksum cache unavailable: %s' % e)
+                    return None
+            return cls._default
+
+    @staticmethod
+    def file_key(path, stat=None):
+        """Returns the (path, inode, size, mtime_ns) key of a file."""
+        stat = stat or os.stat(path)
+        return (os.path.abspath(path), stat.st_ino, stat.st_size,
+                stat.st_mtime_ns)
+
+    def get(self, path, params=None):
+        """
+        Returns the cached (digest, block_count) of a file, or None
+        if the file changed since it was cached.
+        """
+        key = self.file_key(path)
+        params = json.dumps(params)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT inode, size, mtime_ns, digest, block_count '
+                'FROM checksums WHERE path = ? AND params = ?',
+                (key[0], params)).fetchone()
+
+            if row is None or tuple(row[:3]) != key[1:]:
+                self.misses += 1
+                return None
+
+            with self._db:
+                self._db.execute(
+                    'UPDATE checksums SET accessed = ? '
+                    'WHERE path = ? AND params = ?',
+                    (time.time(), key[0], params))
+            self.hits += 1
+
+        return row[3], row[4]
+
+    def set(self, path, checksum, params=None, stat=None):
+        """
+        Caches the (digest, block_count) of a file. `stat` is the
+        os.stat() of the file when it was hashed.
+        """
+        key = self.file_key(path, stat)
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO checksums '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                key + (json.dumps(params),) + tuple(checksum) +
+                (time.time(),))
+            self._evict()
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+
+        count = self._db.execute(
+            'SELECT COUNT(*) FROM checksums').fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                'DELETE FROM checksums WHERE rowid IN (SELECT rowid '
+                'FROM checksums ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,))
+
+    def invalidate(self, path=None):
+        """Removes the cached checksums of `path`, or all of them."""
+        with self._lock, self._db:
+            if path is None:
+                self._db.execute('DELETE FROM checksums')
+            else:
+                self._db.execute('DELETE FROM checksums WHERE path = ?',
+                                 (os.path.abspath(path),))
+
+    clear = invalidate
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM checksums').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -103,6 +103,7 @@ def _upload_folder(
         archive_folder=None,
         follow_shortcuts=False,
         max_retries=3,
+        resumable=False,
 ):
     all_folders = []
     all_files = []
@@ -157,7 +158,8 @@ def _upload_folder(
             if should_exclude(local_file_path, exclude_paths, dry_run=dry_run):
                 continue
             all_files.append((local_file_path, remote_folder_full_path, vault.full_path,
-                              dry_run, archive_folder, client_auth, follow_shortcuts, max_retries))
+                              dry_run, archive_folder, client_auth, follow_shortcuts, max_retries,
+                              resumable))
 
     if num_processes > 1:
         # Only perform optimization if parallelization is requested by the user
@@ -211,12 +213,14 @@ def _create_file_job(args):
         args[5] (client_auth): Tuple containing API host, token, and token type
         args[6] (follow_shortcuts): Boolean to follow shortcuts on the remote_folder_path
         args[7] (max_retries): Maximum number of retries per upload part
+        args[8] (resumable): Whether multipart uploads can be resumed
     Returns:
         None or Exception if exception is raised.
     """
     try:
         (local_file_path, remote_folder_full_path, vault_path, dry_run,
-         archive_folder, client_auth, follow_shortcuts, max_retries) = args
+         archive_folder, client_auth, follow_shortcuts, max_retries,
+         resumable) = args
 
         # Provides the global host, token, token_type
         client = SolveClient(*client_auth)
@@ -251,6 +255,7 @@ def _create_file_job(args):
             follow_shortcuts=follow_shortcuts,
             num_processes=1,  # Default for single file uploads in parallel processing
             max_retries=max_retries,
+            resumable=resumable,
             client=client
         )
         return
@@ -272,7 +277,7 @@ def _object_exists(remote_parent, local_path, _client):
             return False
         else:
             # Check if the md5sum matches
-            local_md5 = md5sum(local_path)[0]
+            local_md5 = md5sum(local_path, cache=True)[0]
             remote_md5 = obj.get("md5")
             if remote_md5 and remote_md5 == local_md5:
                 return True
@@ -490,6 +495,7 @@ def upload(args):
                 archive_folder=args.archive_folder,
                 follow_shortcuts=follow_shortcuts,
                 max_retries=args.max_retries,
+                resumable=args.resumable,
             )
         else:
             if args.dry_run:
@@ -504,6 +510,7 @@ def upload(args):
                     archive_folder=args.archive_folder,
                     num_processes=args.num_processes,
                     max_retries=args.max_retries,
+                    resumable=args.resumable,
                 )
 
 
@@ -808,7 +815,7 @@ def _download_recursive(
         # Skip over files that match remote md5 checksum
         if os.path.exists(local_path):
             remote_md5 = remote_file.get("md5")
-            if remote_md5 and remote_md5 == md5sum(local_path)[0]:
+            if remote_md5 and remote_md5 == md5sum(local_path, cache=True)[0]:
                 print("Skipping {} already in sync".format(local_path))
                 continue
 
@@ -286,6 +286,13 @@ class SolveArgumentParser(argparse.ArgumentParser):
                     "default": 3,
                     "type": int,
                 },
+                {
+                    "flags": "--resumable",
+                    "help": "Records the uploaded parts of multipart uploads "
+                    "in a local journal, so that an interrupted upload is "
+                    "resumed (rather than restarted) when it is run again.",
+                    "action": "store_true",
+                },
                 {
                     "name": "local_path",
                     "help": "The path to the local file or directory " "to upload",
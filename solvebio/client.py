@@ -11,6 +11,7 @@ import solvebio
 from .version import VERSION
 from .errors import SolveError
 from .auth import authenticate, SolveBioTokenAuth
+from .cache import SchemaCache
 
 import platform
 import requests
@@ -39,6 +40,14 @@ try:
 except ImportError:
     pass
 
+# The asyncio client (AsyncSolveClient) requires aiohttp.
+# Requires: pip install solvebio[async]
+try:
+    import asyncio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 # Ensure SSL/TLS support is available
 if not ssl.HAS_TLSv1_2:
     raise RuntimeError("TLS 1.2 support is required but not available.")
@@ -105,19 +114,46 @@ class SolveClient(object):
         if self.retry_all is None:
             self.retry_all = bool(os.environ.get("SOLVEBIO_RETRY_ALL"))
 
+        # Opt-in cache of query responses (see enable_query_cache())
+        self.query_cache = None
+        # Cache of dataset and file fields used by queries
+        self.schema_cache = SchemaCache()
+
         # this class is created before any commands, so it shouldn't raise a missing host exception
         self.set_credentials(host, token, token_type, raise_on_missing=False)
         self.set_user_agent()
 
         # Import all resources into the client
         if include_resources:
-            skip = ('SolveError', 'SolveClient',)
+            skip = ('SolveError', 'SolveClient', 'AsyncSolveClient',
+                    'QueryCache',)
             for name, class_ in inspect.getmembers(solvebio, inspect.isclass):
                 if name in skip:
                     continue
                 subclass = type(name, (class_,), {'_client': self})
                 setattr(self, name, subclass)
 
+    def enable_query_cache(self, cache=None, **kwargs):
+        """
+        Caches the responses of all queries made with this client
+        (unless disabled on a query with `cache=False`).
+
+        Uses `cache` (a QueryCache), or creates a QueryCache with the
+        given keyword arguments (i.e. path, ttl, max_entries, max_bytes
+        and validate_interval).
+
+        Returns: The QueryCache.
+        """
+        from solvebio.cache import QueryCache
+
+        if cache is None:
+            cache = QueryCache(**kwargs) if kwargs else QueryCache.default()
+        self.query_cache = cache
+        return cache
+
+    def disable_query_cache(self):
+        self.query_cache = None
+
     def set_user_agent(self, name=None, version=None):
         ua = 'solvebio-python-client/{} python-requests/{} {}/{}'.format(
             VERSION,
@@ -281,10 +317,17 @@ class SolveClient(object):
 
         if 429 == response.status_code:
             delay = int(response.headers['retry-after']) + 1
-            logger.warn('Too many requests. Retrying in {0}s.'.format(delay))
+            logger.warning('Too many requests. Retrying in {0}s.'.format(delay))
             time.sleep(delay)
-            return self.request(method, url, **kwargs)
+            return self.request(method, url, raw=raw, debug=debug, **kwargs)
 
+        return self._handle_response(response, raw=raw)
+
+    def _handle_response(self, response, raw=False):
+        """
+        Raises a SolveError for error responses, otherwise returns
+        the decoded JSON body (or the response itself if *raw*).
+        """
         if not (200 <= response.status_code < 400):
             _handle_api_error(response)
 
@@ -331,4 +374,256 @@ class SolveClient(object):
         return '<SolveClient {0} {1}>'.format(self._host, self._auth)
 
 
+class AsyncSolveClient(object):
+    """
+    An asyncio-based HTTP client for SolveBio API resources.
+
+    It has the same authentication, retry, rate-limiting (429) and error
+    semantics as SolveClient, but is built on aiohttp so that a single
+    event loop can keep many requests in flight at once::
+
+        async with AsyncSolveClient.from_client(solvebio.client) as aclient:
+            async for record in dataset.query().aiter(client=aclient):
+                ...
+
+    Requires aiohttp (pip install solvebio[async]).
+    """
+    # Retry policy (mirrors the urllib3 Retry used by SolveClient)
+    MAX_RETRIES = 5
+    BACKOFF_FACTOR = 2
+    BACKOFF_MAX = 120
+    RETRY_STATUSES = frozenset([
+        codes.bad_gateway,
+        codes.service_unavailable,
+        codes.gateway_timeout,
+    ])
+    RETRY_METHODS = frozenset(
+        ["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE"])
+
+    # The maximum number of simultaneous connections
+    CONNECTION_LIMIT = 100
+
+    def __init__(
+        self,
+        host=None,
+        token=None,
+        token_type: Literal["Bearer", "Token"] = "Token",
+        retry_all: bool = None,
+        connection_limit=None,
+    ):
+        self._configure(retry_all, connection_limit)
+        self.set_credentials(host, token, token_type, raise_on_missing=False)
+        self.set_user_agent()
+
+    def _configure(self, retry_all, connection_limit):
+        if aiohttp is None:
+            raise ImportError(
+                'AsyncSolveClient requires aiohttp. '
+                'Install it with: pip install solvebio[async]')
+
+        self._host: str = None
+        self._auth: SolveBioTokenAuth = None
+        # The aiohttp session is created lazily, from within the event loop.
+        self._session = None
+        self._connection_limit = connection_limit or self.CONNECTION_LIMIT
+
+        self._headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip,deflate'
+        }
+        if retry_all is None:
+            retry_all = bool(os.environ.get("SOLVEBIO_RETRY_ALL"))
+        self.retry_all = bool(retry_all)
+
+    @classmethod
+    def from_client(cls, client, retry_all=None, connection_limit=None):
+        """
+        Returns a new AsyncSolveClient with the same host, credentials
+        and headers as an existing SolveClient.
+        """
+        aclient = cls.__new__(cls)
+        aclient._configure(
+            client.retry_all if retry_all is None else retry_all,
+            connection_limit)
+        aclient._host = client._host
+        aclient._auth = client._auth
+        aclient._headers = dict(client._headers)
+        return aclient
+
+    def set_credentials(
+        self, host: str, token: str, token_type: Literal["Bearer", "Token"],
+        *, debug: bool = False, raise_on_missing: bool = True
+    ):
+        self._host, self._auth = authenticate(
+            host, token, token_type, debug=debug, raise_on_missing=raise_on_missing
+        )
+
+    # The following are shared with SolveClient
+    set_user_agent = SolveClient.set_user_agent
+    validate_host_is_www_url = SolveClient.validate_host_is_www_url
+    _handle_response = SolveClient._handle_response
+
+    def is_logged_in(self):
+        return bool(self._host and self._auth)
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._connection_limit))
+        return self._session
+
+    async def close(self):
+        """Closes the underlying connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def whoami(self):
+        return await self.get('/v1/user', {})
+
+    async def get(self, url, params, **kwargs):
+        """Issues an asynchronous HTTP GET. See *request()*."""
+        kwargs['params'] = params
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, data, **kwargs):
+        """Issues an asynchronous HTTP POST. See *request()*."""
+        kwargs['data'] = data
+        return await self.request('POST', url, **kwargs)
+
+    async def delete(self, url, data, **kwargs):
+        """Issues an asynchronous HTTP DELETE. See *request()*."""
+        kwargs['data'] = data
+        return await self.request('DELETE', url, **kwargs)
+
+    @staticmethod
+    def _encode_params(params):
+        # Encode query parameters the way requests does
+        # (aiohttp only accepts strings and repeats keys for lists).
+        encoded = []
+        for key, value in (params or {}).items():
+            if value is None:
+                continue
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            encoded.extend((key, str(v)) for v in value)
+        return encoded
+
+    def _backoff(self, n_retries):
+        if n_retries <= 1:
+            return 0
+        return min(self.BACKOFF_MAX,
+                   self.BACKOFF_FACTOR * (2 ** (n_retries - 1)))
+
+    async def request(self, method, url, **kwargs):
+        """
+        Issues an HTTP Request across the wire via aiohttp.
+
+        Accepts the same arguments as *SolveClient.request()*,
+        except that file uploads are not supported.
+
+        Returns
+        -------
+        The JSON-decoded response, or a requests.Response
+        object if *raw* is *True*.
+        """
+        if not self.is_logged_in():
+            raise SolveError("HTTP request: client is not logged in!")
+
+        opts = {
+            'allow_redirects': True,
+            'data': {},
+            'headers': dict(self._headers),
+            'params': {},
+            'timeout': 80,
+        }
+
+        raw = kwargs.pop('raw', False)
+        opts.update(kwargs)
+        method = method.upper()
+
+        if opts.pop('files', None):
+            raise SolveError(
+                "File uploads are not supported by AsyncSolveClient")
+
+        if self._auth and self._auth.token:
+            opts['headers']['Authorization'] = '{0} {1}'.format(
+                self._auth.token_type, self._auth.token)
+
+        if not url.startswith(self._host):
+            url = urljoin(self._host, url)
+
+        logger.debug('API %s Request: %s' % (method, url))
+
+        retry = self.retry_all or method in self.RETRY_METHODS
+        n_retries = 0
+        while True:
+            try:
+                response = await self._send(method, url, **opts)
+            except Exception as e:
+                if retry and n_retries < self.MAX_RETRIES and \
+                        isinstance(e, (aiohttp.ClientConnectionError,
+                                       asyncio.TimeoutError)):
+                    n_retries += 1
+                    await asyncio.sleep(self._backoff(n_retries))
+                    continue
+
+                if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+                    # Report network errors the same way as SolveClient
+                    e = requests.exceptions.ConnectionError(
+                        str(e) or type(e).__name__)
+                _handle_request_error(e)
+
+            if retry and n_retries < self.MAX_RETRIES and \
+                    response.status_code in self.RETRY_STATUSES:
+                n_retries += 1
+                await asyncio.sleep(self._backoff(n_retries))
+                continue
+            break
+
+        if 429 == response.status_code:
+            delay = int(response.headers['retry-after']) + 1
+            logger.warning('Too many requests. Retrying in {0}s.'.format(delay))
+            await asyncio.sleep(delay)
+            return await self.request(method, url, raw=raw, **kwargs)
+
+        return self._handle_response(response, raw=raw)
+
+    async def _send(self, method, url, data, headers, params, timeout,
+                    allow_redirects):
+        """
+        Sends a single request and returns it as a requests.Response,
+        so that responses (and errors) are handled just like SolveClient's.
+        """
+        session = self._get_session()
+        async with session.request(
+                method, url,
+                data=json.dumps(data),
+                headers=headers,
+                params=self._encode_params(params),
+                allow_redirects=allow_redirects,
+                timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            content = await resp.read()
+
+        response = requests.Response()
+        response.status_code = resp.status
+        response.reason = resp.reason
+        response.headers = requests.structures.CaseInsensitiveDict(
+            resp.headers)
+        response.url = str(resp.url)
+        response.encoding = resp.charset
+        response._content = content
+        return response
+
+    def __repr__(self):
+        return '<AsyncSolveClient {0} {1}>'.format(self._host, self._auth)
+
+
 client = SolveClient(include_resources=False)
@@ -42,7 +42,8 @@ class GlobalSearch(Query):
           - `vault_scope` (optional): Can be 'all' or 'access'.
           - `ordering` (optional): List of fields to order the results by.
           - `limit` (optional): Maximum number of query results to return.
-          - `page_size` (optional): Number of results to fetch per query page.
+          - `page_size` (optional): Number of results to fetch per query page,
+             or 'auto' to adjust it to the observed page latency and size.
           - `result_class` (optional): Class of object returned by query.
           - `debug` (optional): Sends debug information to the API.
           - `raw_results` (optional): Whether to use raw API response or to cast logical
@@ -73,7 +74,7 @@ class GlobalSearch(Query):
         # from a query involving 1 or more pagination requests.
         self._limit = limit
         # Page size/offset are the low level API limit and offset params.
-        self._page_size = int(page_size)
+        self._init_page_size(page_size)
         # Page offset can only be set by execute(). It is always set to the
         # current absolute offset contained in the buffer.
         self._page_offset = None
@@ -99,13 +100,15 @@ class GlobalSearch(Query):
                              limit=self._limit,
                              entities=self._entities,
                              ordering=self._ordering,
-                             page_size=self._page_size,
+                             page_size=self._clone_page_size(),
                              result_class=self._result_class,
                              vault_scope=self._vault_scope,
                              entities_match=self._entities_match,
                              debug=self._debug,
                              client=self._client)
         new._filters += self._filters
+        new._counts = self._counts
+        new._page_cache = self._page_cache
 
         if entities:
             new._entities = entities
@@ -166,7 +169,12 @@ class GlobalSearch(Query):
 
         return q
 
-    def execute(self, offset=0, **query):
+    def _cache_version(self, cache):
+        # Search results span vaults and datasets, so cached
+        # responses only expire (see QueryCache.ttl).
+        return None
+
+    def _process_response(self, response, offset, params):
         def _process_result(result):
             # Internally the client uses object_type, not type
             result['object_type'] = result['type']
@@ -175,12 +183,14 @@ class GlobalSearch(Query):
             else:
                 return Object.construct_from(result)
 
-        # Call superclass method execute
-        super(GlobalSearch, self).execute(offset, **query)
+        response = super(GlobalSearch, self)._process_response(
+            response, offset, params)
 
         # Cast logical objects from response to Object/Vault instances
         if not self._raw_results:
-            self._response['results'] = [_process_result(i) for i in self._response['results']]
+            response['results'] = [_process_result(i) for i in response['results']]
+
+        return response
 
     def entity(self, **kwargs):
         """
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Client-side joins between queries.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+
+from .utils.executor import ordered_map
+
+logger = logging.getLogger('solvebio')
+
+
+def get_path(record, key):
+    """Returns the value of a (dotted) `key` in a record."""
+    value = record
+    for part in key.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def join_keys(value):
+    """
+    Returns the keys that a record with the key `value` is indexed by.
+    List values are indexed by each of their items (as in a filter).
+    """
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [v for v in value if v is not None and not isinstance(v, (list, dict))]
+    if isinstance(value, dict):
+        return []
+    return [value]
+
+
+class _Partitions(object):
+    """A set of JSON-lines files in a temporary directory."""
+
+    def __init__(self, n, tmpdir=None):
+        self.dirname = tempfile.mkdtemp(prefix='solvebio-join-', dir=tmpdir)
+        self.n = n
+        self._files = {}
+
+    def index(self, key):
+        return hash(key) % self.n
+
+    def write(self, name, i, item):
+        f = self._files.get((name, i))
+        if f is None:
+            path = os.path.join(self.dirname, '{0}-{1}.jsonl'.format(name, i))
+            f = self._files[(name, i)] = open(path, 'w')
+        f.write(json.dumps(item))
+        f.write('\n')
+
+    def read(self, name, i):
+        f = self._files.pop((name, i), None)
+        if f is None:
+            return
+        f.close()
+
+        with open(f.name) as f:
+            for line in f:
+                yield json.loads(line)
+        os.remove(f.name)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+
+class _Join(object):
+    """Common parameters and merge logic of the client-side joins."""
+
+    def __init__(self, query_a, query_b, key, key_b=None, how='left',
+                 prefix='b_', always_prefix=False):
+        if how not in ('left', 'inner'):
+            raise Exception('\'how\' parameter must be \'left\' or \'inner\'')
+
+        self.query_a = query_a
+        self.query_b = query_b
+        self.key = key
+        self.key_b = key_b or key
+        self.how = how
+        # If prefix is cleared, use a random prefix
+        self.prefix = prefix or str(uuid.uuid4())[:8] + '_'
+        self.always_prefix = always_prefix
+
+    def _names(self):
+        """Returns the (query B name, joined name) pairs of the fields."""
+        joined_fields = self.query_a._join_fields(
+            self.query_b, self.key, self.key_b, self.prefix,
+            self.always_prefix)
+        return [(field.name, name) for field, name in joined_fields]
+
+    def _row(self, record, names):
+        return dict((name, record.get(b_name)) for b_name, name in names)
+
+    def _probe(self, table, names, records):
+        """Joins the records of A with the hash table of B."""
+        empty = dict((name, None) for _, name in names)
+        inner = self.how == 'inner'
+
+        for record in records:
+            value = get_path(record, self.key)
+            try:
+                matches = table.get(value) if value is not None else None
+            except TypeError:
+                # Unhashable keys (i.e. lists or objects) do not match
+                matches = None
+
+            if not matches:
+                if not inner:
+                    joined = dict(record)
+                    joined.update(empty)
+                    yield joined
+                continue
+
+            for row in matches:
+                joined = dict(record)
+                joined.update(row)
+                yield joined
+
+
+class HashJoin(_Join):
+    """
+    A hash join between two queries, performed locally:
+
+        for record in query_a.hash_join(query_b, key='gene'):
+            ...
+
+    Query B is streamed (page by page) into a hash table of the
+    records by `key_b`, which is probed with each page of query A
+    by `key`. Each record of A is returned once for each matching
+    record of B, with the fields of B added (and prefixed as in
+    Query.join()). With `how='left'` (default), records of A without
+    any match are returned once, with the fields of B set to None.
+    With `how='inner'`, they are skipped.
+
+    If the records of B exceed `max_memory` bytes (as JSON), both
+    queries are hash-partitioned into `partitions` files in `tmpdir`,
+    and each partition is joined in turn. In this case, records are
+    returned grouped by partition rather than in the order of query A.
+    """
+    DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+    DEFAULT_PARTITIONS = 16
+
+    def __init__(self, query_a, query_b, key, key_b=None, how='left',
+                 prefix='b_', always_prefix=False,
+                 max_memory=DEFAULT_MAX_MEMORY,
+                 partitions=DEFAULT_PARTITIONS, tmpdir=None):
+        super(HashJoin, self).__init__(
+            query_a, query_b, key, key_b=key_b, how=how, prefix=prefix,
+            always_prefix=always_prefix)
+
+        if partitions < 1:
+            raise Exception('\'partitions\' parameter must be >= 1')
+
+        self.max_memory = max_memory
+        self.partitions = partitions
+        self.tmpdir = tmpdir
+        # Set to True if the records of B were partitioned to disk
+        self.spilled = False
+
+    def __iter__(self):
+        names = self._names()
+
+        spill = None
+        try:
+            table, spill = self._build(names)
+            if spill is None:
+                for record in self._probe(table, names,
+                                          self.query_a.iter_results()):
+                    yield record
+                return
+
+            for record in self._probe_partitions(spill, names):
+                yield record
+        finally:
+            if spill is not None:
+                spill.close()
+
+    def _build(self, names):
+        """
+        Builds the hash table of the records of B. Returns the table,
+        or the partitioned records of B if they did not fit in memory.
+        """
+        table = {}
+        size = 0
+        spill = None
+
+        for page in self.query_b.iter_pages():
+            rows = [(get_path(record, self.key_b), self._row(record, names))
+                    for record in page]
+
+            if spill is None:
+                size += len(json.dumps(rows))
+                if size > self.max_memory:
+                    logger.debug('hash join: partitioning query B to disk')
+                    spill = _Partitions(self.partitions, self.tmpdir)
+                    self.spilled = True
+                    for k, matches in table.items():
+                        for row in matches:
+                            spill.write('b', spill.index(k), [k, row])
+                    table = None
+
+            for value, row in rows:
+                for k in join_keys(value):
+                    if spill is None:
+                        table.setdefault(k, []).append(row)
+                    else:
+                        spill.write('b', spill.index(k), [k, row])
+
+        return table, spill
+
+    def _probe_partitions(self, spill, names):
+        # Partition the records of A by key. Records without a hashable
+        # key do not match anything, and are kept in partition -1.
+        for record in self.query_a.iter_results():
+            value = get_path(record, self.key)
+            try:
+                i = spill.index(value) if value is not None else -1
+            except TypeError:
+                i = -1
+            spill.write('a', i, record)
+
+        for i in range(-1, spill.n):
+            table = {}
+            for k, row in spill.read('b', i):
+                table.setdefault(k, []).append(row)
+            for record in self._probe(table, names, spill.read('a', i)):
+                yield record
+
+
+class IndexJoin(_Join):
+    """
+    A batched index nested loop join between two queries:
+
+        for record in query_a.index_join(query_b, key='gene'):
+            ...
+
+    For each page of query A, the distinct values of `key` are looked
+    up in query B with `key_b__in` filters (of at most `chunk_size`
+    values each), and the matching records are joined locally. This is
+    suited to a small or moderate query A and a large query B, and makes
+    about one request of B per page of A (rather than one sub-query per
+    record, as in Query.join()).
+
+    Lookups run concurrently on `workers` threads, with at most
+    `max_in_flight` lookups pending at once (by default, 2 * workers).
+    Records are returned in the order of query A, with the same fields
+    as HashJoin (and Query.join()). The limit of query B does not apply
+    to the lookups.
+    """
+    DEFAULT_CHUNK_SIZE = 500
+
+    def __init__(self, query_a, query_b, key, key_b=None, how='left',
+                 prefix='b_', always_prefix=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE, workers=4,
+                 max_in_flight=None):
+        super(IndexJoin, self).__init__(
+            query_a, query_b, key, key_b=key_b, how=how, prefix=prefix,
+            always_prefix=always_prefix)
+
+        if chunk_size < 1:
+            raise Exception('\'chunk_size\' parameter must be >= 1')
+
+        if workers < 1:
+            raise Exception('\'workers\' parameter must be >= 1')
+
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_in_flight = max(max_in_flight or 2 * workers, 1)
+
+    def __iter__(self):
+        names = self._names()
+
+        def _lookups():
+            # The lookups of each page, the last of which joins the page
+            for page in self.query_a.iter_pages():
+                chunks = self._chunks(page) or [None]
+                for i, chunk in enumerate(chunks):
+                    yield page, chunk, i == len(chunks) - 1
+
+        def _lookup(lookup):
+            page, chunk, last = lookup
+            table = self._lookup(chunk, names) if chunk else {}
+            return page, table, last
+
+        lookups = ordered_map(_lookup, _lookups(), self.workers,
+                              max_pending=self.max_in_flight,
+                              thread_name_prefix='solvebio-join')
+        table = {}
+        try:
+            for page, chunk_table, last in lookups:
+                table.update(chunk_table)
+                if last:
+                    for record in self._probe(table, names, page):
+                        yield record
+                    table = {}
+        finally:
+            lookups.close()
+
+    def _chunks(self, page):
+        """Returns the distinct (hashable) keys of a page, in chunks."""
+        keys = []
+        seen = set()
+        for record in page:
+            value = get_path(record, self.key)
+            try:
+                if value is None or value in seen:
+                    continue
+            except TypeError:
+                # Unhashable keys (i.e. lists or objects) do not match
+                continue
+            seen.add(value)
+            keys.append(value)
+
+        return [keys[i:i + self.chunk_size]
+                for i in range(0, len(keys), self.chunk_size)]
+
+    def _lookup(self, keys, names):
+        """Returns the hash table of the records of B matching `keys`."""
+        query = self.query_b.filter(**{self.key_b + '__in': keys}) \
+            .limit(float('inf'))
+        # Only retrieve the joined fields
+        query._fields = [b_name for b_name, _ in names]
+        if self.key_b not in query._fields:
+            query._fields.append(self.key_b)
+
+        keys = set(keys)
+        table = {}
+        for record in query.iter_results():
+            row = self._row(record, names)
+            for k in join_keys(get_path(record, self.key_b)):
+                if k in keys:
+                    table.setdefault(k, []).append(row)
+        return table
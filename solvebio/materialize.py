@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Local (SQLite) replicas of datasets (see Dataset.materialize()).
+"""
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .client import client as global_client
+from .query import Filter
+from .utils.filters import CompiledFilter, get_path
+
+logger = logging.getLogger('solvebio')
+
+
+class MaterializedDataset(object):
+    """
+    A local replica of a dataset, stored in a SQLite database:
+
+        q = Dataset.retrieve(dataset_id).materialize('clinvar.db')
+        q.filter(gene='BRCA2')
+        q.refresh()
+
+    Records are stored as JSON by `_id`, along with an index of the
+    values of `index_fields`, which is used to speed up exact and `in`
+    filters on these fields (and on `_id`).
+
+    A manifest records the dataset and its latest commit. refresh()
+    retrieves the records changed by newer "append" and "upsert"
+    commits (by their `_commit` field), and re-scans the whole dataset
+    after other commits or if the number of records does not match.
+    """
+    COMMIT_FIELD = '_commit'
+    # Commit modes that only add or replace records
+    INCREMENTAL_MODES = ('append', 'upsert')
+    # Commit statuses that will not change
+    FINISHED_STATUSES = ('succeeded', 'completed', 'failed', 'canceled')
+    # Number of records retrieved per page
+    PAGE_SIZE = 1000
+    # Number of new commits (since the last refresh) that can be applied
+    COMMITS_LIMIT = 100
+
+    def __init__(self, path, dataset=None, index_fields=None, client=None):
+        """
+        Opens (or creates) the local replica at `path`.
+
+        :Parameters:
+          - `path`: Path of the SQLite database.
+          - `dataset` (optional): Dataset to replicate (required unless
+             the database already exists).
+          - `index_fields` (optional): List of fields to index.
+          - `client` (optional): Client of the dataset (by default,
+             the client of `dataset`).
+        """
+        self._client = client or getattr(dataset, '_client', None) or \
+            global_client
+        self.path = os.path.expanduser(path)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS manifest ('
+                'key TEXT PRIMARY KEY, value TEXT)')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS records ('
+                '_id TEXT PRIMARY KEY, value TEXT)')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS terms ('
+                'field TEXT, value, _id TEXT)')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS terms_value '
+                'ON terms (field, value)')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS terms_id ON terms (_id)')
+
+        manifest = self.manifest
+        if dataset is None:
+            if 'dataset_id' not in manifest:
+                raise Exception('\'dataset\' is required to materialize '
+                                'a new dataset')
+            from .resource import Dataset
+            dataset = Dataset(manifest['dataset_id'], client=self._client)
+        elif manifest.get('dataset_id') not in (None, dataset['id']):
+            raise Exception('{0} is a replica of another dataset ({1})'
+                            .format(self.path, manifest['dataset_id']))
+
+        self.dataset = dataset
+        if index_fields is None:
+            index_fields = manifest.get('index_fields', [])
+        self.index_fields = list(index_fields)
+
+        if 'index_fields' in manifest and \
+                manifest['index_fields'] != self.index_fields:
+            self._reindex()
+
+    def __repr__(self):
+        return '<MaterializedDataset {0} ({1} records)>'.format(
+            self.path, len(self))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM records').fetchone()[0]
+
+    @property
+    def manifest(self):
+        """The dataset, commit and refresh time of the replica."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT key, value FROM manifest').fetchall()
+        return dict((key, json.loads(value)) for key, value in rows)
+
+    def _set_manifest(self, **values):
+        self._db.executemany(
+            'INSERT OR REPLACE INTO manifest VALUES (?, ?)',
+            [(key, json.dumps(value)) for key, value in values.items()])
+
+    def query(self, *filters, **kwargs):
+        """
+        Returns a LocalQuery on the replica. Filters and kwargs are
+        passed to filter(), as for dataset queries.
+        """
+        query = LocalQuery(self)
+        if filters or kwargs:
+            query = query.filter(*filters, **kwargs)
+        return query
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _commits(self):
+        """Returns the latest commits of the dataset (newest first)."""
+        commits = self.dataset.commits(limit=self.COMMITS_LIMIT,
+                                       ordering='-created_at')
+        return list(commits['data'])
+
+    def refresh(self, full=False):
+        """
+        Updates the replica with the commits made since the last refresh.
+        Set `full` to re-scan the whole dataset.
+
+        Returns: The number of records that were retrieved.
+        """
+        commits = self._commits()
+        manifest = self.manifest
+
+        if full or 'dataset_id' not in manifest:
+            return self._rebuild(commits)
+
+        # The replica may have been built before the first commit
+        latest = manifest.get('commit_id')
+        found = latest is None and len(commits) < self.COMMITS_LIMIT
+        new_commits = []
+        for commit in commits:
+            if commit['id'] == latest:
+                found = True
+                break
+            new_commits.append(commit)
+
+        if not found:
+            # The last known commit is too old
+            return self._rebuild(commits)
+
+        # Apply the finished commits, oldest first, up to the first
+        # unfinished one (which will be applied by a later refresh).
+        applied = []
+        for commit in reversed(new_commits):
+            if commit.get('status') not in self.FINISHED_STATUSES:
+                break
+            if commit.get('mode') not in self.INCREMENTAL_MODES:
+                logger.debug('materialize: re-scanning after {0} commit {1}'
+                             .format(commit.get('mode'), commit['id']))
+                return self._rebuild(commits)
+            applied.append(commit)
+
+        if not applied:
+            return 0
+
+        query = self.dataset.query(page_size=self.PAGE_SIZE).filter(
+            **{self.COMMIT_FIELD + '__in': [c['id'] for c in applied]})
+        n = 0
+        with self._lock, self._db:
+            for page in query.iter_pages():
+                self._insert(page)
+                n += len(page)
+
+            self._set_manifest(commit_id=applied[-1]['id'],
+                               refreshed_at=time.time())
+
+        if len(applied) < len(new_commits):
+            # The count includes the records of unfinished commits
+            return n
+
+        # Deleted records can only be detected by their number
+        documents_count = self._documents_count()
+        if documents_count is not None and documents_count != len(self):
+            logger.debug('materialize: re-scanning after a count mismatch')
+            return self._rebuild(commits)
+
+        return n
+
+    def _documents_count(self):
+        self.dataset.refresh()
+        return self.dataset.get('documents_count')
+
+    def _rebuild(self, commits):
+        """Replaces the replica with a full scan of the dataset."""
+        # Record the latest finished commit before the scan, so that
+        # any commit made during the scan is applied by the next refresh.
+        commit_id = None
+        for commit in commits:
+            if commit.get('status') in self.FINISHED_STATUSES:
+                commit_id = commit['id']
+                break
+
+        query = self.dataset.query(keyset='_id', page_size=self.PAGE_SIZE)
+        n = 0
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM records')
+            self._db.execute('DELETE FROM terms')
+            for page in query.iter_pages():
+                self._insert(page, replace=False)
+                n += len(page)
+
+            self._set_manifest(dataset_id=self.dataset['id'],
+                               commit_id=commit_id,
+                               index_fields=self.index_fields,
+                               refreshed_at=time.time())
+
+        return n
+
+    def _reindex(self):
+        """Rebuilds the index of the values of `index_fields`."""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM terms')
+            rows = self._db.execute('SELECT value FROM records').fetchall()
+            records = [json.loads(row[0]) for row in rows]
+            self._insert_terms(records)
+            self._set_manifest(index_fields=self.index_fields)
+
+    def _insert(self, records, replace=True):
+        if replace:
+            ids = [(record['_id'],) for record in records]
+            self._db.executemany('DELETE FROM terms WHERE _id = ?', ids)
+
+        self._db.executemany(
+            'INSERT OR REPLACE INTO records VALUES (?, ?)',
+            [(record['_id'], json.dumps(record)) for record in records])
+
+        self._insert_terms(records)
+
+    def _insert_terms(self, records):
+        terms = []
+        for record in records:
+            for field in self.index_fields:
+                for value in _terms(record, field):
+                    terms.append((field, value, record['_id']))
+        self._db.executemany('INSERT INTO terms VALUES (?, ?, ?)', terms)
+
+    def _select(self, where, args):
+        """Iterates through the records matching a SQL condition."""
+        sql = 'SELECT value FROM records'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY _id'
+
+        cursor = self._db.cursor()
+        with self._lock:
+            cursor.execute(sql, args)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.PAGE_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield json.loads(row[0])
+
+
+def _terms(record, field):
+    value = get_path(record, field)
+    values = value if isinstance(value, list) else [value]
+    return [v for v in values
+            if v is not None and isinstance(v, (str, int, float))]
+
+
+class LocalQuery(object):
+    """
+    A query on a MaterializedDataset, with the same Filter API as Query:
+
+        q = local.query().filter(gene__in=['BRCA1', 'BRCA2'])
+        q = q.filter(GenomicFilter('chr13', 32315474))
+        for record in q:
+            ...
+
+    Filters are evaluated locally (see Filter.compile()). Exact and `in`
+    filters on `_id` and on the indexed fields of the replica are also
+    used to select records from the database. Results are ordered by
+    `_id`.
+    """
+    # Maximum number of SQL arguments (SQLite's default limit is 999).
+    # Larger `in` filters are only evaluated locally.
+    MAX_SQL_ARGS = 900
+
+    def __init__(self, store, filters=None, fields=None, limit=float('inf')):
+        self._store = store
+        self._filters = list(filters or [])
+        self._fields = fields
+        self._limit = limit
+
+    def __repr__(self):
+        return '<LocalQuery {0} {1}>'.format(self._store.path, self._filters)
+
+    def _clone(self, filters=None, limit=None):
+        return LocalQuery(self._store,
+                          filters=self._filters + list(filters or []),
+                          fields=self._fields,
+                          limit=self._limit if limit is None else limit)
+
+    def filter(self, *filters, **kwargs):
+        """
+        Returns a new LocalQuery with the filters combined
+        with the existing filters with AND (see Query.filter()).
+        """
+        f = list(filters)
+        if kwargs:
+            f += [Filter(**kwargs)]
+        return self._clone(filters=f)
+
+    @property
+    def store(self):
+        """The MaterializedDataset of the query."""
+        return self._store
+
+    def limit(self, limit):
+        return self._clone(limit=limit)
+
+    def select(self, *fields):
+        """Returns a new LocalQuery that only returns `fields`."""
+        q = self._clone()
+        q._fields = list(fields)
+        return q
+
+    def refresh(self, **kwargs):
+        """Refreshes the replica (see MaterializedDataset.refresh())."""
+        return self._store.refresh(**kwargs)
+
+    def _compiled(self):
+        if not self._filters:
+            return None
+        return CompiledFilter(self._filters)
+
+    def _where(self, compiled):
+        """
+        Returns the SQL conditions (and arguments) of the exact and `in`
+        filters that all results must match.
+        """
+        where, args = [], []
+        if compiled is None:
+            return where, args
+
+        tree = compiled.tree
+        terms = tree[1] if tree[0] == 'and' else [tree]
+        indexed = set(self._store.index_fields)
+        for node in terms:
+            if node[0] != 'term' or node[2] not in ('exact', 'in'):
+                continue
+
+            _, field, op, value = node
+            values = [value] if op == 'exact' else value
+            if any(v is None or not isinstance(v, (str, int, float))
+                   for v in values):
+                continue
+            if len(args) + len(values) + 1 > self.MAX_SQL_ARGS:
+                continue
+
+            marks = ', '.join('?' * len(values))
+            if field == '_id':
+                where.append('_id IN ({0})'.format(marks))
+            elif field in indexed:
+                where.append(
+                    '_id IN (SELECT _id FROM terms WHERE field = ? '
+                    'AND value IN ({0}))'.format(marks))
+                args.append(field)
+            else:
+                continue
+            args.extend(values)
+
+        return where, args
+
+    def __iter__(self):
+        compiled = self._compiled()
+        where, args = self._where(compiled)
+        records = self._store._select(where, args)
+        if compiled is not None:
+            records = compiled.filter(records)
+        if self._limit < float('inf'):
+            records = itertools.islice(records, int(self._limit))
+        if self._fields is not None:
+            records = (dict((k, r[k]) for k in self._fields if k in r)
+                       for r in records)
+        return iter(records)
+
+    def count(self):
+        """Returns the number of matching records (regardless of limit)."""
+        if not self._filters:
+            return len(self._store)
+        return sum(1 for _ in self.limit(float('inf')))
+
+    def __len__(self):
+        return min(self.count(), self._limit)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(itertools.islice(
+                iter(self), key.start, key.stop, key.step))
+
+        for result in itertools.islice(iter(self), key, None):
+            return result
+        raise IndexError('list index out of range')
+
+    def lookup(self, *sbids):
+        """Returns the records with the given IDs."""
+        return list(self.filter(_id__in=list(sbids)))
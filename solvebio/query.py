@@ -5,13 +5,23 @@ from abc import ABCMeta
 import json
 import uuid
 
-from .client import client
+from .client import client, AsyncSolveClient
+from .cache import QueryCache
 from .utils.printing import pretty_int
 from .utils.tabulate import tabulate
+from .utils.executor import ordered_map
+from .utils.filters import get_path
 from .errors import SolveError
 
 import copy
+import collections
+import heapq
+import itertools
 import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 logger = logging.getLogger('solvebio')
 
 
@@ -82,6 +92,16 @@ class Filter(object):
     def __repr__(self):
         return '<Filter {0}>'.format(self.filters)
 
+    def compile(self):
+        """
+        Returns the filter compiled for local evaluation, as a predicate
+        on records and a vectorized mask of Arrow tables and DataFrames
+        (see solvebio.utils.filters.CompiledFilter).
+        """
+        from .utils.filters import CompiledFilter
+
+        return CompiledFilter(self)
+
     def _combine(self, other, conn='and'):
         """
         OR and AND will create a new Filter, with the filters from both Filter
@@ -219,6 +239,169 @@ class GenomicFilter(Filter):
         return '<GenomicFilter {0}>'.format(self.filters)
 
 
+class AdaptivePageSize(object):
+    """
+    Automatically sizes the pages of a Query/QueryFile/GlobalSearch
+    (i.e. `page_size='auto'`).
+
+    After each full page, the page size is grown or shrunk (by at most
+    a factor of 2) so that a page takes about `target_ms` to fetch,
+    based on the observed wall time (or the API's `took` time). Pages
+    are also kept under `max_bytes` of response data.
+
+    The current size is available as `page_size`, and all observations
+    as `history`.
+    """
+    TARGET_MS = 1000
+    MAX_BYTES = 8 * 1024 * 1024
+    MIN_PAGE_SIZE = 10
+
+    def __init__(self, page_size=None, target_ms=TARGET_MS,
+                 max_bytes=MAX_BYTES, min_page_size=MIN_PAGE_SIZE,
+                 max_page_size=None):
+        self.page_size = page_size
+        self.target_ms = target_ms
+        self.max_bytes = max_bytes
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.history = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<AdaptivePageSize {0} (target: {1} ms)>'.format(
+            self.page_size, self.target_ms)
+
+    def update(self, page_size, n_results, took=None, n_bytes=None,
+               wall_ms=None):
+        """
+        Records the fetch of a page requested with `page_size` results,
+        and returns the new page size.
+        """
+        with self._lock:
+            observation = dict(page_size=page_size, results=n_results,
+                               took=took, bytes=n_bytes, wall_ms=wall_ms)
+            self.history.append(observation)
+
+            latency = wall_ms or took
+            # Partial (last) pages are not representative
+            if not n_results or n_results < page_size or not latency:
+                return self.page_size
+
+            size = page_size * min(max(self.target_ms / latency, 0.5), 2.0)
+            if n_bytes and self.max_bytes:
+                size = min(size, page_size * self.max_bytes / float(n_bytes))
+
+            self.page_size = int(min(max(size, self.min_page_size),
+                                     self.max_page_size))
+            observation['next_page_size'] = self.page_size
+            return self.page_size
+
+
+class PageCache(object):
+    """
+    A least-recently-used cache of page-aligned result pages,
+    shared by a Query/QueryFile and its clones.
+
+    Used by indexing and slicing (e.g. `query[5]` or `query[10:20]`),
+    so that nearby results are served from the same page.
+    """
+
+    def __init__(self, max_pages):
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self._pages = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<PageCache {0}/{1} pages ({2} hits, {3} misses)>'.format(
+            len(self._pages), self.max_pages, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._pages)
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def set(self, key, page):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+class PagePrefetcher(object):
+    """
+    Fetches upcoming pages of a Query/QueryFile on background
+    worker threads while the current page is being consumed.
+
+    At most `depth` pages are in flight (or waiting to be consumed)
+    at any time, which bounds the memory used by prefetching.
+    """
+
+    def __init__(self, query, depth):
+        self._query = query
+        self._depth = depth
+        self._pending = collections.deque()
+        self._executor = ThreadPoolExecutor(
+            max_workers=depth, thread_name_prefix='solvebio-prefetch')
+        # Shut down the workers if the query is garbage-collected
+        # before iteration has finished.
+        self._finalizer = weakref.finalize(
+            query, self._executor.shutdown, wait=False)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def schedule(self, offset, step, end):
+        """
+        Schedules pages of size `step` from `offset` (or after the last
+        pending page) up to the absolute offset `end`.
+        """
+        if self._pending:
+            last_offset, last_step, _ = self._pending[-1]
+            offset = last_offset + last_step
+
+        while len(self._pending) < self._depth and offset < end:
+            future = self._executor.submit(
+                self._query._fetch_page, offset, step)
+            self._pending.append((offset, step, future))
+            offset += step
+
+    def take(self, offset):
+        """
+        Returns the (params, response) tuple of the page at `offset`,
+        or None if that page was not prefetched.
+
+        Any error raised while fetching the page is re-raised here.
+        """
+        while self._pending:
+            pending_offset, _, future = self._pending.popleft()
+            if pending_offset == offset:
+                return future.result()
+            future.cancel()
+
+        return None
+
+    def close(self):
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._finalizer()
+
+
 class QueryBase(object, metaclass=ABCMeta):
     """
     A helper abstract mixin class that contains
@@ -238,6 +421,73 @@ class QueryBase(object, metaclass=ABCMeta):
     # Special case for Query/QueryFile class to pre-set SolveClient
     _client = None
 
+    # The number of pages to fetch ahead in the background while
+    # iterating (0 disables prefetching).
+    _prefetch = 0
+    _prefetcher = None
+
+    # Set when the page size is automatically adjusted (page_size='auto')
+    _page_sizer = None
+
+    # Set on queries created by Query.join()
+    _is_join = False
+
+    # The QueryCache of the query: None (use the client's query_cache),
+    # True (use the default cache), False (disabled) or a QueryCache.
+    _cache = None
+
+    # The default number of pages cached for indexing and slicing.
+    PAGE_CACHE_SIZE = 16
+    _page_cache = None
+    # Set on the clones created by indexing and slicing
+    _use_page_cache = False
+
+    def _init_page_cache(self, page_cache):
+        """
+        Sets the page cache, which can be a number of pages
+        (0 disables it) or a PageCache instance (shared by clones).
+        """
+        if page_cache is None:
+            page_cache = self.PAGE_CACHE_SIZE
+        if not isinstance(page_cache, PageCache):
+            page_cache = PageCache(int(page_cache)) if page_cache else None
+        self._page_cache = page_cache
+
+    @property
+    def page_cache(self):
+        """The PageCache used for indexing and slicing (if enabled)."""
+        return self._page_cache
+
+    def _clone_page_cache(self):
+        # Clones share the page cache (if any)
+        return self._page_cache if self._page_cache is not None else 0
+
+    def _init_page_size(self, page_size):
+        """
+        Sets the page size, which can be a number, 'auto' or
+        an AdaptivePageSize instance (shared by clones).
+        """
+        if page_size == 'auto':
+            page_size = AdaptivePageSize()
+
+        if isinstance(page_size, AdaptivePageSize):
+            self._page_sizer = page_size
+            if page_size.page_size is None:
+                page_size.page_size = self.DEFAULT_PAGE_SIZE
+            if page_size.max_page_size is None:
+                page_size.max_page_size = self.MAX_PAGE_SIZE
+            page_size = page_size.page_size
+
+        self._page_size = int(page_size)
+
+    @property
+    def page_sizer(self):
+        """The AdaptivePageSize of the query (if page_size='auto')."""
+        return self._page_sizer
+
+    def _clone_page_size(self):
+        return self._page_sizer or self._page_size
+
     def limit(self, limit):
         """
         Returns a new Query/QueryFile instance with the new
@@ -252,9 +502,53 @@ class QueryBase(object, metaclass=ABCMeta):
         It is like SQL:
            SELECT COUNT(*) FROM <table> [WHERE condition].
         See also __len__ for a function that is dependent on limit.
+
+        If no page of results has been fetched yet, the count is fetched
+        without any results, and is shared by clones of the query.
         """
-        # self.total will warm up the response if it needs to
-        return self.total
+        response = self._response
+        if response is None:
+            if not self._is_join:
+                return self._count_only()
+            # self.total will warm up the response if it needs to
+            return self.total
+
+        if self._error:
+            raise self._error
+        return response.get('total')
+
+    def _count_params(self):
+        _params = self._build_query()
+        _params.update(offset=0, limit=0)
+        _params.pop('fields', None)
+        _params.pop('exclude_fields', None)
+        return _params
+
+    def _count_only(self):
+        """Returns the count of the query, requesting it if necessary."""
+        _params = self._count_params()
+        key = QueryCache.make_key(self._data_url, _params)
+        if key in self._counts:
+            return self._counts[key]
+
+        logger.debug('executing count query')
+        try:
+            response = self._post_page(_params)
+        except SolveError as e:
+            self._error = e
+            raise
+
+        self._counts[key] = response.get('total')
+        return self._counts[key]
+
+    def _cached_count(self):
+        """Returns the count of the query if it is known, else None."""
+        if self._response is not None:
+            return self._response.get('total')
+        if self._is_join:
+            return None
+        return self._counts.get(
+            QueryCache.make_key(self._data_url, self._count_params()))
 
     def __len__(self):
         """
@@ -268,7 +562,8 @@ class QueryBase(object, metaclass=ABCMeta):
                  SELECT * FROM <table> [WHERE condition] [LIMIT number]
               )
         """
-        return min(self._limit, self.count()) if not self.count() is None else self._limit
+        count = self.count()
+        return self._limit if count is None else min(self._limit, count)
 
     def __nonzero__(self):
         return bool(len(self))
@@ -285,6 +580,10 @@ class QueryBase(object, metaclass=ABCMeta):
         # otherwise, raise the error.
         total_count = 0
         try:
+            if self._cached_count() is None:
+                # The first page of results (which is displayed)
+                # also contains the count.
+                self._buffer
             total_count = len(self)
         except TypeError:
             total_count = float("inf")
@@ -389,6 +688,7 @@ class QueryBase(object, metaclass=ABCMeta):
             q._limit = min(stop - start, self._limit)
             # Setting slice will signal to the iter methods the page_offset.
             q._slice = slice(start, stop)
+            q._use_page_cache = True
             return q
 
         # Not a slice (key is an int)
@@ -404,6 +704,7 @@ class QueryBase(object, metaclass=ABCMeta):
         # Use key as the new page_offset and fetch a new page of results
         q = self._clone()
         q._limit = min(1, self._limit)  # Limit may be 0
+        q._use_page_cache = True
         q.execute(key)
         return q._buffer[0]
 
@@ -416,6 +717,10 @@ class QueryBase(object, metaclass=ABCMeta):
         self._cursor = 0  # Count the number of results returned
         self._buffer_idx = 0  # The current position within the buffer
 
+        # Restart any background page prefetching
+        self._close_prefetcher()
+        self._schedule_prefetch()
+
         return self
 
     def __next__(self):
@@ -445,6 +750,7 @@ class QueryBase(object, metaclass=ABCMeta):
         # len(self) returns `min(limit, total)` results
         try:
             if not _is_join and self._cursor == len(self):
+                self._close_prefetcher()
                 raise StopIteration
         except TypeError:
             # len(self) is unknown so just continue normally
@@ -455,13 +761,15 @@ class QueryBase(object, metaclass=ABCMeta):
                 if self._next_offset >= self._limit:
                     # Since joins can return more results than we expect (due to `explode`)
                     # manually ensure that we haven't gone above the requested limit (default inf)
+                    self._close_prefetcher()
                     raise StopIteration
-                self.execute(self._next_offset)
+                self._execute_next(self._next_offset)
             else:
-                self.execute(self._page_offset + self._buffer_idx)
+                self._execute_next(self._page_offset + self._buffer_idx)
             self._buffer_idx = 0
 
         if not self._buffer:
+            self._close_prefetcher()
             raise StopIteration
 
         self._cursor += 1
@@ -469,6 +777,483 @@ class QueryBase(object, metaclass=ABCMeta):
 
         return self._buffer[self._buffer_idx - 1]
 
+    def iter_pages(self):
+        """
+        Iterates through the result set one page (list of results)
+        at a time, using the same pagination (and prefetching) as next():
+
+            for page in query.iter_pages():
+                ...
+
+        Unlike next(), the pagination bookkeeping is done once per page
+        rather than once per result, so this (and iter_results()) is the
+        fastest way to process large result sets.
+        """
+        _is_join = self._is_join
+        self.__iter__()
+
+        try:
+            while True:
+                page = self._buffer
+                if not page:
+                    break
+
+                # len(self) returns `min(limit, total)` results
+                try:
+                    expected = None if _is_join else len(self)
+                except TypeError:
+                    # len(self) is unknown so just continue normally
+                    expected = None
+
+                results = page
+                if expected is not None:
+                    results = page[:max(expected - self._cursor, 0)]
+
+                self._cursor += len(results)
+                self._buffer_idx = len(page)
+                if results:
+                    yield results
+
+                if _is_join:
+                    if self._next_offset >= self._limit:
+                        break
+                    self._execute_next(self._next_offset)
+                else:
+                    if expected is not None and self._cursor >= expected:
+                        break
+                    self._execute_next(self._page_offset + len(page))
+                self._buffer_idx = 0
+        finally:
+            self._close_prefetcher()
+
+    def iter_batches(self, batch_size=None):
+        """
+        Iterates through the result set in lists of `batch_size` results
+        (the last one may be smaller), regardless of the page size.
+        Without a `batch_size`, each page is returned (see iter_pages()).
+        """
+        if batch_size is None:
+            for page in self.iter_pages():
+                yield page
+            return
+
+        if batch_size < 1:
+            raise Exception('\'batch_size\' parameter must be >= 1')
+
+        batch = []
+        for page in self.iter_pages():
+            if not batch and len(page) == batch_size:
+                yield page
+                continue
+
+            batch.extend(page)
+            start = 0
+            while len(batch) - start >= batch_size:
+                yield batch[start:start + batch_size]
+                start += batch_size
+            batch = batch[start:]
+
+        if batch:
+            yield batch
+
+    def iter_results(self):
+        """
+        Iterates through the result set one result at a time,
+        like iter(query) but with much lower per-result overhead
+        (see iter_pages()).
+        """
+        return itertools.chain.from_iterable(self.iter_pages())
+
+    def _arrow_fields(self):
+        """
+        Returns the (name, data_type, is_list) of the expected
+        result fields, used to type columnar results.
+        """
+        return []
+
+    def iter_record_batches(self):
+        """
+        Iterates through the result set as pyarrow RecordBatches,
+        one per page of results. Requires pyarrow.
+
+        Column types are taken from the dataset fields (see fields()),
+        and inferred from the first page for any other columns, so that
+        all batches have the same schema (see RecordBatchBuilder).
+        """
+        from .utils.columnar import RecordBatchBuilder
+
+        builder = RecordBatchBuilder(self._arrow_fields())
+        for page in self.iter_pages():
+            yield builder.build(page)
+
+    def to_arrow(self):
+        """
+        Returns the result set as a pyarrow Table. Requires pyarrow.
+
+        The table is built page by page (see iter_record_batches()),
+        and columns inferred from each page are promoted to a common type.
+        """
+        from .utils.columnar import RecordBatchBuilder, concat_batches
+
+        builder = RecordBatchBuilder(self._arrow_fields(), fixed_schema=False)
+        batches = [builder.build(page) for page in self.iter_pages()]
+        if not batches:
+            batches = [builder.build([])]
+        return concat_batches(batches)
+
+    def to_pandas(self, **kwargs):
+        """
+        Returns the result set as a pandas DataFrame.
+        Requires pyarrow and pandas.
+
+        Keyword arguments are passed to pyarrow's Table.to_pandas().
+        """
+        from .utils.columnar import require_pandas
+
+        require_pandas()
+        return self.to_arrow().to_pandas(**kwargs)
+
+    def parallel_iter(self, workers=4, ordered=True):
+        """
+        Iterates through the result set by fetching pages concurrently
+        on a pool of `workers` threads.
+
+        The result set is partitioned into disjoint, page-sized offset
+        ranges (using the count() of the query), each of which is fetched
+        by a sliced clone of this query, so limits and slices are respected.
+
+        With `ordered=True` (default), results are returned in the same
+        order as iterating over the query. With `ordered=False`, pages are
+        returned as soon as they are fetched, for maximum throughput.
+
+        See utils.executor.ordered_map() for how pages are buffered.
+        """
+        if workers < 1:
+            raise Exception('\'workers\' parameter must be >= 1')
+
+        count = None
+        if not self._is_join:
+            count = self.count()
+
+        if count is None:
+            # The result set cannot be partitioned without a count
+            # (joins can return more results than the count)
+            for result in self:
+                yield result
+            return
+
+        start = self._slice.start if self._slice else 0
+        total = max(min(self._limit, count - start), 0)
+
+        # Page ranges are relative to the current slice (if any)
+        ranges = ((start, min(start + self._page_size, total))
+                  for start in range(0, total, self._page_size))
+
+        def _fetch(start, stop):
+            # The (shared) adaptive page size may be smaller than the
+            # range, so each range is read to the end of its slice
+            q = self[start:stop]
+            q._use_page_cache = False
+            return list(q.iter_results())
+
+        pages = ordered_map(lambda r: _fetch(*r), ranges, workers,
+                            ordered=ordered,
+                            thread_name_prefix='solvebio-parallel')
+        try:
+            for page in pages:
+                for result in page:
+                    yield result
+        except SolveError as e:
+            self._error = e
+            raise
+        finally:
+            pages.close()
+
+    def _fetch_page(self, offset, page_size=None):
+        """
+        Fetches the page of results at `offset` without modifying
+        the state of the query (used for background prefetching).
+
+        Returns: The request parameters and the processed response.
+        """
+        _params = self._page_params(offset, page_size=page_size)
+        return _params, self._load_page(offset, _params)
+
+    def _load_page(self, offset, _params):
+        """
+        Requests and processes the page of results at `offset`.
+
+        For indexing and slicing, the results are served from the
+        enclosing page-aligned page in the page cache (if enabled).
+        """
+        page_cache = self._page_cache if self._use_page_cache else None
+        page_size = self._page_size
+        page_offset = offset - offset % page_size
+        if page_cache is None or self._is_join or not _params['limit'] or \
+                _params['offset'] != offset or \
+                offset + _params['limit'] > page_offset + page_size:
+            response = self._post_page(_params)
+            return self._process_response(response, offset, _params)
+
+        query = dict((k, v) for k, v in _params.items()
+                     if k not in ('offset', 'limit'))
+        key = QueryCache.make_key(self._data_url, query, page_offset,
+                                  page_size)
+        page = page_cache.get(key)
+        if page is None:
+            logger.debug('caching page. from/limit: %6d/%d' %
+                         (page_offset, page_size))
+            page_params = dict(_params, offset=page_offset, limit=page_size)
+            page = self._process_response(
+                self._post_page(page_params), page_offset, page_params)
+            page_cache.set(key, page)
+
+        start = offset - page_offset
+        response = dict(page)
+        response['results'] = page['results'][start:start + _params['limit']]
+        return response
+
+    def _query_cache(self):
+        cache = self._cache
+        if cache is None:
+            cache = getattr(self._client, 'query_cache', None)
+
+        if cache is True:
+            return QueryCache.default()
+        if cache is False:
+            return None
+        return cache
+
+    def _cache_version(self, cache):
+        """
+        Returns the current version of the queried data, used to
+        invalidate cached responses (None if unknown).
+        """
+        return None
+
+    def _post_page(self, _params):
+        """
+        Requests a page of results, or returns it from the
+        query cache (if enabled).
+        """
+        cache = self._query_cache()
+        if cache is None:
+            return self._request_page(_params)
+
+        key = QueryCache.make_key(
+            getattr(self._client, '_host', None),
+            QueryCache.credentials_key(self._client), self._data_url, _params)
+        client_key = QueryCache.client_key(self._client)
+        try:
+            version = self._cache_version(cache)
+        except SolveError as e:
+            # Without the version, cached responses may be stale
+            logger.debug('query cache bypassed, unknown version: %s' % e)
+            return self._request_page(_params)
+
+        response = cache.get(key, version)
+        if response is None:
+            response = self._request_page(_params)
+            cache.set(key, response, scope=self._data_url, version=version,
+                      client_key=client_key)
+        else:
+            logger.debug('query cache hit. from/limit: %6d/%d' %
+                         (_params['offset'], _params['limit']))
+        return response
+
+    def _request_page(self, _params):
+        """
+        Requests a page of results. With an adaptive page size,
+        the page timing and size are used to adjust the page size.
+        """
+        if self._page_sizer is None or self._is_join:
+            return self._client.post(self._data_url, _params)
+
+        start = time.time()
+        raw_response = self._client.post(self._data_url, _params, raw=True)
+        response = raw_response.json()
+        self._update_page_size(_params, response, len(raw_response.content),
+                               (time.time() - start) * 1000)
+        return response
+
+    async def _apost_page(self, aclient, _params):
+        if self._page_sizer is None or self._is_join:
+            return await aclient.post(self._data_url, _params)
+
+        start = time.time()
+        raw_response = await aclient.post(self._data_url, _params, raw=True)
+        response = raw_response.json()
+        self._update_page_size(_params, response, len(raw_response.content),
+                               (time.time() - start) * 1000)
+        return response
+
+    def _update_page_size(self, _params, response, n_bytes, wall_ms):
+        if not _params['limit']:
+            return
+
+        self._page_size = self._page_sizer.update(
+            _params['limit'], len(response['results']),
+            took=response.get('took'), n_bytes=n_bytes, wall_ms=wall_ms)
+        logger.debug('adaptive page size: %d (%d ms, %d bytes)' %
+                     (self._page_size, wall_ms, n_bytes))
+
+    def _execute_next(self, offset):
+        """
+        Loads the next page of results at `offset` during iteration,
+        using a prefetched page if one is available.
+        """
+        if not self._prefetch:
+            self.execute(offset)
+            return
+
+        try:
+            fetched = self._prefetcher.take(offset) \
+                if self._prefetcher else None
+        except SolveError as e:
+            self._close_prefetcher()
+            self._error = e
+            raise
+        except Exception:
+            self._close_prefetcher()
+            raise
+
+        if fetched is None:
+            self.execute(offset)
+        else:
+            logger.debug('using prefetched page. from/limit: %6d/%d' %
+                         (fetched[0]['offset'], fetched[0]['limit']))
+            self._set_page(offset, fetched[1])
+
+        self._schedule_prefetch()
+
+    def _schedule_prefetch(self):
+        """Schedules background fetches for the pages after the current one."""
+        if not self._prefetch or self._response is None:
+            return
+
+        step = min(self._page_size, self._limit)
+        start = self._slice.start if self._slice else 0
+        end = start + self._limit
+        if self._response.get('total') is not None:
+            end = min(end, self._response['total'])
+
+        # The next page starts where next() will request it
+        if self._is_join:
+            offset = self._next_offset
+        else:
+            offset = self._page_offset + len(self._response['results'])
+
+        if self._prefetcher is None:
+            self._prefetcher = PagePrefetcher(self, self._prefetch)
+        self._prefetcher.schedule(offset, step, end)
+
+    def _close_prefetcher(self):
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+
+    def _process_response(self, response, offset, params):
+        """
+        Processes the raw response of the page request `params` (for the
+        page at `offset`) before it is buffered.
+        Subclasses may override this to transform the results.
+        """
+        return response
+
+    def _set_page(self, offset, response):
+        """Sets the current page (buffer) of results at `offset`."""
+        self._page_offset = offset
+        self._response = response
+
+    async def _aset_page(self, aclient, offset, response):
+        self._set_page(offset, response)
+
+    async def _aexecute(self, aclient, offset=0, **query):
+        """
+        Asynchronous version of execute(), using an AsyncSolveClient.
+
+        Returns: The request parameters and the raw query response.
+        """
+        _params = self._page_params(offset, **query)
+
+        logger.debug('executing async query. from/limit: %6d/%d' %
+                     (_params['offset'], _params['limit']))
+
+        try:
+            response = await self._apost_page(aclient, _params)
+            await self._aset_page(
+                aclient, offset,
+                self._process_response(response, offset, _params))
+        except SolveError as e:
+            self._error = e
+            raise
+
+        return _params, self._response
+
+    async def aiter_pages(self, client=None):
+        """
+        Asynchronously iterates through the result set, yielding
+        each page of results as a list:
+
+            async for page in query.aiter_pages():
+                ...
+
+        Pages are fetched with an AsyncSolveClient. If no `client` is
+        provided, a temporary one is created from the query's SolveClient.
+        Share a single AsyncSolveClient to run many queries concurrently
+        on one event loop.
+        """
+        aclient = client or AsyncSolveClient.from_client(self._client)
+        _is_join = self._is_join
+
+        try:
+            offset = self._slice.start if self._slice else 0
+            returned = 0
+            while True:
+                await self._aexecute(aclient, offset)
+                page = self._response['results']
+                if not page:
+                    break
+
+                # len(self) returns `min(limit, total)` results
+                try:
+                    expected = None if _is_join else len(self)
+                except TypeError:
+                    # len(self) is unknown so just continue normally
+                    expected = None
+
+                results = page
+                if expected is not None:
+                    results = page[:max(expected - returned, 0)]
+
+                if results:
+                    returned += len(results)
+                    yield results
+
+                if _is_join:
+                    if self._next_offset >= self._limit:
+                        break
+                    offset = self._next_offset
+                else:
+                    if expected is not None and returned >= expected:
+                        break
+                    offset = self._page_offset + len(page)
+        finally:
+            if client is None:
+                await aclient.close()
+
+    async def aiter(self, client=None):
+        """
+        Asynchronously iterates through the result set,
+        one result at a time (see aiter_pages()).
+        """
+        async for page in self.aiter_pages(client=client):
+            for result in page:
+                yield result
+
+    def __aiter__(self):
+        return self.aiter()
+
     def filter(self, *filters, **kwargs):
         """
         Returns this Query/QueryFile instance with the query args combined with
@@ -550,6 +1335,11 @@ class Query(QueryBase):
             target_fields=None,
             annotator_params=None,
             debug=False,
+            prefetch=0,
+            keyset=None,
+            after=None,
+            cache=None,
+            page_cache=None,
             **kwargs):
         """
         Creates a new Query object.
@@ -564,11 +1354,25 @@ class Query(QueryBase):
           - `entities` (optional): List of entity tuples to filter on.
           - `ordering` (optional): List of fields to order the results by.
           - `limit` (optional): Maximum number of query results to return.
-          - `page_size` (optional): Number of results to fetch per query page.
+          - `page_size` (optional): Number of results to fetch per query page,
+             or 'auto' to adjust it to the observed page latency and size.
           - `result_class` (optional): Class of object returned by query.
           - `target_fields` (optional): Add target fields to annotate the query results.
           - `annotator_params` (optional): For use with `target_fields` to adjust annotator parameters.
           - `debug` (optional): Sends debug information to the API.
+          - `prefetch` (optional): Number of pages to fetch ahead in the
+             background while iterating (default: 0, disabled).
+          - `keyset` (optional): A unique field (e.g. "_id") to paginate by.
+             Results are ordered by this field ("-<field>" for descending)
+             and each page resumes after the last key of the previous page,
+             instead of using deep offsets.
+          - `after` (optional): For use with `keyset`, only return results
+             after this key (e.g. to resume a scan from `keyset_cursor`).
+          - `cache` (optional): A QueryCache to cache responses in, True to
+             use the default QueryCache, or False to disable the client's
+             query cache (see SolveClient.enable_query_cache()).
+          - `page_cache` (optional): Number of pages to cache for indexing
+             and slicing (default: 16, 0 disables it), or a PageCache.
         """
         self._dataset_id = dataset_id
         self._data_url = '/v2/datasets/{0}/data'.format(dataset_id)
@@ -598,7 +1402,7 @@ class Query(QueryBase):
         # from a query involving 1 or more pagination requests.
         self._limit = limit
         # Page size/offset are the low level API limit and offset params.
-        self._page_size = int(page_size)
+        self._init_page_size(page_size)
         # Page offset can only be set by execute(). It is always set to the
         # current absolute offset contained in the buffer.
         self._page_offset = None
@@ -606,6 +1410,19 @@ class Query(QueryBase):
         # In this case, __iter__() and next() will not
         # reset the page_offset to 0 before iterating.
         self._slice = None
+        # Number of pages to prefetch in the background while iterating.
+        self._prefetch = int(prefetch or 0)
+        # Keyset pagination field, and the key to start after.
+        self._keyset = keyset
+        self._after = after
+        # The latest known (key, offset) pair: the result at `offset` is
+        # the first one after `key`. Offsets are relative to `after`.
+        self._keyset_anchor = (None, 0)
+        # Cache of query responses (see _query_cache())
+        self._cache = cache
+        # Counts of the query (by count parameters), shared by clones
+        self._counts = {}
+        self._init_page_cache(page_cache)
 
         # parameter error checking
         if self._limit < 0:
@@ -615,6 +1432,18 @@ class Query(QueryBase):
             raise Exception('\'page_size\' parameter must be in '
                             'range [1, {}]'.format(self.MAX_PAGE_SIZE))
 
+        if self._prefetch < 0:
+            raise Exception('\'prefetch\' parameter must be >= 0')
+
+        if self._keyset:
+            ordering = [ordering] if isinstance(ordering, str) else ordering
+            if ordering not in (None, [self._keyset]):
+                raise Exception('\'ordering\' must be the same as '
+                                '\'keyset\' for keyset pagination')
+            self._ordering = [self._keyset]
+        elif self._after is not None:
+            raise Exception('\'after\' parameter requires \'keyset\'')
+
         # Set up the SolveClient
         # (kwargs overrides pre-set, which overrides global)
         self._client = kwargs.get('client') or self._client or client
@@ -628,13 +1457,19 @@ class Query(QueryBase):
                              exclude_fields=self._exclude_fields,
                              entities=self._entities,
                              ordering=self._ordering,
-                             page_size=self._page_size,
+                             page_size=self._clone_page_size(),
                              result_class=self._result_class,
                              target_fields=self._target_fields,
                              annotator_params=self._annotator_params,
                              debug=self._debug,
+                             prefetch=self._prefetch,
+                             keyset=self._keyset,
+                             after=self._after,
+                             cache=self._cache,
+                             page_cache=self._clone_page_cache(),
                              client=self._client)
         new._filters += self._filters
+        new._counts = self._counts
 
         if filters:
             new._filters += filters
@@ -644,6 +1479,50 @@ class Query(QueryBase):
 
         return new
 
+    def after(self, key):
+        """
+        Returns a new Query instance that only returns results after
+        `key`, in keyset order. Use it with `keyset_cursor` to resume
+        an interrupted keyset scan.
+        """
+        if not self._keyset:
+            raise Exception('after() requires a \'keyset\' Query')
+
+        new = self._clone()
+        new._after = key
+        return new
+
+    @property
+    def keyset_cursor(self):
+        """
+        The key of the last result returned while iterating through a
+        keyset Query (or `after` if no results were returned yet).
+        Save it to checkpoint a scan, and resume it with after().
+        """
+        if not self._keyset:
+            return None
+
+        buffer_idx = self.__dict__.get('_buffer_idx')
+        if buffer_idx:
+            return self._keyset_value(self._response['results'][buffer_idx - 1])
+        if self.__dict__.get('_cursor'):
+            # The scan reached the end of the results.
+            return self._keyset_anchor[0]
+        return self._after
+
+    def _keyset_field(self):
+        return self._keyset.lstrip('-')
+
+    def _keyset_value(self, record):
+        value = record
+        for key in self._keyset_field().split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        return value
+
+    def _keyset_filter(self, key):
+        op = '__lt' if self._keyset.startswith('-') else '__gt'
+        return Filter(**{self._keyset_field() + op: key})
+
     def range(self, chromosome, start, stop, exact=False):
         """
         Shortcut to do range filters on genomic datasets.
@@ -658,6 +1537,17 @@ class Query(QueryBase):
         return self._clone(
             filters=[GenomicFilter(chromosome, position, exact=exact)])
 
+    def regions(self, regions, **kwargs):
+        """
+        Returns a RegionQuery that runs this query on a set of regions
+        (a RegionSet, or a list of regions), in concurrent batches.
+
+            q.regions(RegionSet.from_bed('exome.bed'), batch_size=200)
+        """
+        from .regions import RegionQuery
+
+        return RegionQuery(self, regions, **kwargs)
+
     def facets(self, *args, **kwargs):
         """
         Returns a dictionary with the requested facets.
@@ -709,8 +1599,12 @@ class Query(QueryBase):
         if self._query:
             q['query'] = self._query
 
-        if self._filters:
-            filters = self._process_filters(self._filters)
+        filters = self._filters
+        if self._keyset and self._after is not None:
+            filters = filters + [self._keyset_filter(self._after)]
+
+        if filters:
+            filters = self._process_filters(filters)
             if len(filters) > 1:
                 q['filters'] = [{'and': filters}]
             else:
@@ -746,19 +1640,12 @@ class Query(QueryBase):
 
         return q
 
-    def execute(self, offset=0, **query):
-        """
-        Executes a query. Additional query parameters can be passed
-        as keyword arguments.
-
-        Returns: The request parameters and the raw query response.
-        """
+    def _page_params(self, offset=0, page_size=None, **query):
+        page_size = page_size or self._page_size
         _params = self._build_query(**query)
-        self._page_offset = offset
-
         _params.update(
-            offset=self._page_offset,
-            limit=min(self._page_size, self._limit)
+            offset=offset,
+            limit=min(page_size, self._limit)
         )
 
         if self._is_join:
@@ -766,29 +1653,107 @@ class Query(QueryBase):
             # is dynamically calculated in internal expression in target_fields in
             # join() method, therefore we have to change limit in the last
             # subsequent request in order to get the given number of records from query_a
-            _params['limit'] = min(self._page_size, abs(self._limit - self._page_offset))
+            _params['limit'] = min(page_size, abs(self._limit - offset))
+
+        if self._keyset:
+            self._keyset_page_params(_params, offset)
+
+        return _params
+
+    def _keyset_page_params(self, _params, offset):
+        """
+        Rewrites a page request to resume after the closest known key,
+        so that the API offset stays small however deep the page is.
+        """
+        key, anchor_offset = self._keyset_anchor
+        if key is not None and offset >= anchor_offset:
+            filters = _params.get('filters', []) + \
+                self._process_filters([self._keyset_filter(key)])
+            _params['filters'] = [{'and': filters}]
+            _params['offset'] = offset - anchor_offset
+
+        # The key is required to resume from the results
+        if self._fields is not None and \
+                self._keyset_field() not in self._fields:
+            _params['fields'] = list(self._fields) + [self._keyset_field()]
+
+    def _process_response(self, response, offset, params):
+        if self._keyset:
+            # The API counts results from the anchor key,
+            # make it relative to `after` again.
+            anchor_offset = offset - params['offset']
+            if response.get('total') is not None:
+                response['total'] += anchor_offset
+
+            results = response['results']
+            end = offset + len(results)
+            if results and not self._is_join and end > self._keyset_anchor[1]:
+                self._keyset_anchor = (self._keyset_value(results[-1]), end)
+
+        return response
+
+    def _set_page(self, offset, response):
+        super(Query, self)._set_page(offset, response)
+        if self._is_join:
             self._next_offset = self._page_offset + min(self._page_size, self._limit)
 
+    def execute(self, offset=0, **query):
+        """
+        Executes a query. Additional query parameters can be passed
+        as keyword arguments.
+
+        Returns: The request parameters and the raw query response.
+        """
+        _params = self._page_params(offset, **query)
+
         logger.debug('executing query. from/limit: %6d/%d' %
                      (_params['offset'], _params['limit']))
 
         # If the request results in a SolveError (ie bad filter) set the error.
         try:
-            self._response = self._client.post(self._data_url, _params)
+            response = self._load_page(offset, _params)
         except SolveError as e:
             self._error = e
             raise
 
+        self._set_page(offset, response)
         logger.debug('query response took: %(took)d ms, total: %(total)d'
                      % self._response)
         return _params, self._response
 
+    def _cache_version(self, cache):
+        from solvebio import Dataset
+
+        def latest_commit():
+            commits = Dataset(self._dataset_id, client=self._client).commits(
+                limit=1, ordering='-created_at')
+            if not commits['data']:
+                return None
+            commit = commits['data'][0]
+            return '{0}:{1}'.format(commit['id'], commit.get('status'))
+
+        return cache.version(self._data_url, latest_commit,
+                             client_key=QueryCache.client_key(self._client))
+
     def fields(self):
         """Returns all expected fields that will be found in the results."""
 
         from solvebio import Dataset
+        from solvebio.resource.solveobject import convert_to_solve_object
+
+        def _fields():
+            dataset = Dataset(self._dataset_id, client=self._client)
+            return [dict(f) for f in dataset.fields()]
 
-        fields = [f for f in Dataset(self._dataset_id, client=self._client).fields()]
+        # All pages of fields are cached by the client (see SchemaCache)
+        schema_cache = getattr(self._client, 'schema_cache', None)
+        if schema_cache is not None:
+            fields = schema_cache.get_or_load(
+                ('dataset', str(self._dataset_id), 'all_fields'), _fields)
+        else:
+            fields = _fields()
+
+        fields = convert_to_solve_object(fields, client=self._client)
         if self._fields:
             fields = [f for f in fields if f.name in self._fields]
         if self._exclude_fields:
@@ -796,6 +1761,10 @@ class Query(QueryBase):
 
         return fields
 
+    def _arrow_fields(self):
+        return [(f.name, f.get('data_type'), f.get('is_list', False))
+                for f in self.fields()]
+
     def export(self, format='json', follow=True, limit=None, **kwargs):
         from solvebio import DatasetExport
 
@@ -920,14 +1889,14 @@ class Query(QueryBase):
         # Initialize _explode_fields attribute if it does not exist
         new_query._explode_fields = getattr(self, '_explode_fields', None) or []
 
-        # Set list of existing field names to avoid overwriting fields
-        # in the join.
-        existing_field_names = [f.name for f in self.fields()]
-        if new_query._target_fields:
-            existing_field_names += [f['name'] for f in new_query._target_fields]
-        else:
+        if not new_query._target_fields:
             new_query._target_fields = []
 
+        # Get list of fields to join from query B (and their names)
+        joined_fields = self._join_fields(
+            query_b, key, key_b, prefix, always_prefix)
+        query_b_fields = [field for field, _ in joined_fields]
+
         # Prepare the filters for the B query expression
         query_params = query_b._build_query()
         base_filter = '["{}", get(record, "{}")]'.format(key_b, key)
@@ -936,14 +1905,6 @@ class Query(QueryBase):
         else:
             filters = '[{}]'.format(base_filter)
 
-        # Try to use a unique field for the sub-query data
-        query_b_fields = query_b.fields()
-
-        # If a joining key in both datasets is the same and
-        # it is not the only one field in a query_b then remove it from query_b
-        if key_b == key and not (len(query_b_fields) == 1 and query_b_fields[0].name == key_b):
-            query_b_fields = [item for item in query_b_fields if not item.name == key_b]
-
         query_b_join_field_name = "join_{}".format(join_id)
         target_fields = [
             {
@@ -970,19 +1931,7 @@ class Query(QueryBase):
             }
         ]
 
-        # Get list of fields to join from query B
-        for field in query_b_fields:
-            # If "always prefix" is enable, or the field name is found
-            # in existing list of names, add the prefix.
-            if always_prefix or field.name in existing_field_names:
-                name = prefix + field.name
-            else:
-                name = field.name
-
-            if name in existing_field_names:
-                raise Exception("Field '{}' found in both queries, "
-                                "please use a different prefix.".format(name))
-
+        for field, name in joined_fields:
             # Add a newly created field to list that will be passed to the explode function
             new_query._explode_fields.append(name)
 
@@ -1020,46 +1969,478 @@ class Query(QueryBase):
         new_query._is_join = True
         return new_query
 
+    def _join_fields(self, query_b, key, key_b, prefix, always_prefix):
+        """
+        Returns the (field, name) pairs of the query B fields to join,
+        where `name` is prefixed if necessary.
+        """
+        # Set list of existing field names to avoid overwriting fields
+        # in the join.
+        existing_field_names = [f.name for f in self.fields()]
+        if self._target_fields:
+            existing_field_names += [f['name'] for f in self._target_fields]
+
+        # Try to use a unique field for the sub-query data
+        query_b_fields = query_b.fields()
+
+        # If a joining key in both datasets is the same and
+        # it is not the only one field in a query_b then remove it from query_b
+        if key_b == key and not (len(query_b_fields) == 1 and query_b_fields[0].name == key_b):
+            query_b_fields = [item for item in query_b_fields if not item.name == key_b]
+
+        joined_fields = []
+        for field in query_b_fields:
+            # If "always prefix" is enable, or the field name is found
+            # in existing list of names, add the prefix.
+            if always_prefix or field.name in existing_field_names:
+                name = prefix + field.name
+            else:
+                name = field.name
+
+            if name in existing_field_names:
+                raise Exception("Field '{}' found in both queries, "
+                                "please use a different prefix.".format(name))
+
+            joined_fields.append((field, name))
+
+        return joined_fields
+
+    def hash_join(self, query_b, key, key_b=None, how='left', prefix='b_',
+                  always_prefix=False, **kwargs):
+        """
+        Joins the current query (query A) with another query (query B)
+        locally, using a hash join (see solvebio.join.HashJoin).
+
+        Unlike join(), query B is streamed once into a hash table (which
+        is partitioned to disk if it exceeds `max_memory`), and query A
+        is probed against it page by page. Returns an iterable of joined
+        records.
+
+        Set `how` to 'left' (default) or 'inner'. Fields are prefixed as
+        in join().
+        """
+        from .join import HashJoin
+
+        return HashJoin(self, query_b, key, key_b=key_b, how=how,
+                        prefix=prefix, always_prefix=always_prefix, **kwargs)
+
+    def index_join(self, query_b, key, key_b=None, how='left', prefix='b_',
+                   always_prefix=False, **kwargs):
+        """
+        Joins the current query (query A) with another query (query B)
+        locally, by looking up the keys of each page of query A in
+        query B with `in` filters (see solvebio.join.IndexJoin).
+
+        Suited to a large query B and a small or moderate query A:
+        makes about one request of query B per page of query A (which run
+        concurrently on `workers` threads), instead of one sub-query per
+        record as in join(). Returns an iterable of joined records, in the
+        order of query A.
+
+        Set `how` to 'left' (default) or 'inner'. Fields are prefixed as
+        in join().
+        """
+        from .join import IndexJoin
+
+        return IndexJoin(self, query_b, key, key_b=key_b, how=how,
+                         prefix=prefix, always_prefix=always_prefix, **kwargs)
+
+    def union(self, *datasets, **kwargs):
+        """
+        Returns a MultiQuery that runs this query on its dataset and on
+        each of `datasets` (IDs or Dataset objects) concurrently.
+
+            q = dataset.query().filter(gene='BRCA2')
+            for record in q.union(dataset_2, dataset_3):
+                ...
+
+        Set `ordered=True` to merge the results by the query's ordering.
+        """
+        queries = [self]
+        for dataset in datasets:
+            if isinstance(dataset, dict):
+                dataset = dataset['id']
+            queries.append(self._for_dataset(dataset))
+
+        return MultiQuery(queries, **kwargs)
+
+    def _for_dataset(self, dataset_id):
+        """Returns a clone of the query on another dataset."""
+        new = self._clone()
+        new._dataset_id = dataset_id
+        new._data_url = '/v2/datasets/{0}/data'.format(dataset_id)
+        return new
+
 
 class BatchQuery(object):
     """
     BatchQuery accepts a list of Query objects and executes them
-    in a single request to /v2/batch_query.
+    in requests to /v2/batch_query.
+
+    Queries are sent in batches of at most `batch_size` queries,
+    which are posted concurrently on a pool of `workers` threads.
+    Use execute() to retrieve the first page of each query, or
+    iter_pages() and results() to retrieve all the results of each
+    query (later pages are retrieved in follow-up batches).
     """
+    # The maximum number of queries per request
+    BATCH_SIZE = 100
+
     # Allows pre-setting a SolveClient
     _client = None
 
-    def __init__(self, queries, **kwargs):
+    def __init__(self, queries, batch_size=BATCH_SIZE, workers=4, **kwargs):
         """
         Expects a list of Query objects.
+
+        :Parameters:
+          - `queries`: List of Query objects (or a single Query).
+          - `batch_size` (optional): Maximum number of queries per request.
+          - `workers` (optional): Number of requests to send concurrently.
         """
         if not isinstance(queries, list):
             queries = [queries]
 
+        if batch_size < 1:
+            raise Exception('\'batch_size\' parameter must be >= 1')
+
+        if workers < 1:
+            raise Exception('\'workers\' parameter must be >= 1')
+
         self._queries = queries
+        self._batch_size = batch_size
+        self._workers = workers
         self._client = kwargs.get('client') or self._client or client
 
+    @staticmethod
+    def _start(query):
+        """Returns the offset of the first result of a query."""
+        if query._slice:
+            return query._slice.start
+        return query._page_offset or 0
+
+    def _query_params(self, query, offset, fetched=0):
+        return query._build_query(
+            dataset=query._dataset_id,
+            offset=offset,
+            limit=min(
+                query._page_size,
+                query._limit - fetched
+            ),
+        )
+
     def _build_query(self):
         query = {'queries': []}
 
         for i in self._queries:
-            _params = i._build_query(
-                dataset=i._dataset_id,
-                offset=i._page_offset or 0,
-                limit=min(
-                    i._page_size,
-                    i._limit
-                ),
-            )
-            query['queries'].append(_params)
+            query['queries'].append(self._query_params(i, self._start(i)))
 
         return query
 
+    def _post(self, queries, **params):
+        """
+        Posts the query parameters in batches, and returns
+        the responses of all the queries (in order).
+        """
+        def _post_batch(batch):
+            _params = {'queries': batch}
+            _params.update(**params)
+            return self._client.post('/v2/batch_query', _params)
+
+        batches = [queries[i:i + self._batch_size]
+                   for i in range(0, len(queries), self._batch_size)]
+        if len(batches) <= 1:
+            return _post_batch(queries)
+
+        workers = min(self._workers, len(batches))
+        with ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='solvebio-batch') as executor:
+            responses = []
+            for response in executor.map(_post_batch, batches):
+                responses.extend(response)
+            return responses
+
     def execute(self, **params):
-        _params = self._build_query()
-        _params.update(**params)
-        response = self._client.post('/v2/batch_query', _params)
-        return response
+        """Returns the response (first page) of each query."""
+        return self._post(self._build_query()['queries'], **params)
+
+    def iter_pages(self, **params):
+        """
+        Iterates through all the pages of all the queries, as
+        (query index, response) tuples.
+
+        The first page of each query is retrieved, then the next page
+        of each query with more results, and so on, in batched requests.
+        A query stops at its limit, or at the first failed response
+        (which is returned, see execute()).
+        """
+        # The index, next offset and number of results of each query
+        pending = [(i, self._start(query), 0)
+                   for i, query in enumerate(self._queries)]
+
+        while pending:
+            responses = self._post(
+                [self._query_params(self._queries[i], offset, fetched)
+                 for i, offset, fetched in pending], **params)
+
+            next_pending = []
+            for (i, offset, fetched), response in zip(pending, responses):
+                yield i, response
+
+                results = response.get('results')
+                if not results:
+                    continue
+
+                query = self._queries[i]
+                offset += len(results)
+                fetched += len(results)
+                total = response.get('total', 0) - self._start(query)
+                if fetched < min(query._limit, total):
+                    next_pending.append((i, offset, fetched))
+
+            pending = next_pending
+
+    def results(self, **params):
+        """
+        Returns the list of all the results of each query,
+        or raises a SolveError if any query fails.
+        """
+        results = [[] for _ in self._queries]
+        for i, response in self.iter_pages(**params):
+            if 'results' not in response:
+                raise SolveError(
+                    'Batch query {0} failed: {1}'.format(i, response))
+            results[i].extend(response['results'])
+
+        return results
+
+
+class MultiQuery(object):
+    """
+    MultiQuery runs a list of queries (typically the same query on
+    several datasets, see Query.union()) concurrently, and iterates
+    through their results as one stream:
+
+        for record in query.union(dataset_2, dataset_3):
+            ...
+
+    Pages of each query are fetched on a pool of `workers` threads
+    (by default, one per query), with at most one page of each query
+    fetched ahead.
+
+    With `ordered=False` (default), pages are returned as soon as they
+    are fetched. With `ordered=True`, results are merged (k-way) by the
+    `ordering` of the queries, which must be the same for all queries.
+    """
+
+    def __init__(self, queries, ordered=False, workers=None):
+        """
+        :Parameters:
+          - `queries`: List of Query objects.
+          - `ordered` (optional): Merge results by the queries' ordering.
+          - `workers` (optional): Number of pages to fetch concurrently.
+        """
+        if not isinstance(queries, list):
+            queries = [queries]
+
+        if not queries:
+            raise Exception('MultiQuery requires at least one query')
+
+        if workers is not None and workers < 1:
+            raise Exception('\'workers\' parameter must be >= 1')
+
+        self._queries = queries
+        self._ordered = ordered
+        self._workers = workers or len(queries)
+
+        if ordered:
+            self._merge_key, self._reverse = self._ordering_key()
+
+    def __repr__(self):
+        return '<MultiQuery ({0} queries)>'.format(len(self._queries))
+
+    @property
+    def queries(self):
+        return self._queries
+
+    def _ordering_key(self):
+        """
+        Returns the sort key (and direction) of the results,
+        based on the ordering of the queries.
+        """
+        orderings = []
+        for query in self._queries:
+            ordering = query._ordering
+            if isinstance(ordering, str):
+                ordering = [ordering]
+            orderings.append(list(ordering or []))
+
+        ordering = orderings[0]
+        if not ordering or any(o != ordering for o in orderings):
+            raise Exception('Ordered MultiQuery requires the same '
+                            '\'ordering\' for all queries')
+
+        reverse = ordering[0].startswith('-')
+        if any(f.startswith('-') != reverse for f in ordering):
+            raise Exception('Ordered MultiQuery requires all '
+                            '\'ordering\' fields in the same direction')
+
+        fields = [f.lstrip('-') for f in ordering]
+        # Results without a value are last in either direction
+        missing = (0,) if reverse else (1,)
+        present = 1 if reverse else 0
+
+        def key(result):
+            values = []
+            for field in fields:
+                value = get_path(result, field)
+                values.append(missing if value is None else (present, value))
+            return values
+
+        return key, reverse
+
+    def __iter__(self):
+        if self._ordered:
+            return self._iter_ordered()
+        return self._iter_unordered()
+
+    def _iter_unordered(self):
+        executor = ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix='solvebio-multi')
+        pages = [query.iter_pages() for query in self._queries]
+        pending = dict((executor.submit(next, p, None), p) for p in pages)
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    p = pending.pop(future)
+                    page = future.result()
+                    if page is None:
+                        continue
+
+                    # Fetch the next page while this one is consumed
+                    pending[executor.submit(next, p, None)] = p
+                    for result in page:
+                        yield result
+        finally:
+            self._close(executor, pending)
+
+    def _iter_ordered(self):
+        executor = ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix='solvebio-multi')
+        pending = {}
+
+        def _fetch(pages):
+            future = executor.submit(next, pages, None)
+            pending[future] = pages
+            return future
+
+        def _results(pages, future):
+            while True:
+                page = future.result()
+                del pending[future]
+                if page is None:
+                    return
+
+                # Fetch the next page while this one is merged
+                future = _fetch(pages)
+                for result in page:
+                    yield result
+
+        # Start fetching the first page of all queries
+        streams = []
+        for query in self._queries:
+            pages = query.iter_pages()
+            streams.append(_results(pages, _fetch(pages)))
+
+        try:
+            for result in heapq.merge(*streams, key=self._merge_key,
+                                      reverse=self._reverse):
+                yield result
+        finally:
+            for stream in streams:
+                stream.close()
+            self._close(executor, pending)
+
+    @staticmethod
+    def _close(executor, pending):
+        for future, pages in list(pending.items()):
+            # Pages that are being fetched are closed once garbage-collected
+            if future.cancel() or future.done():
+                pages.close()
+        executor.shutdown(wait=False)
+
+    def _map(self, fn):
+        """Calls fn(query) concurrently, and returns the results."""
+        with ThreadPoolExecutor(
+                max_workers=self._workers,
+                thread_name_prefix='solvebio-multi') as executor:
+            return list(executor.map(fn, self._queries))
+
+    def count(self):
+        """Returns the total number of results of all the queries."""
+        return sum(self._map(lambda q: q.count()))
+
+    def __len__(self):
+        return sum(self._map(len))
+
+    def facets(self, *args, **kwargs):
+        """
+        Returns the facets (see Query.facets()) of all the queries,
+        combined:
+
+        - Terms and histogram facets are summed by value. Terms are
+          ordered by count, and truncated to the requested `limit`
+          (or to the largest number of terms returned by a query).
+          Since each query returns its own top terms, the counts of
+          terms that are not in every query's top terms are lower bounds.
+        - Stats facets are combined (count, sum, min, max and avg).
+        """
+        facets = dict((a, {}) for a in args)
+        facets.update(kwargs)
+
+        responses = self._map(lambda q: q.facets(*args, **kwargs))
+        return dict(
+            (name, self._merge_facet(
+                [r[name] for r in responses if r and r.get(name) is not None],
+                spec))
+            for name, spec in facets.items())
+
+    @staticmethod
+    def _merge_facet(values, spec):
+        if not values:
+            return None
+
+        if all(isinstance(v, dict) for v in values):
+            # Stats facets
+            merged = {'count': sum(v.get('count') or 0 for v in values)}
+            for op, fn in (('sum', sum), ('min', min), ('max', max)):
+                found = [v[op] for v in values if v.get(op) is not None]
+                merged[op] = fn(found) if found else None
+            merged['avg'] = merged['sum'] / merged['count'] \
+                if merged['count'] and merged['sum'] is not None else None
+            return merged
+
+        if all(isinstance(v, list) for v in values):
+            # Terms (and histogram) facets: [[value, count], ...]
+            counts = collections.OrderedDict()
+            for v in values:
+                for term, count in v:
+                    counts[term] = counts.get(term, 0) + count
+
+            items = [[term, count] for term, count in counts.items()]
+            if spec.get('facet_type', 'terms') == 'terms':
+                items.sort(key=lambda item: -item[1])
+                limit = spec.get('limit', max(len(v) for v in values))
+                if limit:
+                    items = items[:limit]
+            else:
+                items.sort(key=lambda item: item[0])
+            return items
+
+        # Unknown facets are returned for each query
+        return values
 
 
 class QueryFile(QueryBase):
@@ -1080,6 +2461,9 @@ class QueryFile(QueryBase):
             page_size=DEFAULT_PAGE_SIZE,
             output_format='json',
             header=True,
+            prefetch=0,
+            cache=None,
+            page_cache=None,
             **kwargs):
         """
         Creates a new QueryFile object.
@@ -1090,9 +2474,17 @@ class QueryFile(QueryBase):
           - `exclude_fields` (optional): List of specific fields to exclude.
           - `filters` (optional): Filter or List of filter objects.
           - `limit` (optional): Maximum number of query results to return.
-          - `page_size` (optional): Number of results to fetch per query page.
+          - `page_size` (optional): Number of results to fetch per query page,
+             or 'auto' to adjust it to the observed page latency and size.
           - `output_format` (optional): Format of query results (json, csv or tsv)
           - `header` (optional): Returns header in response if output_format is 'csv' or 'tsv'
+          - `prefetch` (optional): Number of pages to fetch ahead in the
+             background while iterating (default: 0, disabled).
+          - `cache` (optional): A QueryCache to cache responses in, True to
+             use the default QueryCache, or False to disable the client's
+             query cache (see SolveClient.enable_query_cache()).
+          - `page_cache` (optional): Number of pages to cache for indexing
+             and slicing (default: 16, 0 disables it), or a PageCache.
         """
         self._file_id = file_id
         self._data_url = '/v2/objects/{0}/data'.format(file_id)
@@ -1101,7 +2493,11 @@ class QueryFile(QueryBase):
         self._exclude_fields = exclude_fields
         self._output_format = output_format
         self._header = header
+        self._cache = cache
         self._error = None
+        # Counts of the query (by count parameters), shared by clones
+        self._counts = {}
+        self._init_page_cache(page_cache)
 
         if filters:
             if isinstance(filters, Filter):
@@ -1117,7 +2513,7 @@ class QueryFile(QueryBase):
         self._limit = limit
         # Page offset can only be set by execute(). It is always set to the
         # current absolute offset contained in the buffer.
-        self._page_size = int(page_size)
+        self._init_page_size(page_size)
         # Page offset can only be set by execute(). It is always set to the
         # current absolute offset contained in the buffer.
         self._page_offset = None
@@ -1125,6 +2521,8 @@ class QueryFile(QueryBase):
         # In this case, __iter__() and next() will not
         # reset the page_offset to 0 before iterating.
         self._slice = None
+        # Number of pages to prefetch in the background while iterating.
+        self._prefetch = int(prefetch or 0)
 
         # parameter error checking
         if self._limit < 0:
@@ -1134,6 +2532,9 @@ class QueryFile(QueryBase):
             raise Exception('\'page_size\' parameter must be in '
                             'range [1, {}]'.format(self.MAX_PAGE_SIZE))
 
+        if self._prefetch < 0:
+            raise Exception('\'prefetch\' parameter must be >= 0')
+
         # Set up the SolveClient
         # (kwargs overrides pre-set, which overrides global)
         self._client = kwargs.get('client') or self._client or client
@@ -1143,12 +2544,16 @@ class QueryFile(QueryBase):
                              limit=self._limit,
                              fields=self._fields,
                              exclude_fields=self._exclude_fields,
-                             page_size=self._page_size,
+                             page_size=self._clone_page_size(),
                              output_format=self._output_format,
                              header=self._header,
+                             prefetch=self._prefetch,
+                             cache=self._cache,
+                             page_cache=self._clone_page_cache(),
                              client=self._client,)
 
         new._filters += self._filters
+        new._counts = self._counts
 
         if filters:
             new._filters += filters
@@ -1180,6 +2585,43 @@ class QueryFile(QueryBase):
 
         return q
 
+    def _page_params(self, offset=0, page_size=None, **query):
+        _params = self._build_query(**query)
+        _params.update(
+            offset=offset,
+            limit=min(page_size or self._page_size, self._limit)
+        )
+        return _params
+
+    def _needs_header(self):
+        return getattr(self, '_header', None) and \
+            self._output_format in ('csv', 'tsv') and \
+            not getattr(self, '_header_fields', None)
+
+    def _set_page(self, offset, response, header_fields=None):
+        super(QueryFile, self)._set_page(offset, response)
+
+        if self._needs_header():
+            self._header_fields = header_fields or self.fields()
+
+            separator_mappings = {'csv': ',', 'tsv': '\t'}
+            sep = separator_mappings[self._output_format]
+
+            self._response['results'].insert(0, sep.join(self._header_fields))
+
+    async def _aset_page(self, aclient, offset, response):
+        header_fields = None
+        if self._needs_header():
+            schema_cache = getattr(self._client, 'schema_cache', None)
+            fields = schema_cache.get(self._schema_key()) \
+                if schema_cache is not None else None
+            if fields is None:
+                fields = (await aclient.get(self._fields_url, {}))['fields']
+                if schema_cache is not None:
+                    schema_cache.set(self._schema_key(), fields)
+            header_fields = self._select_fields(fields)
+        self._set_page(offset, response, header_fields=header_fields)
+
     def execute(self, offset=0, **query):
         """
         Executes a query. Additional query parameters can be passed
@@ -1187,30 +2629,14 @@ class QueryFile(QueryBase):
 
         Returns: The request parameters and the raw query response.
         """
-        _params = self._build_query(**query)
-        self._page_offset = offset
-
-        _params.update(
-            offset=self._page_offset,
-            limit=min(self._page_size, self._limit)
-        )
+        _params = self._page_params(offset, **query)
 
         logger.debug('executing query. from/limit: %6d/%d' %
                      (_params['offset'], _params['limit']))
 
         # If the request results in a SolveError (ie bad filter) set the error.
         try:
-            self._response = self._client.post(self._data_url, _params)
-
-            if getattr(self, '_header', None) and self._output_format in ('csv', 'tsv') \
-                    and not getattr(self, '_header_fields', None):
-                self._header_fields = self.fields()
-
-                separator_mappings = {'csv': ',', 'tsv': '\t'}
-                sep = separator_mappings[self._output_format]
-
-                self._response['results'].insert(0, sep.join(self._header_fields))
-
+            self._set_page(offset, self._load_page(offset, _params))
         except SolveError as e:
             self._error = e
             raise
@@ -1221,8 +2647,29 @@ class QueryFile(QueryBase):
 
     def fields(self):
         """Returns all expected fields that will be found in the results."""
+        def _fields():
+            return self._client.get(self._fields_url, {})['fields']
+
+        # Fields are cached by the client (see SchemaCache)
+        schema_cache = getattr(self._client, 'schema_cache', None)
+        if schema_cache is not None:
+            fields = schema_cache.get_or_load(self._schema_key(), _fields)
+        else:
+            fields = _fields()
+
+        return self._select_fields(fields)
+
+    def _schema_key(self):
+        return ('object', str(self._file_id), 'fields')
+
+    def _arrow_fields(self):
+        if self._output_format != 'json':
+            raise Exception('Columnar results require output_format=\'json\'')
+
+        # File fields are untyped, so column types are inferred
+        return [(name, None, False) for name in self.fields()]
 
-        fields = [f for f in self._client.get(self._fields_url, {})['fields']]
+    def _select_fields(self, fields):
         if self._fields:
             fields = [f for f in fields if f in self._fields]
         if self._exclude_fields:
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Queries on sets of genomic regions (e.g. BED files).
+"""
+import collections
+import gzip
+import itertools
+import json
+import re
+
+from .query import Filter, GenomicFilter
+from .utils.executor import ordered_map
+
+
+def normalize_chromosome(chromosome):
+    """Returns the chromosome name used by genomic datasets (no "chr")."""
+    return str(chromosome).replace('chr', '')
+
+
+def _chromosome_order(chromosome):
+    # Natural order (1, 2, ..., 10, ..., X, Y, MT)
+    if chromosome.isdigit():
+        return (0, int(chromosome), '')
+    return (1, 0, chromosome)
+
+
+def read_bed(path_or_file):
+    """
+    Returns the (chromosome, start, stop) regions of a BED file (which
+    may be gzipped), converted to 1-based, inclusive coordinates.
+    Header ("track", "browser" and "#") lines are skipped.
+    """
+    if hasattr(path_or_file, 'read'):
+        return list(_parse_bed(path_or_file))
+
+    if path_or_file.endswith(('.gz', '.bgz')):
+        f = gzip.open(path_or_file, 'rt')
+    else:
+        f = open(path_or_file)
+
+    with f:
+        return list(_parse_bed(f))
+
+
+def _parse_bed(lines):
+    for n, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line or line.startswith(('#', 'track', 'browser')):
+            continue
+
+        columns = re.split(r'\s+', line)
+        try:
+            chromosome, start, end = columns[0], int(columns[1]), int(columns[2])
+        except (IndexError, ValueError):
+            raise ValueError('Invalid BED line {0}: {1}'.format(n, line))
+
+        # BED intervals are 0-based and half-open
+        yield chromosome, start + 1, max(end, start + 1)
+
+
+def merge_regions(regions):
+    """
+    Sorts and merges overlapping or adjacent (chromosome, start, stop)
+    regions. Returns an OrderedDict of the merged (start, stop) regions
+    of each chromosome, in natural chromosome order.
+    """
+    by_chromosome = collections.defaultdict(list)
+    for chromosome, start, stop in regions:
+        start, stop = int(start), int(stop)
+        if start > stop:
+            raise ValueError(
+                'Invalid region {0}:{1}-{2}'.format(chromosome, start, stop))
+        by_chromosome[normalize_chromosome(chromosome)].append((start, stop))
+
+    merged = collections.OrderedDict()
+    for chromosome in sorted(by_chromosome, key=_chromosome_order):
+        intervals = []
+        for start, stop in sorted(by_chromosome[chromosome]):
+            if intervals and start <= intervals[-1][1] + 1:
+                intervals[-1] = (intervals[-1][0], max(intervals[-1][1], stop))
+            else:
+                intervals.append((start, stop))
+        merged[chromosome] = intervals
+
+    return merged
+
+
+class RegionSet(object):
+    """
+    A set of genomic regions, merged and sorted by position:
+
+        regions = RegionSet.from_bed('panel.bed')
+        regions = RegionSet(['chr1:100-200', ('2', 500, 600)])
+        regions = RegionSet({'1': [(100, 200), (150, 300)]})
+
+    Regions are (chromosome, start, stop) tuples or UCSC-style strings,
+    in 1-based inclusive coordinates, or a dict of (start, stop) regions
+    by chromosome. Overlapping or adjacent regions are merged.
+    """
+
+    def __init__(self, regions):
+        if isinstance(regions, dict):
+            regions = [(chromosome, start, stop)
+                       for chromosome, intervals in regions.items()
+                       for start, stop in intervals]
+
+        parsed = []
+        for region in regions:
+            if isinstance(region, str):
+                region = self._parse_string(region)
+            parsed.append(region)
+
+        self._regions = merge_regions(parsed)
+
+    @classmethod
+    def from_bed(cls, path_or_file):
+        """Returns the RegionSet of a BED file (path or file object)."""
+        return cls(read_bed(path_or_file))
+
+    @staticmethod
+    def _parse_string(string):
+        try:
+            chromosome, pos = string.split(':')
+        except ValueError:
+            raise ValueError('Please use UCSC-style format: "chr2:1000-2000"')
+
+        pos = pos.replace(',', '')
+        start, _, stop = pos.partition('-')
+        return chromosome, int(start), int(stop or start)
+
+    def __repr__(self):
+        return '<RegionSet ({0} regions)>'.format(len(self))
+
+    def __len__(self):
+        return sum(len(intervals) for intervals in self._regions.values())
+
+    def __iter__(self):
+        for chromosome, intervals in self._regions.items():
+            for start, stop in intervals:
+                yield chromosome, start, stop
+
+    @property
+    def chromosomes(self):
+        return list(self._regions)
+
+    def batches(self, batch_size):
+        """Returns the regions in lists of at most `batch_size` regions."""
+        if batch_size < 1:
+            raise Exception('\'batch_size\' parameter must be >= 1')
+
+        regions = list(self)
+        return [regions[i:i + batch_size]
+                for i in range(0, len(regions), batch_size)]
+
+    def filters(self, batch_size):
+        """
+        Returns a Filter for each batch of at most `batch_size` regions,
+        which matches the records overlapping any region of the batch.
+        """
+        filters = []
+        for batch in self.batches(batch_size):
+            f = Filter()
+            for chromosome, start, stop in batch:
+                f = f | GenomicFilter(chromosome, start, stop)
+            filters.append(f)
+        return filters
+
+
+class RegionQuery(object):
+    """
+    Runs a query on a RegionSet (see Query.regions()).
+
+    The regions are packed into batches of at most `batch_size` regions,
+    each queried with an OR filter, and batches run concurrently on a
+    pool of `workers` threads. Records are returned in the order of the
+    batches (i.e. by chromosome and position of the regions), and records
+    that overlap regions of several batches are only returned once (by
+    `_id`). Batches are streamed page by page, and only the IDs of the
+    previous batch are kept to remove duplicates.
+    """
+    DEFAULT_BATCH_SIZE = 100
+
+    def __init__(self, query, regions, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=4):
+        if workers < 1:
+            raise Exception('\'workers\' parameter must be >= 1')
+
+        if not isinstance(regions, RegionSet):
+            regions = RegionSet(regions)
+
+        self._query = query
+        self._regions = regions
+        self._filters = regions.filters(batch_size)
+        self._workers = workers
+
+    def __repr__(self):
+        return '<RegionQuery ({0} regions in {1} batches)>'.format(
+            len(self._regions), len(self._filters))
+
+    @property
+    def regions(self):
+        return self._regions
+
+    @property
+    def queries(self):
+        """The query of each batch of regions."""
+        return [self._batch_query(f) for f in self._filters]
+
+    def _strip_id(self):
+        """Whether `_id` is only retrieved to remove duplicates."""
+        return (self._query._fields is not None and
+                '_id' not in self._query._fields) or \
+            '_id' in (self._query._exclude_fields or [])
+
+    def _batch_query(self, f):
+        query = self._query.filter(f)
+        # Records are deduplicated by _id, which is always retrieved
+        if query._fields is not None and '_id' not in query._fields:
+            query._fields = list(query._fields) + ['_id']
+        if query._exclude_fields:
+            query._exclude_fields = [
+                name for name in query._exclude_fields if name != '_id']
+        return query
+
+    def __iter__(self):
+        def _fetch(query):
+            # Only the first page of a batch is fetched ahead, and the
+            # rest of the batch is streamed as it is consumed
+            pages = query.iter_pages()
+            return itertools.chain([next(pages, [])], pages)
+
+        strip_id = self._strip_id()
+        queries = (self._batch_query(f) for f in self._filters)
+        batches = ordered_map(_fetch, queries, self._workers,
+                              thread_name_prefix='solvebio-regions')
+        # Regions are sorted, so records that overlap several batches
+        # are in consecutive batches
+        previous = set()
+        try:
+            for pages in batches:
+                current = set()
+                for page in pages:
+                    for record in page:
+                        key = self._key(record)
+                        if key in current:
+                            continue
+                        current.add(key)
+                        if key in previous:
+                            continue
+                        if strip_id:
+                            record.pop('_id', None)
+                        yield record
+                previous = current
+        finally:
+            batches.close()
+
+    @staticmethod
+    def _key(record):
+        key = record.get('_id')
+        if key is None:
+            # Records without an _id are compared by value
+            key = json.dumps(record, sort_keys=True)
+        return key
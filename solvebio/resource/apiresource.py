@@ -3,9 +3,7 @@
 from urllib.parse import unquote
 
 import os
-import requests
 import tempfile
-import shutil
 
 try:
     from urllib import quote_plus
@@ -13,8 +11,11 @@ except ImportError:
     from urllib.parse import quote_plus
 
 from ..client import client, _handle_api_error, _handle_request_error
+from ..transport import StorageTransport
 from ..utils.tabulate import tabulate
 from ..utils.printing import pager
+from ..utils.md5sum import MD5Hasher
+from ..utils.md5sum import MULTIPART_THRESHOLD
 # from solvebio.errors import NotFoundError
 from ..errors import NotFoundError
 
@@ -187,8 +188,15 @@ class DownloadableAPIResource(APIResource):
         Download the file to the specified directory or file path.
         Downloads to a temporary directory if no path is specified.
 
+        The checksums of the file are stored in `checksum_cache` (a
+        ChecksumCache, True for the default one, or False). The file is
+        downloaded with `transport` (the shared StorageTransport by default).
+
         Returns the absolute path to the file.
         """
+        checksum_cache = kwargs.pop('checksum_cache', True)
+        transport = kwargs.pop('transport', None) or \
+            StorageTransport.default()
         download_url = self.download_url(**kwargs)
         try:
             # For vault objects, use the object's filename
@@ -212,22 +220,31 @@ class DownloadableAPIResource(APIResource):
 
         try:
             # use streaming to prevent automatic decompression
-            response = requests.request(method='get', url=download_url, stream=True)
+            response = transport.get(download_url, stream=True)
         except Exception as e:
             _handle_request_error(e)
 
         if not (200 <= response.status_code < 400):
             _handle_api_error(response)
 
-        with open(path, 'wb') as fileobj:
+        # Hash the file as it is written, so that it does
+        # not need to be read again to compare checksums.
+        size = response.headers.get('Content-Length')
+        hasher = MD5Hasher(multipart=size is None or
+                           int(size) > MULTIPART_THRESHOLD)
+        with response, open(path, 'wb') as fileobj:
             if filename.endswith('.gz'):
                 # Don't automatically decompress gzipped files
-                shutil.copyfileobj(response.raw, fileobj)
+                chunks = iter(lambda: response.raw.read(64 * 1024), b'')
             else:
-                for chunk in response.iter_content(chunk_size=1024 * 8):
-                    if chunk:
-                        fileobj.write(chunk)
+                chunks = response.iter_content(chunk_size=1024 * 8)
+
+            for chunk in chunks:
+                if chunk:
+                    fileobj.write(chunk)
+                    hasher.update(chunk)
 
+        hasher.cache(path, cache=checksum_cache)
         return path
 
     def download_url(self, **kwargs):
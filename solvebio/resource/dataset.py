@@ -1,8 +1,10 @@
+import itertools
 import os
 import time
 
 from ..client import client
 from ..query import Query
+from ..utils.executor import ordered_map
 
 from .solveobject import convert_to_solve_object
 from .apiresource import CreateableAPIResource
@@ -169,9 +171,98 @@ class Dataset(CreateableAPIResource,
         self._data_url()  # raises an exception if there's no ID
         return Query(self['id'], query=query, client=self._client, **params)
 
+    def materialize(self, path, index_fields=None, refresh=True):
+        """
+        Replicates the dataset into a local SQLite database at `path`
+        (or updates an existing replica with the latest commits), and
+        returns a LocalQuery on the replica, which supports the same
+        Filter API as queries without making any API calls.
+
+        `index_fields` are indexed to speed up exact and `in` filters.
+        See solvebio.materialize.MaterializedDataset.
+        """
+        from ..materialize import MaterializedDataset
+
+        self._data_url()  # raises an exception if there's no ID
+        store = MaterializedDataset(path, dataset=self,
+                                    index_fields=index_fields)
+        if refresh:
+            store.refresh()
+        return store.query()
+
+    # The maximum length of lookup URLs (above which IDs are chunked)
+    LOOKUP_MAX_URL_LENGTH = 2000
+
     def lookup(self, *sbids):
-        lookup_url = self._data_url() + '/' + ','.join(sbids)
-        return self._client.get(lookup_url, {})['results']
+        """
+        Returns the records with the given SolveBio IDs. Long lists of
+        IDs are split into multiple requests (see iter_lookup).
+        """
+        return list(self.iter_lookup(sbids))
+
+    def bulk_lookup(self, sbids, workers=4,
+                    max_url_length=LOOKUP_MAX_URL_LENGTH):
+        """
+        Returns the records with the given (list of) SolveBio IDs,
+        fetched concurrently in chunks. See iter_lookup.
+        """
+        return list(self.iter_lookup(sbids, workers=workers,
+                                     max_url_length=max_url_length))
+
+    def iter_lookup(self, sbids, workers=4,
+                    max_url_length=LOOKUP_MAX_URL_LENGTH):
+        """
+        Iterates through the records with the given SolveBio IDs
+        (any iterable, which is consumed lazily).
+
+        IDs are split into chunks whose lookup URLs (including the API
+        host) are at most `max_url_length` characters long, and chunks
+        are fetched concurrently on a pool of `workers` threads (see
+        ordered_map). A single chunk is fetched without a thread pool.
+        Records are returned in the order of the IDs.
+        """
+        if workers < 1:
+            raise Exception('\'workers\' parameter must be >= 1')
+
+        data_url = self._data_url()
+        host = getattr(self._client, '_host', None) or ''
+        chunks = self._lookup_chunks(host + data_url, sbids, max_url_length)
+
+        def _fetch(chunk):
+            lookup_url = data_url + '/' + ','.join(chunk)
+            return self._client.get(lookup_url, {})['results']
+
+        first = list(itertools.islice(chunks, 2))
+        if len(first) < 2:
+            all_results = [_fetch(chunk) for chunk in first]
+        else:
+            all_results = ordered_map(_fetch, itertools.chain(first, chunks),
+                                      workers,
+                                      thread_name_prefix='solvebio-lookup')
+
+        for results in all_results:
+            for result in results:
+                yield result
+
+    @staticmethod
+    def _lookup_chunks(url, sbids, max_url_length):
+        """Splits IDs into chunks that fit in a lookup URL."""
+        chunk = []
+        length = len(url) + 1
+        for sbid in sbids:
+            sbid = str(sbid)
+            # IDs are separated by commas
+            size = len(sbid) + (1 if chunk else 0)
+            if chunk and length + size > max_url_length:
+                yield chunk
+                chunk = []
+                length = len(url) + 1
+                size = len(sbid)
+            chunk.append(sbid)
+            length += size
+
+        if chunk:
+            yield chunk
 
     def _beacon_url(self):
         if 'beacon_url' not in self:
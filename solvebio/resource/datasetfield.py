@@ -17,6 +17,34 @@ class DatasetField(CreateableAPIResource,
     """
     RESOURCE_VERSION = 2
 
+    @classmethod
+    def create(cls, **params):
+        field = super(DatasetField, cls).create(**params)
+        field._invalidate_schema()
+        return field
+
+    def save(self):
+        super(DatasetField, self).save()
+        self._invalidate_schema()
+        return self
+
+    def delete(self, **params):
+        response = super(DatasetField, self).delete(**params)
+        self._invalidate_schema()
+        return response
+
+    def _invalidate_schema(self):
+        # Queries cache the fields of their dataset (see SchemaCache)
+        schema_cache = getattr(self._client, 'schema_cache', None)
+        if schema_cache is None:
+            return
+
+        dataset_id = self.get('dataset_id')
+        if dataset_id is None:
+            schema_cache.invalidate('dataset')
+        else:
+            schema_cache.invalidate('dataset', dataset_id)
+
     def facets(self, **params):
         response = self._client.get(self.facets_url, params)
         return convert_to_solve_object(response, client=self._client)
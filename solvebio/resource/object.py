@@ -3,21 +3,24 @@ import os
 import re
 import base64
 import binascii
+import hashlib
+import json
 import mimetypes
 import sys
+import threading
 import time
 from datetime import datetime
 
-import requests
-from urllib3.util.retry import Retry
-
 from solvebio.errors import SolveError
 from solvebio.errors import NotFoundError
 from solvebio.errors import FileUploadError
 from solvebio.utils.md5sum import md5sum
+from solvebio.utils.md5sum import HashingReader
 from solvebio.utils.files import separate_filename_extension
+from solvebio.utils.files import FileSlice
 
 from ..client import client
+from ..transport import StorageTransport
 
 from .solveobject import convert_to_solve_object
 
@@ -97,6 +100,136 @@ class UploadProgressTracker:
             self.progress_line_active = False
 
 
+class UploadJournal(object):
+    """
+    An on-disk journal of a resumable multipart upload (JSON lines): a
+    header with the upload ID and key, the object and its full path, the
+    local file (path, size, mtime and MD5) and the parts, then one line per completed part
+    with its ETag. Lines are appended (and flushed) as parts complete,
+    so the journal survives the process being killed, and a truncated
+    last line is ignored.
+
+    Journals are stored in DEFAULT_DIR (by hash of the local path and
+    the full path of the upload) unless a `journal_path` is given, and
+    removed once the upload is completed.
+    """
+    DEFAULT_DIR = '~/.solvebio/uploads'
+
+    def __init__(self, path, header, completed=None):
+        self.path = path
+        self.header = header
+        # ETags of the completed parts, by part number
+        self.completed = completed or {}
+        # Whether the local file changed since the journal was created
+        self.stale = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default_path(cls, local_path, full_path=None):
+        key = os.path.abspath(local_path)
+        if full_path:
+            key += '\n' + full_path
+        key = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(os.path.expanduser(cls.DEFAULT_DIR),
+                            key + '.jsonl')
+
+    @staticmethod
+    def _file_info(local_path):
+        stat = os.stat(local_path)
+        return {
+            'local_path': os.path.abspath(local_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        }
+
+    @classmethod
+    def create(cls, path, local_path, local_md5, obj, parts, full_path=None):
+        """
+        Starts the journal of an upload (to `full_path`). `parts` are the
+        (part_number, start_byte, size) of all the parts of the upload.
+        """
+        header = dict(cls._file_info(local_path),
+                      md5=local_md5,
+                      full_path=full_path,
+                      object_id=obj.id,
+                      upload_id=obj.upload_id,
+                      upload_key=obj.upload_key,
+                      parts=[list(p) for p in parts])
+
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(path, 'w') as f:
+            f.write(json.dumps(header) + '\n')
+
+        return cls(path, header)
+
+    @classmethod
+    def load(cls, path, local_path, local_md5, full_path=None):
+        """
+        Returns the journal of an unfinished upload of `local_path`
+        (to `full_path`), or None if there is none. The journal is stale
+        if the file has changed since.
+        """
+        try:
+            with open(path) as f:
+                lines = f.read().splitlines()
+        except (IOError, OSError):
+            return None
+
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            return None
+
+        if full_path is not None and header.get('full_path') != full_path:
+            # The file is being uploaded somewhere else
+            return None
+
+        completed = {}
+        for line in lines[1:]:
+            try:
+                part = json.loads(line)
+            except ValueError:
+                # Interrupted while writing the line
+                continue
+            completed[part['part_number']] = part['etag']
+
+        journal = cls(path, header, completed)
+        expected = dict(cls._file_info(local_path), md5=local_md5)
+        if any(header.get(k) != v for k, v in expected.items()):
+            journal.stale = True
+        return journal
+
+    @property
+    def parts(self):
+        return [tuple(p) for p in self.header['parts']]
+
+    @property
+    def missing_parts(self):
+        return [p for p in self.parts if p[0] not in self.completed]
+
+    def record(self, part_number, etag):
+        """Records a completed part."""
+        with self._lock:
+            self.completed[part_number] = etag
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(
+                    {'part_number': part_number, 'etag': etag}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def completed_parts(self):
+        return [{'part_number': n, 'etag': etag}
+                for n, etag in sorted(self.completed.items())]
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
 if sys.version_info >= (3, 9, 0):
     from collections.abc import Iterable
 else:
@@ -502,7 +635,8 @@ class Object(CreateableAPIResource,
         # Get vault
         vault = Vault.get_by_full_path(vault_full_path, client=_client)
 
-        local_md5, _ = md5sum(local_path, None)
+        local_md5, _ = md5sum(local_path, None,
+                              cache=kwargs.get('checksum_cache', True))
 
         # Get a mimetype of file
         mime_tuple = mimetypes.guess_type(local_path)
@@ -514,10 +648,19 @@ class Object(CreateableAPIResource,
             print('WARNING: skipping empty object: {}'.format(local_path))
             return False
 
-        # Check if object exists already and compare md5sums
         full_path, path_dict = Object.validate_full_path(
             os.path.join('{}:{}'.format(vault.full_path, remote_path),
                          os.path.basename(local_path)), client=_client)
+
+        # Resume an unfinished resumable upload of the file (to the same
+        # full path), before its incomplete object is found below
+        if kwargs.get('resumable'):
+            obj = cls._resume_multipart(local_path, local_md5, _client,
+                                        full_path=full_path, **kwargs)
+            if obj is not None:
+                return obj
+
+        # Check if object exists already and compare md5sums
         try:
             obj = cls.get_by_full_path(full_path, client=_client)
             if not obj.is_file:
@@ -579,13 +722,18 @@ class Object(CreateableAPIResource,
 
         # Check if multipart upload is needed
         if hasattr(obj, "is_multipart") and obj.is_multipart:
-            return cls._upload_multipart(obj, local_path, local_md5, **kwargs)
+            return cls._upload_multipart(obj, local_path, local_md5,
+                                         full_path=full_path, **kwargs)
         else:
-            return cls._upload_single_file(obj, local_path, **kwargs)
+            return cls._upload_single_file(obj, local_path, local_md5, **kwargs)
 
     @classmethod
-    def _upload_single_file(cls, obj, local_path, **kwargs):
-        """Handle single-part upload for smaller files"""
+    def _upload_single_file(cls, obj, local_path, local_md5=None, **kwargs):
+        """
+        Handle single-part upload for smaller files. The MD5 of the file
+        is computed again as it is sent, which catches files that changed
+        since `local_md5` was computed (or cached) without reading them twice.
+        """
         import mimetypes
 
         # Get a mimetype of file
@@ -596,7 +744,10 @@ class Object(CreateableAPIResource,
         size = os.path.getsize(local_path)
 
         # Get MD5 for single part upload
-        local_md5, _ = md5sum(local_path, multipart_threshold=None)
+        if local_md5 is None:
+            local_md5, _ = md5sum(
+                local_path, multipart_threshold=None,
+                cache=kwargs.get('checksum_cache', True))
 
         upload_url = obj.upload_url
 
@@ -606,30 +757,25 @@ class Object(CreateableAPIResource,
             'Content-Length': str(size),
         }
 
-        # Use a session with a retry policy to handle connection errors.
-        session = requests.Session()
+        # Use the shared storage transport (connection pool). Failed
+        # requests and error responses are retried here.
+        transport = kwargs.get('transport') or StorageTransport.default()
         max_retries = 5
-
-        retry_kwargs = {
-            'total': max_retries,
-            'read': max_retries,
-            'connect': max_retries,
-            'backoff_factor': 2,
-            'status_forcelist': (500, 502, 503, 504, 400),
-            'allowed_methods': ["HEAD", "OPTIONS", "GET", "PUT", "POST"]
-        }
-
-        retry = Retry(**retry_kwargs)
-        session.mount(
-            'https://', requests.adapters.HTTPAdapter(max_retries=retry))
+        retry_statuses = (500, 502, 503, 504, 400)
 
         # Handle retries when upload fails due to an exception such as SSLError
         n_retries = 0
         while True:
+            body = HashingReader(open(local_path, 'rb'))
             try:
-                upload_resp = session.put(upload_url,
-                                          data=open(local_path, 'rb'),
-                                          headers=headers)
+                upload_resp = transport.put(upload_url,
+                                            data=body,
+                                            headers=headers)
+                if upload_resp.status_code in retry_statuses and \
+                        n_retries < max_retries:
+                    raise FileUploadError(
+                        'Upload status code was {0}'.format(
+                            upload_resp.status_code))
             except Exception as e:
                 if n_retries == max_retries:
                     obj.delete(force=True)
@@ -641,6 +787,18 @@ class Object(CreateableAPIResource,
                 time.sleep(2 * n_retries)
             else:
                 break
+            finally:
+                body.close()
+
+        if body.hasher.size == size and \
+                body.hasher.hexdigest() != local_md5:
+            # The file (or its cached checksum) is out of date
+            body.hasher.cache(local_path,
+                              cache=kwargs.get('checksum_cache', True))
+            obj.delete(force=True)
+            raise FileUploadError(
+                'File {0} changed during upload (md5sum {1} vs {2})'.format(
+                    local_path, body.hasher.hexdigest(), local_md5))
 
         if upload_resp.status_code != 200:
             print('WARNING: Upload status code for {0} was {1}'.format(
@@ -688,41 +846,85 @@ class Object(CreateableAPIResource,
                     "Invalid response from presigned URLs API: missing 'presigned_urls' key"
                 )
         except Exception as e:
-            raise FileUploadError(f"Failed to refresh presigned URLs: {str(e)}")
+            raise FileUploadError(
+                f"Failed to refresh presigned URLs: {str(e)}") from e
 
     @classmethod
     def _upload_multipart(cls, obj, local_path, local_md5, **kwargs):
-        """Enhanced multipart upload with parallel parts and presigned URL refresh"""
+        """
+        Enhanced multipart upload with parallel parts and presigned URL refresh.
+
+        With `resumable=True`, completed parts are recorded in an
+        UploadJournal (at `journal_path`) of the upload to `full_path`,
+        and a failed upload is kept (rather than aborted) so that
+        uploading the file again resumes it (see _resume_multipart).
+        A `journal` resumes its upload.
+        """
         _client = kwargs.get("client") or cls._client or client
         num_processes = kwargs.get("num_processes", 1)
         max_retries = kwargs.get("max_retries", 3)
+        transport = kwargs.get("transport") or StorageTransport.default()
+        journal = kwargs.get("journal")
 
         try:
-            # Get initial presigned URLs
-            presigned_urls = obj.presigned_urls
-            total_parts = len(presigned_urls)
+            if journal is not None:
+                # Get fresh presigned URLs for the missing parts only
+                missing_parts = journal.missing_parts
+                upload_urls = {}
+                if missing_parts:
+                    fresh_urls = cls.refresh_presigned_urls(
+                        upload_id=obj.upload_id,
+                        key=obj.upload_key,
+                        total_size=obj.size,
+                        part_numbers=[p[0] for p in missing_parts],
+                        client=_client,
+                    )
+                    for (part_number, _, _), url_info in zip(
+                            missing_parts, fresh_urls):
+                        part_number = url_info.get("part_number", part_number)
+                        upload_urls[part_number] = url_info["upload_url"]
+
+                parts_info = [(n, start, size, upload_urls[n])
+                              for n, start, size in missing_parts]
+            else:
+                # Get initial presigned URLs
+                parts_info = [(p.part_number, p.start_byte, p.size, p.upload_url)
+                              for p in obj.presigned_urls]
+                if kwargs.get("resumable"):
+                    full_path = kwargs.get("full_path")
+                    journal = UploadJournal.create(
+                        kwargs.get("journal_path") or
+                        UploadJournal.default_path(local_path, full_path),
+                        local_path, local_md5, obj,
+                        [p[:3] for p in parts_info], full_path=full_path)
+
+            total_parts = len(parts_info)
 
             print(
                 f"Starting multipart upload with {total_parts} parts using {num_processes} worker(s)..."
             )
 
             # Initialize progress tracker
-            progress_tracker = UploadProgressTracker(total_parts, obj.size)
+            progress_tracker = UploadProgressTracker(
+                total_parts, sum(p[2] for p in parts_info))
 
             # Prepare part upload tasks
             part_tasks = []
-            for i, part_info in enumerate(presigned_urls):
+            for i, (part_number, start_byte, part_size, upload_url) in \
+                    enumerate(parts_info):
                 part_tasks.append(
                     {
-                        "part_number": part_info.part_number,
-                        "start_byte": part_info.start_byte,
-                        "end_byte": part_info.end_byte,
-                        "part_size": part_info.size,
-                        "upload_url": part_info.upload_url,
+                        "part_number": part_number,
+                        "start_byte": start_byte,
+                        "end_byte": start_byte + part_size - 1,
+                        "part_size": part_size,
+                        "upload_url": upload_url,
                         "part_index": i,
                         "max_retries": max_retries,
                         "upload_id": obj.upload_id,
                         "upload_key": obj.upload_key,
+                        "transport": transport,
+                        "journal": journal,
                     }
                 )
 
@@ -741,13 +943,113 @@ class Object(CreateableAPIResource,
                     local_path, part_tasks, obj, _client, progress_tracker
                 )
 
+            if journal is not None:
+                # Include the parts uploaded before resuming
+                parts = journal.completed_parts()
+                if len(parts) != len(journal.parts):
+                    raise FileUploadError(
+                        f"Missing {len(journal.parts) - len(parts)} parts")
+
             # Complete multipart upload
-            return cls._complete_multipart_upload(obj, parts, _client, local_path)
+            result = cls._complete_multipart_upload(obj, parts, _client, local_path)
+            if journal is not None:
+                journal.remove()
+            return result
 
         except Exception as e:
+            if journal is not None and cls._multipart_upload_missing(e):
+                # It cannot be resumed
+                journal.remove()
+                raise FileUploadError(
+                    "Multipart upload failed: {}".format(str(e))) from e
+
+            if journal is not None:
+                print(
+                    f"Notice: {len(journal.completed)}/{len(journal.parts)} parts of "
+                    f"{local_path} were uploaded. Upload the file again with "
+                    f"resumable=True to resume the upload."
+                )
+                raise FileUploadError(
+                    "Multipart upload failed (resumable): {}".format(str(e)))
+
             cls._cleanup_failed_upload(obj, _client)
             raise FileUploadError("Multipart upload failed: {}".format(str(e)))
 
+    @classmethod
+    def _resume_multipart(cls, local_path, local_md5, _client, full_path=None,
+                          **kwargs):
+        """
+        Resumes the unfinished resumable upload of a file to `full_path`,
+        if there is a journal of it. Returns the uploaded object, or None
+        if there is no upload to resume.
+        """
+        journal = UploadJournal.load(
+            kwargs.get("journal_path") or
+            UploadJournal.default_path(local_path, full_path),
+            local_path, local_md5, full_path=full_path)
+        if journal is None:
+            return None
+
+        try:
+            obj = cls.retrieve(journal.header["object_id"], client=_client)
+        except NotFoundError:
+            journal.remove()
+            return None
+
+        obj["upload_id"] = journal.header["upload_id"]
+        obj["upload_key"] = journal.header["upload_key"]
+        if journal.stale:
+            print(
+                "WARNING: {} changed since its upload was interrupted, "
+                "starting over".format(local_path)
+            )
+            try:
+                cls._cleanup_failed_upload(obj, _client)
+            except Exception:
+                pass  # Best effort cleanup
+            journal.remove()
+            return None
+
+        print(
+            "Notice: Resuming upload of {} to {} ({}/{} parts uploaded)".format(
+                local_path, obj.path, len(journal.completed), len(journal.parts)
+            )
+        )
+        kwargs.update(client=_client, journal=journal, full_path=full_path)
+        try:
+            return cls._upload_multipart(obj, local_path, local_md5, **kwargs)
+        except FileUploadError as e:
+            if not cls._multipart_upload_missing(e):
+                raise
+
+        print(
+            "WARNING: The upload of {} expired or was already completed, "
+            "starting over".format(local_path)
+        )
+        try:
+            cls._cleanup_failed_upload(obj, _client)
+        except Exception:
+            pass  # Best effort cleanup
+        return None
+
+    @staticmethod
+    def _multipart_upload_missing(error):
+        """
+        Whether an upload error (or its cause) shows that the multipart
+        upload no longer exists, i.e. it expired, was aborted or was
+        already completed.
+        """
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, SolveError) and error.status_code == 404:
+                return True
+            message = str(error).lower()
+            if 'nosuchupload' in message or 'already completed' in message:
+                return True
+            error = error.__cause__ or error.__context__
+        return False
+
     @classmethod
     def _upload_parts_parallel(
         cls, local_path, part_tasks, obj, _client, num_processes, progress_tracker
@@ -896,6 +1198,7 @@ class Object(CreateableAPIResource,
         upload_id = task["upload_id"]
         upload_key = task["upload_key"]
         worker_id = task.get("worker_id", "Sequential worker")
+        transport = task.get("transport") or StorageTransport.default()
 
         for attempt in range(max_retries):
             try:
@@ -916,27 +1219,19 @@ class Object(CreateableAPIResource,
                 else:
                     upload_url = task["upload_url"]
 
-                # Read part data
-                if file_handle:
-                    # Use provided file handle (sequential mode)
-                    file_handle.seek(start_byte)
-                    chunk_data = file_handle.read(part_size)
-                else:
-                    # Open file for this part (parallel mode)
-                    with open(local_path, "rb") as f:
-                        f.seek(start_byte)
-                        chunk_data = f.read(part_size)
-
-                if not chunk_data:
+                # Stream the part from the file (without reading it
+                # into memory), using the provided file handle in
+                # sequential mode
+                body = FileSlice(file_handle or local_path,
+                                 start_byte, part_size)
+                if not len(body):
+                    body.close()
                     break
 
-                # Upload without requests-level retry (let our custom retry handle it)
-                session = requests.Session()
-
-                headers = {"Content-Length": str(len(chunk_data))}
+                headers = {"Content-Length": str(len(body))}
 
                 # Calculate timeout based on part size
-                part_size_mb = len(chunk_data) / (1024 * 1024)
+                part_size_mb = len(body) / (1024 * 1024)
                 # Timeout scaling for large parts
                 # Formula: 20min base + 30s per MB to handle very large parts
                 # This ensures adequate timeout even with slow connections
@@ -944,15 +1239,20 @@ class Object(CreateableAPIResource,
                 scaling_factor = 30  # 30 seconds per 1MB
                 total_timeout = base_timeout + part_size_mb * scaling_factor
 
-                upload_resp = session.put(
-                    upload_url,
-                    data=chunk_data,
-                    headers=headers,
-                    timeout=total_timeout,
-                )
+                # Upload without requests-level retry (let our custom
+                # retry handle it) on the shared connection pool
+                with body:
+                    upload_resp = transport.put(
+                        upload_url,
+                        data=body,
+                        headers=headers,
+                        timeout=total_timeout,
+                    )
 
                 if upload_resp.status_code == 200:
                     etag = upload_resp.headers.get("ETag", "").strip('"')
+                    if task.get("journal") is not None:
+                        task["journal"].record(part_number, etag)
                     return {"part_number": part_number, "etag": etag}
                 else:
                     raise FileUploadError(
@@ -1,6 +1,15 @@
 # -*- coding: utf-8 -*-
 
+import copy
+import json
+import threading
+import time
+
+import requests
+
+from solvebio.cache import SchemaCache
 from solvebio.resource.solveobject import convert_to_solve_object
+from solvebio.utils.filters import get_path
 
 
 class Fake201Response(object):
@@ -296,3 +305,156 @@ def fake_migration_create(*args, **kwargs):
 
 def fake_export_create(*args, **kwargs):
     return FakeExportResponse(kwargs).create()
+
+
+class FakeQueryClient(object):
+    """
+    A stand-in SolveClient that serves dataset query
+    pages from an in-memory list of records.
+    """
+
+    def __init__(self, records, total=None, errors=None, delay=0,
+                 fields=None):
+        self.records = records
+        self.total = len(records) if total is None else total
+        # Dataset field dicts (name, data_type, is_list)
+        self.fields = fields or []
+        # Dataset commit dicts, latest first
+        self.commits = []
+        self.schema_cache = SchemaCache()
+        # Maps request offsets to the exceptions that they raise
+        self.errors = errors or {}
+        self.delay = delay
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def post(self, url, data, **kwargs):
+        with self._lock:
+            self.requests.append((url, copy.deepcopy(data)))
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        if url == '/v2/batch_query':
+            return [self._query(q) for q in data['queries']]
+
+        offset = data.get('offset', 0)
+        if offset in self.errors:
+            raise self.errors[offset]
+
+        response = self._query(data)
+        if kwargs.get('raw'):
+            raw_response = requests.Response()
+            raw_response.status_code = 200
+            raw_response._content = json.dumps(response).encode('utf-8')
+            return raw_response
+
+        return response
+
+    def _query(self, data):
+        offset = data.get('offset', 0)
+        limit = data.get('limit', len(self.records))
+
+        records = self.records
+        total = self.total
+        if data.get('filters'):
+            records = [r for r in records
+                       if self._matches(r, data['filters'])]
+            total = len(records)
+        for field in reversed(data.get('ordering') or []):
+            records = sorted(records, key=lambda r: get_path(r, field.lstrip('-')),
+                             reverse=field.startswith('-'))
+
+        results = records[offset:offset + limit]
+        if data.get('fields'):
+            results = [dict((k, r[k]) for k in data['fields'] if k in r)
+                       for r in results]
+
+        return {
+            'results': results,
+            'total': total,
+            'took': 1,
+        }
+
+    def get(self, url, params=None, **kwargs):
+        return self.request('get', url, params=params, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.requests.append((url, copy.deepcopy(kwargs.get('params'))))
+
+        if url.startswith('/v2/objects/'):
+            return {'fields': [f['name'] for f in self.fields]}
+
+        if '/data/' in url:
+            # Lookup of records by (comma-separated) _id
+            if self.delay:
+                time.sleep(self.delay)
+            records = dict((r.get('_id'), r) for r in self.records)
+            ids = url.rsplit('/', 1)[-1].split(',')
+            return {'results': [records[i] for i in ids if i in records]}
+
+        if url.endswith('/commits'):
+            return {
+                'class_name': 'list',
+                'url': url,
+                'data': self.commits[:(kwargs.get('params') or {})
+                                     .get('limit')],
+                'total': len(self.commits),
+                'links': {'next': None, 'prev': None},
+            }
+
+        if url.endswith('/fields'):
+            return {
+                'class_name': 'list',
+                'url': url,
+                'data': [dict(f, class_name='DatasetField')
+                         for f in self.fields],
+                'total': len(self.fields),
+                'links': {'next': None, 'prev': None},
+            }
+
+        return {
+            'class_name': 'Dataset',
+            'id': int(url.rstrip('/').split('/')[-1]),
+            'fields_url': url + '/fields',
+            'commits_url': url + '/commits',
+            'documents_count': len(self.records),
+        }
+
+    @classmethod
+    def _matches(cls, record, filters):
+        """Evaluates simple ('and', 'or' and comparison) filters."""
+        ops = {
+            'gt': lambda a, b: a > b,
+            'lt': lambda a, b: a < b,
+            'gte': lambda a, b: a >= b,
+            'lte': lambda a, b: a <= b,
+            'range': lambda a, b: b[0] <= a <= b[1],
+            'exact': lambda a, b: a == b,
+            'in': lambda a, b: any(v in b for v in
+                                   (a if isinstance(a, list) else [a])),
+        }
+        for f in filters:
+            if isinstance(f, dict):
+                if 'or' in f:
+                    if not any(cls._matches(record, [sub])
+                               for sub in f['or']):
+                        return False
+                elif not cls._matches(record, f['and']):
+                    return False
+                continue
+
+            field, op = (f[0].split('__') + ['exact'])[:2]
+            value = record
+            for part in field.split('.'):
+                value = value.get(part) if isinstance(value, dict) else None
+            if not ops[op](value, f[1]):
+                return False
+
+        return True
+
+    @property
+    def offsets(self):
+        return [data.get('offset') for url, data in self.requests
+                if url.endswith('/data')]
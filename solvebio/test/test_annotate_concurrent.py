@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import random
+import threading
+import time
+
+from solvebio import Annotator
+
+from .helper import SolveBioTestCase
+
+
+class FakeAnnotateClient(object):
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def post(self, url, data):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = self._random.random() * self.delay
+
+        time.sleep(delay)
+        with self._lock:
+            self.in_flight -= 1
+
+        if any(r.get('fail') for r in data['records']):
+            raise ValueError('annotation failed')
+        return {'results': [dict(r, test='hello world')
+                            for r in data['records']]}
+
+
+class ConcurrentAnnotatorTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(ConcurrentAnnotatorTest, self).setUp()
+        self.fake = FakeAnnotateClient()
+        self.fields = [{'name': 'test', 'expression': '"hello world"'}]
+
+    def test_ordered_results(self):
+        a = Annotator(self.fields, workers=4, client=self.fake)
+        records = [{'i': i} for i in range(1000)]
+        results = list(a.annotate(records, chunk_size=10))
+        self.assertEqual(results, [{'i': i, 'test': 'hello world'}
+                                   for i in range(1000)])
+        self.assertEqual(self.fake.requests, 100)
+        self.assertTrue(1 < self.fake.max_in_flight <= 4)
+
+        # Serial annotation
+        self.fake.max_in_flight = 0
+        a = Annotator(self.fields, client=self.fake)
+        self.assertEqual(len(list(a.annotate(records, chunk_size=100))), 1000)
+        self.assertEqual(self.fake.max_in_flight, 1)
+
+    def test_backpressure(self):
+        a = Annotator(self.fields, workers=2, client=self.fake)
+        results = a.annotate(({'i': i} for i in range(1000)), chunk_size=10)
+        next(results)
+        time.sleep(0.05)
+        # Only 2 * workers chunks are sent before they are consumed
+        self.assertEqual(self.fake.requests, 4)
+        results.close()
+
+    def test_prefetch(self):
+        consumed = []
+
+        def records():
+            for i in range(100):
+                consumed.append(i)
+                yield {'i': i}
+
+        a = Annotator(self.fields, prefetch=3, client=self.fake)
+        results = a.annotate(records(), chunk_size=10)
+        self.assertEqual(next(results)['i'], 0)
+        time.sleep(0.05)
+        # The chunk being annotated, 3 prefetched chunks, and
+        # the chunk waiting to be queued are read
+        self.assertEqual(len(consumed), 50)
+        self.assertEqual(len(list(results)), 99)
+
+        results = a.annotate(records(), chunk_size=10, workers=3)
+        self.assertEqual([r['i'] for r in results], list(range(100)))
+
+    def test_errors(self):
+        records = [{'i': i} for i in range(100)] + [{'fail': True}]
+        for workers, prefetch in ((1, 2), (4, 0), (4, 2)):
+            a = Annotator(self.fields, workers=workers, prefetch=prefetch,
+                          client=self.fake)
+            self.assertRaises(ValueError, list,
+                              a.annotate(records, chunk_size=10))
+
+        def bad_records():
+            yield {'i': 0}
+            raise KeyError('bad input')
+
+        a = Annotator(self.fields, prefetch=2, client=self.fake)
+        self.assertRaises(KeyError, list, a.annotate(bad_records()))
+        self.assertRaises(Exception, list, a.annotate([], workers=0))
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import solvebio
+from solvebio import SolveError
+from solvebio.client import aiohttp
+
+RECORDS = [{'i': i} for i in range(250)]
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """A local stand-in for the SolveBio API."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(('GET', self.path, self.headers))
+        if self.path.startswith('/v1/user'):
+            self._send(200, {'id': 1, 'email': 'user@example.com'})
+        elif self.path.startswith('/v2/unavailable'):
+            server.unavailable += 1
+            if server.unavailable < 3:
+                self._send(503, {})
+            else:
+                self._send(200, {'ok': True})
+        else:
+            self._send(404, {'detail': 'Not found.'})
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or '{}')
+        server.requests.append(('POST', self.path, self.headers))
+
+        if self.path == '/v2/datasets/1/data':
+            if not server.rate_limited:
+                server.rate_limited = True
+                self._send(429, {}, {'Retry-After': '0'})
+                return
+            offset, limit = body['offset'], body['limit']
+            self._send(200, {
+                'results': RECORDS[offset:offset + limit],
+                'total': len(RECORDS),
+                'took': 1,
+            })
+        elif self.path == '/v2/datasets/2/data':
+            self._send(400, {'filters': 'Invalid filter.'})
+        else:
+            self._send(404, {'detail': 'Not found.'})
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class AsyncSolveClientTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeAPIHandler)
+        self.server.requests = []
+        self.server.rate_limited = True
+        self.server.unavailable = 0
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        host = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.client = solvebio.SolveClient(host=host, token='abc')
+        self.aclient = solvebio.AsyncSolveClient.from_client(self.client)
+
+    async def asyncTearDown(self):
+        await self.aclient.close()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def test_request_auth(self):
+        user = await self.aclient.whoami()
+        self.assertEqual(user['id'], 1)
+        _, _, headers = self.server.requests[-1]
+        self.assertEqual(headers['Authorization'], 'Token abc')
+        self.assertEqual(headers['User-Agent'],
+                         self.client._headers['User-Agent'])
+
+    async def test_request_errors(self):
+        with self.assertRaises(SolveError) as ctx:
+            await self.aclient.get('/v2/missing', {})
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertIn('Not found.', str(ctx.exception))
+
+        query = self.client.Query(2)
+        with self.assertRaises(SolveError) as ctx:
+            await query.aiter_pages(client=self.aclient).__anext__()
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(query._error, ctx.exception)
+
+    async def test_request_retry(self):
+        self.aclient.BACKOFF_FACTOR = 0
+        response = await self.aclient.get('/v2/unavailable', {})
+        self.assertEqual(response, {'ok': True})
+        self.assertEqual(self.server.unavailable, 3)
+
+    async def test_rate_limit(self):
+        self.server.rate_limited = False
+        query = self.client.Query(1, limit=5)
+        results = [r async for r in query.aiter(client=self.aclient)]
+        self.assertEqual(results, RECORDS[:5])
+        self.assertEqual(len(self.server.requests), 2)
+
+    async def test_query_aiter(self):
+        query = self.client.Query(1, page_size=100)
+        pages = [p async for p in query.aiter_pages(client=self.aclient)]
+        self.assertEqual([len(p) for p in pages], [100, 100, 50])
+
+        results = [r async for r in self.client.Query(1, page_size=30)]
+        self.assertEqual(results, RECORDS)
+
+        results = [r async for r in self.client.Query(1, limit=42)]
+        self.assertEqual(results, RECORDS[:42])
+
+        results = [r async for r in self.client.Query(1)[10:20]]
+        self.assertEqual(results, RECORDS[10:20])
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from solvebio.utils.executor import ordered_map
+
+from .helper import SolveBioTestCase
+
+
+class OrderedMapTest(SolveBioTestCase):
+
+    def test_ordered(self):
+        def square(i):
+            # Later items finish first
+            time.sleep((10 - i) * 0.002)
+            return i * i
+
+        self.assertEqual(list(ordered_map(square, range(10), 4)),
+                         [i * i for i in range(10)])
+        self.assertEqual(
+            sorted(ordered_map(square, range(10), 4, ordered=False)),
+            [i * i for i in range(10)])
+
+    def test_unordered(self):
+        release = threading.Event()
+
+        def fetch(i):
+            if i == 0:
+                release.wait(5)
+            return i
+
+        results = ordered_map(fetch, range(3), 3, ordered=False)
+        # The first item is still running
+        self.assertEqual(sorted([next(results), next(results)]), [1, 2])
+        release.set()
+        self.assertEqual(list(results), [0])
+
+    def test_max_pending(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = ordered_map(lambda i: i, items(), 2)
+        self.assertEqual(next(results), 0)
+        # The iterable is consumed lazily
+        self.assertEqual(len(consumed), 4)
+        results.close()
+
+        results = ordered_map(lambda i: i, items(), 2, max_pending=1)
+        self.assertEqual(list(results), list(range(100)))
+
+    def test_error(self):
+        def fetch(i):
+            if i == 3:
+                raise ValueError('fail')
+            return i
+
+        results = ordered_map(fetch, range(10), 2)
+        self.assertEqual([next(results) for _ in range(3)], [0, 1, 2])
+        with self.assertRaises(ValueError):
+            next(results)
+
+        with self.assertRaises(Exception):
+            list(ordered_map(fetch, range(10), 0))
+
+    def test_close(self):
+        started = []
+
+        def fetch(i):
+            started.append(i)
+            time.sleep(0.05)
+            return i
+
+        results = ordered_map(fetch, range(100), 1, max_pending=3)
+        self.assertEqual(next(results), 0)
+        # Item 1 is running, and item 2 is cancelled
+        results.close()
+        time.sleep(0.2)
+        self.assertEqual(started, [0, 1])
@@ -0,0 +1,142 @@
+import random
+import unittest
+
+from solvebio import Filter
+from solvebio import GenomicFilter
+
+from .helper import SolveBioTestCase
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+GENES = ['BRCA1', 'BRCA2', 'TP53', 'GATA3', None]
+
+
+def make_records(n=300):
+    rng = random.Random(0)
+    records = []
+    for i in range(n):
+        start = rng.randint(1, 1000)
+        records.append({
+            'gene': rng.choice(GENES),
+            'score': rng.choice([None, rng.random()]),
+            'tags': rng.sample(['a', 'b', 'c', 'd'], rng.randint(0, 2)),
+            'genomic_coordinates': {
+                'chromosome': rng.choice(['1', '2', 'X']),
+                'start': start,
+                'stop': start + rng.randint(0, 50),
+            },
+        })
+    return records
+
+
+FILTERS = [
+    Filter(gene='BRCA2'),
+    Filter(gene=None),
+    Filter(gene__in=['TP53', 'GATA3']),
+    Filter(gene__prefix='BRCA'),
+    Filter(gene__contains='RCA'),
+    Filter(score__gt=0.5),
+    Filter(score__lte=0.2) | Filter(gene='TP53'),
+    Filter(score__range=[0.2, 0.4]),
+    Filter(score__between=[0.2, 0.4]),
+    ~Filter(gene__prefix='BRCA'),
+    ~(Filter(gene='TP53') & Filter(score__lt=0.5)),
+    Filter(tags='a'),
+    Filter(tags__in=['b', 'c']),
+    Filter(tags=None),
+    GenomicFilter('chr1', 100, 200),
+    GenomicFilter('X', 500),
+    Filter(gene='BRCA1') | GenomicFilter('2', 100, 150, exact=True),
+    Filter('{"and": [["gene", "BRCA1"], ["score__gte", 0.1]]}'),
+]
+
+
+class FilterCompileTest(SolveBioTestCase):
+
+    def test_predicate(self):
+        f = Filter(gene='BRCA2', score__gt=0.5).compile()
+        self.assertTrue(f({'gene': 'BRCA2', 'score': 0.7}))
+        self.assertFalse(f({'gene': 'BRCA2', 'score': None}))
+        self.assertFalse(f({'gene': 'BRCA2'}))
+
+        f = GenomicFilter('chr13', 100, 200).compile()
+        self.assertTrue(f({'genomic_coordinates': {
+            'chromosome': '13', 'start': 150, 'stop': 300}}))
+        self.assertTrue(f({'genomic_coordinates': {
+            'chromosome': '13', 'start': 50, 'stop': 300}}))
+        self.assertFalse(f({'genomic_coordinates': {
+            'chromosome': '13', 'start': 201, 'stop': 300}}))
+        self.assertFalse(f({'genomic_coordinates': {
+            'chromosome': '1', 'start': 150, 'stop': 150}}))
+
+        records = make_records()
+        f = Filter(tags__in=['a']).compile()
+        self.assertEqual(list(f.filter(records)),
+                         [r for r in records if 'a' in r['tags']])
+
+        # Unhashable values do not fail
+        f = Filter(info__in=['a', {'x': 1}]).compile()
+        self.assertTrue(f({'info': {'x': 1}}))
+        self.assertTrue(f({'info': [{'x': 2}, 'a']}))
+        self.assertFalse(f({'info': {'x': 2}}))
+        self.assertFalse(f({'info': [[1]]}))
+        f = Filter(info__in=['a', 'b']).compile()
+        self.assertFalse(f({'info': {'x': 1}}))
+        self.assertTrue(f({'info': [{'x': 1}, 'b']}))
+
+        # Mismatched types do not match
+        self.assertFalse(Filter(score__gt='x').compile()({'score': 1}))
+        self.assertRaises(Exception, Filter(score__near=1).compile)
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_arrow_mask(self):
+        records = make_records()
+        table = pa.Table.from_pylist(records)
+
+        for flt in FILTERS:
+            f = flt.compile()
+            expected = [f(r) for r in records]
+            self.assertEqual(f.mask(table).to_pylist(), expected, repr(flt))
+            self.assertTrue(0 < sum(expected) < len(records), repr(flt))
+
+        # Empty filters match all rows, empty "or" filters none
+        table = pa.table({'a': [1, 2, None]})
+        for flt in (Filter(), Filter('{"or": []}'),
+                    Filter('{"and": [{"or": []}, ["a", 1]]}')):
+            f = flt.compile()
+            self.assertEqual(f.mask(table).to_pylist(),
+                             [f({'a': a}) for a in (1, 2, None)], repr(flt))
+
+        table = pa.Table.from_pylist(records)
+        batch = table.to_batches()[0]
+        f = FILTERS[-1].compile()
+        self.assertEqual(f.mask(batch).to_pylist(),
+                         [f(r) for r in records])
+
+        # Missing fields only match None
+        self.assertEqual(Filter(bogus=1).compile().mask(table).to_pylist(),
+                         [False] * len(records))
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_numpy_mask(self):
+        records = make_records()
+        df = pandas.json_normalize(records)
+        for flt in FILTERS:
+            f = flt.compile()
+            mask = f.mask(df)
+            self.assertEqual(mask.tolist(), [f(r) for r in records],
+                             repr(flt))
+
+        columns = dict((name, df[name].to_numpy())
+                       for name in ('gene', 'score'))
+        f = Filter(gene='TP53', score__gt=0.5).compile()
+        self.assertEqual(f.mask(columns).tolist(),
+                         [f(r) for r in records])
@@ -0,0 +1,92 @@
+import tempfile
+
+from solvebio import Query
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+FIELDS_A = [{'name': 'gene'}, {'name': 'sample'}]
+FIELDS_B = [{'name': 'gene'}, {'name': 'sample'}, {'name': 'score'}]
+
+RECORDS_A = [{'gene': 'G{}'.format(i % 30), 'sample': i} for i in range(100)]
+# Genes G0-G19 have two records, G20-G29 have none
+RECORDS_B = [{'gene': 'G{}'.format(i % 20), 'sample': 'b{}'.format(i),
+              'score': i} for i in range(40)]
+
+
+def expected_join(how='left', prefix='b_'):
+    results = []
+    for a in RECORDS_A:
+        matches = [b for b in RECORDS_B if b['gene'] == a['gene']]
+        if not matches and how == 'left':
+            results.append(dict(a, **{prefix + 'sample': None, 'score': None}))
+        for b in matches:
+            results.append(dict(a, **{prefix + 'sample': b['sample'],
+                                      'score': b['score']}))
+    return results
+
+
+def sort_key(r):
+    return (r['sample'], str(r['b_sample']))
+
+
+class HashJoinTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(HashJoinTest, self).setUp()
+        self.query_a = Query(1, page_size=25, client=FakeQueryClient(
+            RECORDS_A, fields=FIELDS_A))
+        self.query_b = Query(2, page_size=7, client=FakeQueryClient(
+            RECORDS_B, fields=FIELDS_B))
+
+    def test_left_join(self):
+        join = self.query_a.hash_join(self.query_b, key='gene')
+        results = list(join)
+        self.assertEqual(results, expected_join())
+        self.assertEqual(len(results), 2 * 70 + 30)
+        self.assertFalse(join.spilled)
+
+    def test_inner_join(self):
+        results = list(self.query_a.hash_join(
+            self.query_b, key='gene', how='inner'))
+        self.assertEqual(results, expected_join(how='inner'))
+        self.assertRaises(Exception, self.query_a.hash_join,
+                          self.query_b, key='gene', how='outer')
+
+    def test_prefix(self):
+        results = list(self.query_a.hash_join(
+            self.query_b, key='gene', prefix='x_', always_prefix=True))
+        self.assertEqual(sorted(results[0]),
+                         ['gene', 'sample', 'x_sample', 'x_score'])
+
+        # The key is kept if the keys differ
+        results = list(self.query_a.hash_join(
+            self.query_b.filter(gene='G1'), key='gene', key_b='sample',
+            how='inner'))
+        self.assertEqual(results, [])
+        results = list(self.query_a.hash_join(
+            self.query_b, key='gene', key_b='gene', how='inner'))
+        self.assertNotIn('b_gene', results[0])
+
+    def test_spill(self):
+        tmpdir = tempfile.mkdtemp()
+        join = self.query_a.hash_join(
+            self.query_b, key='gene', max_memory=500, partitions=3,
+            tmpdir=tmpdir)
+        results = list(join)
+        self.assertTrue(join.spilled)
+        self.assertEqual(sorted(results, key=sort_key),
+                         sorted(expected_join(), key=sort_key))
+
+        # Partition files are removed
+        import os
+        self.assertEqual(os.listdir(tmpdir), [])
+        os.rmdir(tmpdir)
+
+    def test_list_keys(self):
+        query_b = Query(2, client=FakeQueryClient(
+            [{'genes': ['G1', 'G2'], 'score': 1}],
+            fields=[{'name': 'genes'}, {'name': 'score'}]))
+        results = list(self.query_a.limit(3).hash_join(
+            query_b, key='gene', key_b='genes'))
+        self.assertEqual([r['score'] for r in results], [None, 1, 1])
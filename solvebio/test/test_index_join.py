@@ -0,0 +1,71 @@
+from solvebio import Query
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+FIELDS_A = [{'name': 'gene'}, {'name': 'sample'}]
+FIELDS_B = [{'name': 'gene'}, {'name': 'sample'}, {'name': 'score'}]
+
+RECORDS_A = [{'gene': 'G{}'.format(i % 30), 'sample': i} for i in range(100)]
+# Genes G0-G19 have two records, G20-G29 have none
+RECORDS_B = [{'gene': 'G{}'.format(i % 20), 'sample': 'b{}'.format(i),
+              'score': i} for i in range(40)]
+
+
+class IndexJoinTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(IndexJoinTest, self).setUp()
+        self.client_b = FakeQueryClient(RECORDS_B, fields=FIELDS_B)
+        self.query_a = Query(1, page_size=25, client=FakeQueryClient(
+            RECORDS_A, fields=FIELDS_A))
+        self.query_b = Query(2, client=self.client_b)
+
+    def lookups(self):
+        return [data for url, data in self.client_b.requests
+                if url.endswith('/data')]
+
+    def test_same_results_as_hash_join(self):
+        for how in ('left', 'inner'):
+            self.assertEqual(
+                list(self.query_a.index_join(self.query_b, 'gene', how=how)),
+                list(self.query_a.hash_join(self.query_b, 'gene', how=how)))
+
+        self.assertRaises(Exception, self.query_a.index_join,
+                          self.query_b, key='gene', how='outer')
+
+    def test_lookups(self):
+        results = list(self.query_a.index_join(
+            self.query_b, key='gene', chunk_size=10, workers=2))
+        self.assertEqual(len(results), 2 * 70 + 30)
+        # Records are returned in the order of A
+        self.assertEqual([r['sample'] for r in results[:4]], [0, 0, 1, 1])
+
+        # 4 pages of A, with 25 distinct genes each (in chunks of 10)
+        lookups = self.lookups()
+        self.assertEqual(len(lookups), 4 * 3)
+        self.assertEqual(lookups[0]['filters'], [
+            ('gene__in', ['G{}'.format(i) for i in range(10)])])
+        # Only the joined fields are retrieved
+        self.assertEqual(sorted(lookups[0]['fields']),
+                         ['gene', 'sample', 'score'])
+
+    def test_max_in_flight(self):
+        join = self.query_a.index_join(
+            self.query_b, key='gene', chunk_size=5, workers=2,
+            max_in_flight=5)
+        results = iter(join)
+        next(results)
+        # The first page is joined before all the lookups of the second
+        # are submitted (at most 5 are pending)
+        self.assertGreaterEqual(len(self.lookups()), 5)
+        self.assertLess(len(self.lookups()), 2 * 5)
+        self.assertEqual(len(list(results)) + 1, 2 * 70 + 30)
+
+    def test_list_keys(self):
+        client_b = FakeQueryClient(
+            [{'genes': ['G1', 'G2'], 'score': 1}],
+            fields=[{'name': 'genes'}, {'name': 'score'}])
+        results = list(self.query_a.limit(3).index_join(
+            Query(2, client=client_b), key='gene', key_b='genes'))
+        self.assertEqual([r['score'] for r in results], [None, 1, 1])
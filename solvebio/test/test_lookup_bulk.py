@@ -0,0 +1,67 @@
+import random
+
+import mock
+
+from solvebio import Dataset
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'_id': 'sbid-{}'.format(i), 'position': i} for i in range(1000)]
+
+
+class BulkLookupTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(BulkLookupTest, self).setUp()
+        self.fake = FakeQueryClient(RECORDS)
+        self.dataset = Dataset(1, client=self.fake)
+
+    def lookup_urls(self):
+        return [url for url, _ in self.fake.requests if '/data/' in url]
+
+    def test_lookup(self):
+        # A single chunk is fetched without a thread pool
+        with mock.patch('solvebio.resource.dataset.ordered_map') as pool:
+            results = self.dataset.lookup('sbid-3', 'sbid-1', 'missing')
+        self.assertFalse(pool.called)
+        self.assertEqual([r['position'] for r in results], [3, 1])
+        self.assertEqual(self.lookup_urls(),
+                         ['/v2/datasets/1/data/sbid-3,sbid-1,missing'])
+
+    def test_chunks(self):
+        sbids = ['sbid-{}'.format(i) for i in range(1000)]
+        random.Random(0).shuffle(sbids)
+
+        results = self.dataset.bulk_lookup(sbids, max_url_length=200)
+        # Results are returned in the order of the IDs
+        self.assertEqual([r['_id'] for r in results], sbids)
+
+        urls = self.lookup_urls()
+        self.assertTrue(len(urls) > 1)
+        self.assertTrue(all(len(url) <= 200 for url in urls))
+        self.assertEqual(sum(url.count(',') + 1 for url in urls), 1000)
+
+    def test_chunks_host(self):
+        # The API host counts towards the length of lookup URLs
+        self.fake._host = 'https://api.example.solvebio.com'
+        sbids = ['sbid-{}'.format(i) for i in range(100)]
+        self.dataset.bulk_lookup(sbids, max_url_length=200)
+
+        urls = [self.fake._host + url for url in self.lookup_urls()]
+        self.assertTrue(all(len(url) <= 200 for url in urls))
+        self.assertTrue(any(len(url) > 190 for url in urls))
+
+    def test_iter_lookup(self):
+        self.fake.delay = 0.01
+        sbids = ('sbid-{}'.format(i) for i in range(100, 0, -1))
+        results = self.dataset.iter_lookup(
+            sbids, workers=3, max_url_length=50)
+        self.assertEqual(next(results)['position'], 100)
+        # Chunks are fetched ahead (at most 2 * workers)
+        self.assertTrue(len(self.lookup_urls()) <= 6)
+        self.assertEqual([r['position'] for r in results],
+                         list(range(99, 0, -1)))
+
+        self.assertRaises(Exception, list,
+                          self.dataset.iter_lookup([], workers=0))
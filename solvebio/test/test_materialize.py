@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+
+from solvebio import Dataset
+from solvebio import Filter
+from solvebio import GenomicFilter
+from solvebio.materialize import LocalQuery
+from solvebio.materialize import MaterializedDataset
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+
+def record(i, commit='c1', gene=None):
+    return {
+        '_id': 'r{:03d}'.format(i),
+        '_commit': commit,
+        'gene': gene or 'G{}'.format(i % 5),
+        'tags': ['t{}'.format(i % 3)],
+        'genomic_coordinates': {'chromosome': '1', 'start': i * 10,
+                                'stop': i * 10 + 5},
+    }
+
+
+def commit(commit_id, mode='append', status='succeeded'):
+    return {'id': commit_id, 'mode': mode, 'status': status,
+            'class_name': 'DatasetCommit'}
+
+
+class MaterializeTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(MaterializeTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'replica.db')
+        self.fake = FakeQueryClient([record(i) for i in range(50)])
+        self.fake.commits = [commit('c1')]
+        self.dataset = Dataset(1, client=self.fake)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(MaterializeTest, self).tearDown()
+
+    def data_requests(self):
+        return [data for url, data in self.fake.requests
+                if url.endswith('/data')]
+
+    def test_materialize(self):
+        q = self.dataset.materialize(self.path, index_fields=['gene', 'tags'])
+        self.assertIsInstance(q, LocalQuery)
+        self.assertEqual(len(q), 50)
+        self.assertEqual(q.store.manifest['commit_id'], 'c1')
+        self.assertEqual(q.store.manifest['dataset_id'], 1)
+
+        # Local queries make no API calls
+        n_requests = len(self.fake.requests)
+        self.assertEqual([r['_id'] for r in q.filter(gene='G1')],
+                         ['r001', 'r006', 'r011', 'r016', 'r021', 'r026',
+                          'r031', 'r036', 'r041', 'r046'])
+        self.assertEqual(len(q.filter(tags__in=['t0', 't1'])), 34)
+        self.assertEqual(q.filter(gene='G1').filter(
+            GenomicFilter('1', 60, 100)).count(), 1)
+        self.assertEqual(len(q.filter(~Filter(gene='G1')).limit(5)), 5)
+        self.assertEqual(q.lookup('r002', 'r003')[1]['_id'], 'r003')
+        self.assertEqual(q[10]['_id'], 'r010')
+        self.assertEqual([r['_id'] for r in q[2:4]], ['r002', 'r003'])
+        self.assertEqual(list(q.select('_id').limit(1)), [{'_id': 'r000'}])
+        self.assertEqual(len(self.fake.requests), n_requests)
+
+    def test_indexed_filters(self):
+        q = self.dataset.materialize(self.path, index_fields=['gene'])
+        where, args = q.filter(gene__in=['G1', 'G2'], tags='t1')._where(
+            q.filter(gene__in=['G1', 'G2'], tags='t1')._compiled())
+        self.assertEqual(len(where), 1)
+        self.assertEqual(args, ['gene', 'G1', 'G2'])
+        self.assertEqual(len(q.filter(gene__in=['G1', 'G2'], tags='t1')), 7)
+
+        # Large `in` filters are not used in SQL
+        ids = ['r{0:03d}'.format(i) for i in range(2000)]
+        self.assertEqual(q.filter(_id__in=ids)._where(
+            q.filter(_id__in=ids)._compiled()), ([], []))
+        self.assertEqual(len(q.lookup(*ids)), 50)
+        self.assertEqual(len(q.filter(_id__in=ids, gene__in=['G1'])), 10)
+
+        # Changing the indexed fields rebuilds the index
+        store = MaterializedDataset(self.path, index_fields=['tags'])
+        self.assertEqual(len(store.query(tags='t1')), 17)
+        self.assertEqual(store.manifest['index_fields'], ['tags'])
+
+    def test_incremental_refresh(self):
+        q = self.dataset.materialize(self.path)
+        n_scans = len(self.data_requests())
+
+        # No new commits
+        self.assertEqual(q.refresh(), 0)
+        self.assertEqual(len(self.data_requests()), n_scans)
+
+        # An upsert commit, and a commit that is still running
+        self.fake.records[3] = record(3, commit='c2', gene='BRCA2')
+        self.fake.records.append(record(50, commit='c2'))
+        self.fake.records.append(record(51, commit='c3'))
+        self.fake.commits = [commit('c3', status='running'),
+                             commit('c2', mode='upsert'), commit('c1')]
+        self.fake.total = len(self.fake.records)
+
+        self.assertEqual(q.refresh(), 2)
+        self.assertEqual(self.data_requests()[-1]['filters'],
+                         [('_commit__in', ['c2'])])
+        self.assertEqual(q.store.manifest['commit_id'], 'c2')
+        self.assertEqual(q.filter(gene='BRCA2').lookup('r003')[0]['_id'],
+                         'r003')
+        # The running commit is applied once finished
+        self.fake.commits[0]['status'] = 'succeeded'
+        self.assertEqual(q.refresh(), 1)
+        self.assertEqual(len(q), 52)
+
+    def test_full_refresh(self):
+        q = self.dataset.materialize(self.path)
+
+        # Deleted records are removed by a full scan
+        del self.fake.records[:10]
+        self.fake.total = len(self.fake.records)
+        self.fake.commits.insert(0, commit('c2', mode='delete'))
+        self.assertEqual(q.refresh(), 40)
+        self.assertEqual(len(q), 40)
+        self.assertEqual(q.store.manifest['commit_id'], 'c2')
+
+        # Count mismatches cause a full scan
+        del self.fake.records[:10]
+        self.fake.total = len(self.fake.records)
+        self.fake.commits.insert(0, commit('c3'))
+        self.assertEqual(q.refresh(), 30)
+        self.assertEqual(len(q), 30)
+
+        # Reopened replicas refresh with the given client
+        store = MaterializedDataset(self.path, client=self.fake)
+        self.assertIs(store.dataset._client, self.fake)
+        self.fake.commits.insert(0, commit('c4', mode='delete'))
+        self.assertEqual(store.refresh(), 30)
+        self.assertEqual(store.manifest['commit_id'], 'c4')
+
+        self.assertRaises(Exception, MaterializedDataset,
+                          os.path.join(self.tmpdir, 'other.db'))
+        self.assertRaises(Exception, MaterializedDataset, self.path,
+                          dataset=Dataset(2, client=self.fake))
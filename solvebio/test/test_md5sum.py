@@ -0,0 +1,169 @@
+import binascii
+import hashlib
+import os
+import shutil
+import tempfile
+
+import mock
+
+from solvebio.cache import ChecksumCache
+from solvebio.errors import FileUploadError
+from solvebio.resource import Object
+from solvebio.utils import md5sum as md5sum_module
+from solvebio.utils.md5sum import HashingReader
+from solvebio.utils.md5sum import MD5Hasher
+from solvebio.utils.md5sum import md5sum
+
+from .helper import SolveBioTestCase
+
+DATA = bytes(bytearray(i % 251 for i in range(10000)))
+
+
+def multipart_md5(data, chunksize):
+    digests = b''.join(hashlib.md5(data[i:i + chunksize]).digest()
+                       for i in range(0, len(data), chunksize))
+    return hashlib.md5(digests).hexdigest()
+
+
+class MD5SumTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(MD5SumTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'file.bin')
+        with open(self.path, 'wb') as f:
+            f.write(DATA)
+        self.cache = ChecksumCache(os.path.join(self.tmpdir, 'md5.sqlite3'))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_md5sum(self):
+        self.assertEqual(md5sum(self.path),
+                         (hashlib.md5(DATA).hexdigest(), None))
+        self.assertEqual(md5sum(self.path, None, 1000),
+                         (hashlib.md5(DATA).hexdigest(), None))
+        self.assertEqual(md5sum(self.path, 5000, 3000),
+                         (multipart_md5(DATA, 3000), 4))
+
+    def test_md5sum_workers(self):
+        for chunksize in (1000, 3000, 5000, 9999):
+            expected = (multipart_md5(DATA, chunksize),
+                        -(-len(DATA) // chunksize))
+            for workers in (1, 2, 4):
+                self.assertEqual(
+                    md5sum(self.path, 500, chunksize, workers=workers),
+                    expected)
+
+        # Single-part checksums do not use workers
+        self.assertEqual(md5sum(self.path, None, workers=4),
+                         (hashlib.md5(DATA).hexdigest(), None))
+
+        with self.assertRaises(Exception):
+            md5sum(self.path, 500, 1000, workers=0)
+
+    def test_md5sum_cache(self):
+        expected = md5sum(self.path, 5000, 3000)
+        self.assertEqual(md5sum(self.path, 5000, 3000, cache=self.cache),
+                         expected)
+        self.assertEqual(self.cache.misses, 1)
+
+        # Cached checksums are returned without reading the file
+        with mock.patch.object(md5sum_module, 'open') as mock_open:
+            self.assertEqual(
+                md5sum(self.path, 5000, 3000, cache=self.cache), expected)
+            self.assertFalse(mock_open.called)
+        self.assertEqual(self.cache.hits, 1)
+
+        # Checksums are cached by multipart parameters
+        self.assertEqual(md5sum(self.path, None, cache=self.cache),
+                         (hashlib.md5(DATA).hexdigest(), None))
+        self.assertEqual(len(self.cache), 2)
+
+    def test_md5sum_cache_file_changed(self):
+        md5sum(self.path, None, cache=self.cache)
+
+        with open(self.path, 'wb') as f:
+            f.write(DATA[::-1])
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns,
+                                stat.st_mtime_ns + 1000000000))
+
+        self.assertEqual(md5sum(self.path, None, cache=self.cache),
+                         (hashlib.md5(DATA[::-1]).hexdigest(), None))
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_hasher(self):
+        hasher = MD5Hasher(3000, multipart=True)
+        # Updates that do not line up with blocks
+        for i in range(0, len(DATA), 700):
+            hasher.update(DATA[i:i + 700])
+
+        self.assertEqual(hasher.size, len(DATA))
+        self.assertEqual(hasher.hexdigest(), hashlib.md5(DATA).hexdigest())
+        self.assertEqual(hasher.checksum(5000), md5sum(self.path, 5000, 3000))
+        self.assertEqual(hasher.checksum(None), md5sum(self.path, None))
+
+        hasher.cache(self.path, cache=self.cache, multipart_threshold=5000)
+        with mock.patch.object(md5sum_module, 'open') as mock_open:
+            self.assertEqual(md5sum(self.path, 5000, 3000, cache=self.cache),
+                             hasher.checksum(5000))
+            self.assertEqual(md5sum(self.path, None, cache=self.cache),
+                             hasher.checksum(None))
+            self.assertFalse(mock_open.called)
+
+        # Only single-part checksums are computed by default
+        hasher = MD5Hasher(3000)
+        hasher.update(DATA)
+        self.assertEqual(hasher.checksum(None), md5sum(self.path, None))
+        self.assertRaises(Exception, hasher.checksum, 5000)
+
+    def test_hashing_reader(self):
+        with open(self.path, 'rb') as f:
+            body = HashingReader(f)
+            self.assertEqual(len(body), len(DATA))
+            self.assertEqual(b''.join(body), DATA)
+            self.assertEqual(body.hasher.hexdigest(),
+                             hashlib.md5(DATA).hexdigest())
+
+            # Rewinding restarts the checksum
+            body.seek(0)
+            self.assertEqual(body.read(100), DATA[:100])
+            self.assertEqual(body.hasher.size, 100)
+
+    def _upload(self, local_md5):
+        obj = mock.MagicMock(upload_url='https://upload')
+        response = mock.Mock(status_code=200)
+
+        def put(url, data=None, headers=None):
+            self.assertEqual(b''.join(data), DATA)
+            return response
+
+        transport = mock.Mock()
+        transport.put.side_effect = put
+        with mock.patch('solvebio.resource.object.md5sum') as mock_md5sum:
+            Object._upload_single_file(obj, self.path, local_md5,
+                                       checksum_cache=self.cache,
+                                       transport=transport)
+
+        # The file is only hashed as it is uploaded
+        self.assertFalse(mock_md5sum.called)
+        return obj
+
+    def test_upload_single_file(self):
+        local_md5 = hashlib.md5(DATA).hexdigest()
+        obj = self._upload(local_md5)
+        self.assertFalse(obj.delete.called)
+
+    def test_upload_single_file_changed(self):
+        # e.g. a stale cached checksum
+        stale_md5 = hashlib.md5(b'stale').hexdigest()
+        with self.assertRaises(FileUploadError):
+            self._upload(stale_md5)
+
+        # The checksum of the uploaded data replaces the stale one
+        self.assertEqual(md5sum(self.path, None, cache=self.cache)[0],
+                         binascii.hexlify(hashlib.md5(DATA).digest())
+                         .decode('ascii'))
+        self.assertEqual(self.cache.hits, 1)
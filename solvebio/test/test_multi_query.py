@@ -0,0 +1,127 @@
+import collections
+
+from solvebio import Dataset
+from solvebio import MultiQuery
+from solvebio import Query
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+
+class FacetQueryClient(FakeQueryClient):
+
+    def _query(self, data):
+        response = super(FacetQueryClient, self)._query(data)
+        if data.get('facets'):
+            positions = [r['position'] for r in self.records]
+            response['facets'] = {
+                'gene': collections.Counter(
+                    r['gene'] for r in self.records).most_common(),
+                'position': {
+                    'count': len(positions),
+                    'sum': sum(positions),
+                    'min': min(positions) if positions else None,
+                    'max': max(positions) if positions else None,
+                },
+            }
+        return response
+
+
+class MultiDatasetClient(object):
+    """Dispatches requests to a fake client per dataset ID."""
+
+    def __init__(self, clients):
+        self.clients = clients
+        self.schema_cache = None
+        self.query_cache = None
+
+    def _client(self, url):
+        return self.clients[int(url.split('/')[3])]
+
+    def post(self, url, data, **kwargs):
+        return self._client(url).post(url, data, **kwargs)
+
+
+def records(dataset_id, n):
+    return [{'gene': 'G{}'.format(i % 3), 'position': i * 3 + dataset_id,
+             'dataset': dataset_id} for i in range(n)]
+
+
+class MultiQueryTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(MultiQueryTest, self).setUp()
+        self.fakes = dict((i, FacetQueryClient(records(i, n)))
+                          for i, n in ((0, 50), (1, 20), (2, 0)))
+        self.client = MultiDatasetClient(self.fakes)
+
+    def query(self, **kwargs):
+        return Query(0, page_size=7, client=self.client, **kwargs)
+
+    def test_union(self):
+        multi = self.query().union(1, Dataset(2))
+        self.assertIsInstance(multi, MultiQuery)
+        self.assertEqual([q._data_url for q in multi.queries], [
+            '/v2/datasets/0/data', '/v2/datasets/1/data',
+            '/v2/datasets/2/data'])
+
+        results = list(multi)
+        self.assertEqual(len(results), 70)
+        self.assertEqual(
+            sorted((r['dataset'], r['position']) for r in results),
+            sorted((r['dataset'], r['position'])
+                   for r in records(0, 50) + records(1, 20)))
+
+        self.assertEqual(multi.count(), 70)
+        self.assertEqual(len(multi), 70)
+        # Limits apply to each query
+        self.assertEqual(len(list(self.query(limit=10).union(1, 2))), 20)
+
+    def test_ordered(self):
+        multi = self.query(ordering=['position']).union(1, 2, ordered=True)
+        results = list(multi)
+        self.assertEqual([r['position'] for r in results],
+                         sorted(r['position'] for r in
+                                records(0, 50) + records(1, 20)))
+
+        multi = self.query(ordering=['-position']).union(
+            1, ordered=True, workers=1)
+        positions = [r['position'] for r in multi]
+        self.assertEqual(positions, sorted(positions, reverse=True))
+
+        # Results can be consumed partially
+        results = iter(self.query(ordering=['position']).union(1, ordered=True))
+        self.assertEqual([next(results)['position'] for _ in range(3)],
+                         [0, 1, 3])
+        results.close()
+
+        # The ordering is required
+        self.assertRaises(Exception, self.query().union, 1, ordered=True)
+        self.assertRaises(
+            Exception, MultiQuery,
+            [self.query(ordering=['position']), self.query(ordering=['gene'])],
+            ordered=True)
+
+    def test_ordered_nested(self):
+        for fake in self.fakes.values():
+            fake.records = [
+                dict(r, genomic_coordinates={'start': r['position']})
+                for r in fake.records]
+
+        multi = self.query(ordering=['genomic_coordinates.start']).union(
+            1, 2, ordered=True)
+        self.assertEqual(
+            [r['genomic_coordinates']['start'] for r in multi],
+            sorted(r['position'] for r in records(0, 50) + records(1, 20)))
+
+    def test_facets(self):
+        facets = self.query().union(1, 2).facets('gene', 'position')
+        self.assertEqual(facets['gene'], [['G0', 24], ['G1', 24], ['G2', 22]])
+        self.assertEqual(facets['position']['count'], 70)
+        self.assertEqual(facets['position']['min'], 0)
+        self.assertEqual(facets['position']['max'], 49 * 3)
+        self.assertEqual(facets['position']['avg'],
+                         facets['position']['sum'] / 70.0)
+
+        facets = self.query().union(1).facets(gene={'limit': 1})
+        self.assertEqual(facets['gene'], [['G0', 24]])
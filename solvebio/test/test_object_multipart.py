@@ -0,0 +1,306 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+import mock
+
+from solvebio.errors import FileUploadError
+from solvebio.errors import SolveError
+from solvebio.resource import Object
+from solvebio.resource.object import UploadJournal
+from solvebio.utils.files import FileSlice
+
+from .helper import SolveBioTestCase
+
+MiB = 1024 * 1024
+PART_SIZE = 4 * MiB
+FULL_PATH = 'acme:vault:/file.bin'
+
+
+class FakePart(object):
+
+    def __init__(self, part_number, start_byte, size):
+        self.part_number = part_number
+        self.start_byte = start_byte
+        self.end_byte = start_byte + size - 1
+        self.size = size
+        self.upload_url = 'https://upload/{0}'.format(part_number)
+
+
+class MultipartUploadTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(MultipartUploadTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'file.bin')
+        with open(self.path, 'wb') as f:
+            for i in range(4):
+                f.write(os.urandom(PART_SIZE))
+            # A smaller last part
+            f.write(os.urandom(MiB))
+        self.size = os.path.getsize(self.path)
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.part_md5s = dict(
+            (n + 1, hashlib.md5(data[i:i + PART_SIZE]).hexdigest())
+            for n, i in enumerate(range(0, self.size, PART_SIZE)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def fake_object(self):
+        parts = [FakePart(n + 1, i, min(PART_SIZE, self.size - i))
+                 for n, i in enumerate(range(0, self.size, PART_SIZE))]
+        return mock.MagicMock(presigned_urls=parts, size=self.size,
+                              upload_id='upload-1', upload_key='key-1',
+                              path='/file.bin', id=5)
+
+    def fake_client(self):
+        def post(url, data):
+            if url == '/v2/presigned_urls':
+                return {'presigned_urls': [
+                    {'part_number': n,
+                     'upload_url': 'https://upload/{0}'.format(n)}
+                    for n in data['part_numbers']]}
+            return {'message': 'ok'}
+
+        fake_client = mock.Mock()
+        fake_client.post.side_effect = post
+        return fake_client
+
+    def fake_put(self, url, data=None, headers=None, timeout=None):
+        # Sends the body in blocks, as http.client does
+        self.assertEqual(int(headers['Content-Length']), len(data))
+        md5 = hashlib.md5()
+        block = data.read(8192)
+        while block:
+            md5.update(block)
+            block = data.read(8192)
+
+        part_number = int(url.rsplit('/', 1)[-1])
+        self.assertEqual(md5.hexdigest(), self.part_md5s[part_number])
+        return mock.Mock(status_code=200,
+                         headers={'ETag': '"{0}"'.format(md5.hexdigest())})
+
+    def upload(self, num_processes):
+        fake_client = mock.Mock()
+        fake_client.post.return_value = {'message': 'ok'}
+        transport = mock.Mock()
+        transport.put.side_effect = self.fake_put
+        Object._upload_multipart(self.fake_object(), self.path, None,
+                                 num_processes=num_processes,
+                                 client=fake_client, transport=transport)
+        self.assertEqual(transport.put.call_count, len(self.part_md5s))
+
+        url, data = fake_client.post.call_args[0]
+        self.assertEqual(url, '/v2/complete_multi_part')
+        self.assertEqual(data['parts'], [
+            {'part_number': n, 'etag': md5}
+            for n, md5 in sorted(self.part_md5s.items())])
+
+    def test_upload_sequential(self):
+        self.upload(1)
+
+    def test_upload_memory(self):
+        # Parts are streamed from the file rather than read into memory,
+        # so memory does not grow with part size x workers (16 MiB here).
+        tracemalloc.start()
+        try:
+            self.upload(4)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(peak, MiB)
+
+    def test_file_slice(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        body = FileSlice(self.path, PART_SIZE, PART_SIZE, buffer_size=MiB)
+        with body:
+            self.assertEqual(len(body), PART_SIZE)
+            chunks = list(body)
+            self.assertEqual(len(chunks), 4)
+            self.assertEqual(b''.join(chunks),
+                             data[PART_SIZE:2 * PART_SIZE])
+
+            # Bodies can be rewound (to retry a request)
+            self.assertEqual(body.seek(0), 0)
+            self.assertEqual(body.read(10), data[PART_SIZE:PART_SIZE + 10])
+            self.assertEqual(body.tell(), 10)
+
+        # The last part is truncated at the end of the file
+        with open(self.path, 'rb') as f:
+            body = FileSlice(f, 4 * PART_SIZE, PART_SIZE)
+            self.assertEqual(len(body), MiB)
+            self.assertEqual(body.read(), data[4 * PART_SIZE:])
+            self.assertEqual(body.read(), b'')
+            body.close()
+            self.assertFalse(f.closed)
+
+    def interrupted_upload(self, journal_path):
+        # Part 3 fails (e.g. the network is down)
+        def put(url, **kwargs):
+            if url.endswith('/3'):
+                raise IOError('Connection reset')
+            return self.fake_put(url, **kwargs)
+
+        obj = self.fake_object()
+        fake_client = self.fake_client()
+        transport = mock.Mock()
+        transport.put.side_effect = put
+        with self.assertRaises(FileUploadError):
+            Object._upload_multipart(obj, self.path, 'md5', max_retries=1,
+                                     resumable=True, journal_path=journal_path,
+                                     full_path=FULL_PATH,
+                                     client=fake_client, transport=transport)
+
+        # The upload is kept, to be resumed
+        self.assertFalse(obj.delete.called)
+        self.assertFalse(fake_client.delete.called)
+
+    def test_resumable_upload(self):
+        journal_path = os.path.join(self.tmpdir, 'journal', 'file.jsonl')
+        self.interrupted_upload(journal_path)
+
+        journal = UploadJournal.load(journal_path, self.path, 'md5')
+        self.assertFalse(journal.stale)
+        self.assertEqual(sorted(journal.completed), [1, 2, 4, 5])
+        self.assertEqual(journal.missing_parts, [(3, 2 * PART_SIZE, PART_SIZE)])
+
+        # Resuming only refreshes the URL of (and uploads) the missing part
+        obj = Object(5)
+        obj['size'] = self.size
+        obj['path'] = '/file.bin'
+        fake_client = self.fake_client()
+        transport = mock.Mock()
+        transport.put.side_effect = self.fake_put
+        with mock.patch.object(Object, 'retrieve', return_value=obj):
+            Object._resume_multipart(self.path, 'md5', fake_client,
+                                     full_path=FULL_PATH,
+                                     journal_path=journal_path,
+                                     transport=transport)
+
+        self.assertEqual(transport.put.call_args[0][0], 'https://upload/3')
+        self.assertEqual(transport.put.call_count, 1)
+        (refresh_url, refresh), (complete_url, complete) = [
+            c[0] for c in fake_client.post.call_args_list]
+        self.assertEqual(refresh_url, '/v2/presigned_urls')
+        self.assertEqual(refresh['upload_id'], 'upload-1')
+        self.assertEqual(refresh['part_numbers'], [3])
+        self.assertEqual(complete_url, '/v2/complete_multi_part')
+        self.assertEqual(complete['physical_object_id'], 'key-1')
+        self.assertEqual(complete['parts'], [
+            {'part_number': n, 'etag': md5}
+            for n, md5 in sorted(self.part_md5s.items())])
+
+        # The journal is removed once the upload is completed
+        self.assertFalse(os.path.exists(journal_path))
+
+    def test_resumable_upload_file_changed(self):
+        journal_path = os.path.join(self.tmpdir, 'file.jsonl')
+        self.interrupted_upload(journal_path)
+
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns,
+                                stat.st_mtime_ns + 1000000000))
+
+        obj = Object(5)
+        with mock.patch.object(Object, 'retrieve', return_value=obj), \
+                mock.patch.object(Object, '_cleanup_failed_upload') as cleanup:
+            self.assertIsNone(Object._resume_multipart(
+                self.path, 'md5', mock.Mock(), full_path=FULL_PATH,
+                journal_path=journal_path))
+
+        # The upload starts over
+        self.assertTrue(cleanup.called)
+        self.assertFalse(os.path.exists(journal_path))
+
+    def test_resumable_upload_missing(self):
+        not_found = SolveError('Not found')
+        not_found.status_code = 404
+        errors = [
+            # The upload expired (or was aborted)
+            ('/v2/presigned_urls', not_found),
+            # All the parts were uploaded, and the upload was completed
+            ('/v2/complete_multi_part',
+             SolveError('The upload was already completed')),
+        ]
+        for error_url, error in errors:
+            journal_path = os.path.join(self.tmpdir, 'file.jsonl')
+            self.interrupted_upload(journal_path)
+            if error_url == '/v2/complete_multi_part':
+                journal = UploadJournal.load(journal_path, self.path, 'md5')
+                journal.record(3, self.part_md5s[3])
+
+            def post(url, data):
+                if url == error_url:
+                    raise error
+                return self.fake_client().post(url, data)
+
+            fake_client = mock.Mock()
+            fake_client.post.side_effect = post
+            obj = Object(5)
+            obj['size'] = self.size
+            obj['path'] = '/file.bin'
+            with mock.patch.object(Object, 'retrieve', return_value=obj), \
+                    mock.patch.object(Object,
+                                      '_cleanup_failed_upload') as cleanup:
+                self.assertIsNone(Object._resume_multipart(
+                    self.path, 'md5', fake_client, full_path=FULL_PATH,
+                    journal_path=journal_path, transport=mock.Mock()))
+
+            # The upload starts over
+            self.assertTrue(cleanup.called)
+            self.assertFalse(os.path.exists(journal_path))
+
+        # Other errors keep the upload
+        journal_path = os.path.join(self.tmpdir, 'file.jsonl')
+        self.interrupted_upload(journal_path)
+        fake_client = mock.Mock()
+        fake_client.post.side_effect = SolveError('Service unavailable')
+        with mock.patch.object(Object, 'retrieve', return_value=obj), \
+                self.assertRaises(FileUploadError):
+            Object._resume_multipart(
+                self.path, 'md5', fake_client, full_path=FULL_PATH,
+                journal_path=journal_path, transport=mock.Mock())
+        self.assertTrue(os.path.exists(journal_path))
+
+    def test_resumable_upload_other_destination(self):
+        journal_path = os.path.join(self.tmpdir, 'file.jsonl')
+        self.interrupted_upload(journal_path)
+
+        # Uploading the file to another path does not resume the upload
+        with mock.patch.object(Object, 'retrieve') as retrieve, \
+                mock.patch.object(Object, '_cleanup_failed_upload') as cleanup:
+            self.assertIsNone(Object._resume_multipart(
+                self.path, 'md5', mock.Mock(),
+                full_path='acme:vault:/other/file.bin',
+                journal_path=journal_path))
+
+        self.assertFalse(retrieve.called)
+        self.assertFalse(cleanup.called)
+        # The interrupted upload can still be resumed
+        self.assertTrue(os.path.exists(journal_path))
+        self.assertIsNotNone(UploadJournal.load(
+            journal_path, self.path, 'md5', full_path=FULL_PATH))
+
+        # Journals are stored by local file and full path
+        self.assertNotEqual(
+            UploadJournal.default_path(self.path, FULL_PATH),
+            UploadJournal.default_path(self.path, 'acme:vault:/other/file.bin'))
+
+    def test_journal_truncated(self):
+        journal_path = os.path.join(self.tmpdir, 'file.jsonl')
+        self.interrupted_upload(journal_path)
+        with open(journal_path, 'a') as f:
+            f.write('{"part_number": 3, "et')
+
+        journal = UploadJournal.load(journal_path, self.path, 'md5')
+        self.assertEqual(sorted(journal.completed), [1, 2, 4, 5])
+        self.assertIsNone(UploadJournal.load(
+            os.path.join(self.tmpdir, 'missing.jsonl'), self.path, 'md5'))
@@ -0,0 +1,78 @@
+from solvebio import BatchQuery
+from solvebio import Query
+from solvebio import SolveError
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'gene': 'G{}'.format(i % 10), 'position': i} for i in range(100)]
+
+
+class FailingQueryClient(FakeQueryClient):
+
+    def _query(self, data):
+        if 'bogus' in (data.get('fields') or []):
+            return {'status_code': 400, 'detail': 'Invalid field: bogus'}
+        return super(FailingQueryClient, self)._query(data)
+
+
+class BatchQueryPagesTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(BatchQueryPagesTest, self).setUp()
+        self.fake = FailingQueryClient(RECORDS)
+
+    def batches(self):
+        return [data['queries'] for url, data in self.fake.requests
+                if url == '/v2/batch_query']
+
+    def gene_queries(self, **kwargs):
+        return [Query(1, client=self.fake, **kwargs).filter(gene='G{}'.format(i))
+                for i in range(10)]
+
+    def test_execute_batches(self):
+        batch = BatchQuery(self.gene_queries(page_size=5), batch_size=3,
+                           client=self.fake)
+        responses = batch.execute()
+        self.assertEqual(
+            [r['results'][0]['gene'] for r in responses],
+            ['G{}'.format(i) for i in range(10)])
+        self.assertEqual([len(b) for b in self.batches()], [3, 3, 3, 1])
+
+        # A single batch
+        self.fake.requests = []
+        BatchQuery(self.gene_queries(), client=self.fake).execute()
+        self.assertEqual([len(b) for b in self.batches()], [10])
+        self.assertRaises(Exception, BatchQuery, [], batch_size=0)
+
+    def test_results(self):
+        queries = self.gene_queries(page_size=4)
+        queries[1] = queries[1].limit(5)
+        queries[2] = queries[2][3:]
+        batch = BatchQuery(queries, batch_size=4, workers=2,
+                           client=self.fake)
+        results = batch.results()
+
+        self.assertEqual([r['position'] for r in results[0]],
+                         list(range(0, 100, 10)))
+        self.assertEqual([r['position'] for r in results[1]],
+                         [1, 11, 21, 31, 41])
+        self.assertEqual([r['position'] for r in results[2]],
+                         list(range(32, 100, 10)))
+
+        # Later pages of all queries are fetched in the same batches
+        batches = self.batches()
+        self.assertEqual([len(b) for b in batches],
+                         [4, 4, 2, 4, 4, 2, 4, 4])
+        self.assertEqual(batches[-1][0]['offset'], 8)
+        self.assertEqual(batches[-1][0]['limit'], 4)
+
+    def test_errors(self):
+        queries = [Query(1, client=self.fake, fields=['bogus']),
+                   Query(1, client=self.fake, page_size=60)]
+        pages = list(BatchQuery(queries, client=self.fake).iter_pages())
+        self.assertEqual([(i, r.get('status_code')) for i, r in pages],
+                         [(0, 400), (1, None), (1, None)])
+
+        self.assertRaises(
+            SolveError, BatchQuery(queries, client=self.fake).results)
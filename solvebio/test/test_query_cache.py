@@ -0,0 +1,207 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import mock
+
+from solvebio import Query
+from solvebio import QueryCache
+from solvebio import SolveError
+from solvebio.auth import SolveBioTokenAuth
+from solvebio.query import QueryFile
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'i': i} for i in range(250)]
+
+
+class QueryCacheTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(QueryCacheTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache', 'queries.sqlite3')
+        self.cache = QueryCache(self.path)
+        self.fake = FakeQueryClient(RECORDS)
+        self.fake.commits = [{'id': 1, 'status': 'succeeded'}]
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmpdir)
+
+    def data_requests(self):
+        return [r for r in self.fake.requests if r[0].endswith('/data')]
+
+    def test_query_cache(self):
+        q = Query(1, page_size=100, cache=self.cache, client=self.fake)
+        self.assertEqual(list(q), RECORDS)
+        self.assertEqual(len(self.data_requests()), 3)
+
+        # The same pages (and counts) are read from the cache
+        self.assertEqual(list(q.filter()), RECORDS)
+        self.assertEqual(len(self.data_requests()), 3)
+        self.assertEqual(self.cache.hits, 3)
+        self.assertEqual(Query(1, cache=self.cache, client=self.fake).count(), 250)
+        self.assertEqual(Query(1, cache=self.cache, client=self.fake).count(), 250)
+        self.assertEqual(len(self.data_requests()), 4)
+        self.assertEqual(self.cache.hits, 4)
+
+        # Different parameters are different entries
+        self.assertEqual(list(q.limit(10)), RECORDS[:10])
+        self.assertEqual(len(self.data_requests()), 5)
+
+        # Entries persist across cache instances
+        cache = QueryCache(self.path)
+        q = Query(1, page_size=100, cache=cache, client=self.fake)
+        self.assertEqual(list(q), RECORDS)
+        self.assertEqual(len(self.data_requests()), 5)
+        cache.close()
+
+    def test_commit_invalidation(self):
+        self.cache.validate_interval = 0
+        q = Query(1, limit=5, cache=self.cache, client=self.fake)
+        self.assertEqual(list(q), RECORDS[:5])
+        self.assertEqual(list(q), RECORDS[:5])
+        self.assertEqual(len(self.data_requests()), 1)
+
+        self.fake.commits.insert(0, {'id': 2, 'status': 'running'})
+        self.assertEqual(list(q), RECORDS[:5])
+        self.assertEqual(len(self.data_requests()), 2)
+        # Entries of older commits are removed
+        self.assertEqual(len(self.cache), 1)
+
+    def test_validate_interval(self):
+        q = Query(1, limit=5, cache=self.cache, client=self.fake)
+        list(q)
+        self.fake.commits.insert(0, {'id': 2, 'status': 'running'})
+        # The latest commit is not checked again yet
+        list(q)
+        self.assertEqual(len(self.data_requests()), 1)
+        commit_requests = [r for r in self.fake.requests
+                           if r[0].endswith('/commits')]
+        self.assertEqual(len(commit_requests), 1)
+
+    def test_ttl_and_lru(self):
+        cache = QueryCache(':memory:', ttl=10, max_entries=3)
+        with mock.patch('solvebio.cache.time.time', return_value=1000):
+            for i in range(3):
+                cache.set(str(i), {'i': i})
+        with mock.patch('solvebio.cache.time.time', return_value=1005):
+            self.assertEqual(cache.get('0'), {'i': 0})
+            cache.set('3', {'i': 3})
+            # The least recently used entry is evicted
+            self.assertIsNone(cache.get('1'))
+            self.assertEqual(len(cache), 3)
+        with mock.patch('solvebio.cache.time.time', return_value=1011):
+            self.assertIsNone(cache.get('0'))
+
+        cache = QueryCache(':memory:', ttl=None, max_bytes=1000)
+        with mock.patch('solvebio.cache.time.time', return_value=1000):
+            cache.set('a', {'x': os.urandom(600).hex()})
+            self.assertEqual(len(cache), 1)
+        b = {'x': os.urandom(300).hex()}
+        cache.set('b', b)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), b)
+
+        cache = QueryCache(':memory:', ttl=None, max_entries=10,
+                           max_bytes=1000)
+        for i in range(10):
+            with mock.patch('solvebio.cache.time.time', return_value=i):
+                cache.set(str(i), {'x': os.urandom(40).hex()})
+        self.assertEqual(len(cache), 10)
+        cache.set('big', {'x': os.urandom(400).hex()})
+        # The oldest entries are evicted until both limits are met
+        self.assertIsNone(cache.get('0'))
+        self.assertIsNotNone(cache.get('9'))
+        self.assertIsNotNone(cache.get('big'))
+        self.assertLess(len(cache), 10)
+
+    def test_upgrade(self):
+        path = os.path.join(self.tmpdir, 'old.sqlite3')
+        db = sqlite3.connect(path)
+        db.execute(
+            'CREATE TABLE responses (key TEXT PRIMARY KEY, scope TEXT, '
+            'version TEXT, created REAL, accessed REAL, size INTEGER, '
+            'value BLOB)')
+        db.close()
+        cache = QueryCache(path)
+        cache.set('a', {'a': 1}, scope='/v2/datasets/1/data', version='1')
+        self.assertEqual(cache.get('a', '1'), {'a': 1})
+        cache.close()
+
+    def test_make_key(self):
+        self.assertEqual(QueryCache.make_key({'a': 1, 'b': [1, 2]}),
+                         QueryCache.make_key({'b': [1, 2], 'a': 1}))
+        self.assertNotEqual(QueryCache.make_key({'offset': 0}),
+                            QueryCache.make_key({'offset': 100}))
+
+    def test_credentials(self):
+        self.fake._auth = SolveBioTokenAuth('token-a')
+        list(Query(1, limit=5, cache=self.cache, client=self.fake))
+        list(Query(1, limit=5, cache=self.cache, client=self.fake))
+        self.assertEqual(len(self.data_requests()), 1)
+
+        # Responses are not shared between users
+        self.fake._auth = SolveBioTokenAuth('token-b')
+        list(Query(1, limit=5, cache=self.cache, client=self.fake))
+        self.assertEqual(len(self.data_requests()), 2)
+        self.assertIsNone(QueryCache.credentials_key(object()))
+
+    def test_version_scope(self):
+        self.cache.validate_interval = 0
+        other = FakeQueryClient(RECORDS)
+        other._host = 'https://other.api.solvebio.com'
+        other.commits = [{'id': 7, 'status': 'succeeded'}]
+        list(Query(1, limit=5, cache=self.cache, client=self.fake))
+        list(Query(1, limit=5, cache=self.cache, client=other))
+        self.assertEqual(len(self.cache), 2)
+
+        # The same dataset URL of another host has its own version
+        list(Query(1, limit=5, cache=self.cache, client=self.fake))
+        list(Query(1, limit=5, cache=self.cache, client=other))
+        self.assertEqual(len(self.data_requests()), 1)
+        self.assertEqual(
+            len([r for r in other.requests if r[0].endswith('/data')]), 1)
+        self.assertEqual(self.cache.hits, 2)
+
+        self.cache.invalidate(Query(1)._data_url,
+                              client_key=QueryCache.client_key(other))
+        self.assertEqual(len(self.cache), 1)
+
+    def test_version_error(self):
+        list(Query(1, limit=5, cache=self.cache, client=self.fake))
+        self.cache.validate_interval = 0
+
+        # The cache is bypassed if the version cannot be checked
+        with mock.patch('solvebio.Dataset.commits',
+                        side_effect=SolveError('Forbidden')):
+            q = Query(1, limit=5, cache=self.cache, client=self.fake)
+            self.assertEqual(list(q), RECORDS[:5])
+        self.assertEqual(len(self.data_requests()), 2)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_client_cache(self):
+        self.fake.query_cache = self.cache
+        q = QueryFile(1, page_size=100, client=self.fake)
+        self.assertEqual(list(q), RECORDS)
+        self.assertEqual(list(q), RECORDS)
+        self.assertEqual(len(self.data_requests()), 3)
+
+        # Can be disabled per query
+        list(q.limit(10))
+        list(QueryFile(1, limit=10, cache=False, client=self.fake))
+        self.assertEqual(len(self.data_requests()), 5)
+        self.assertIs(q.limit(5)._cache, None)
+        self.assertIs(Query(1, cache=False)._clone()._cache, False)
+
+    def test_invalidate(self):
+        q = Query(1, limit=5, cache=self.cache, client=self.fake)
+        list(q)
+        self.cache.invalidate(q._data_url)
+        self.assertEqual(len(self.cache), 0)
+        list(q)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,121 @@
+import unittest
+
+from solvebio import Query
+from solvebio.query import QueryFile
+from solvebio.utils.columnar import pa, pandas
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+FIELDS = [
+    {'name': 'gene', 'data_type': 'string', 'is_list': False},
+    {'name': 'position', 'data_type': 'long', 'is_list': False},
+    {'name': 'score', 'data_type': 'double', 'is_list': False},
+    {'name': 'tags', 'data_type': 'string', 'is_list': True},
+    {'name': 'released', 'data_type': 'date', 'is_list': False},
+    {'name': 'info', 'data_type': 'object', 'is_list': False},
+]
+
+RECORDS = [
+    {
+        '_id': i,
+        'gene': 'GENE{}'.format(i),
+        'position': i * 10,
+        # Whole numbers must not be inferred as integers
+        'score': float(i) if i % 2 else None,
+        'tags': ['a', 'b'][:i % 3],
+        'released': '2020-01-{:02d}'.format(i % 28 + 1),
+        'info': {'x': i},
+    }
+    for i in range(250)
+]
+
+
+@unittest.skipIf(pa is None, 'pyarrow is not installed')
+class QueryColumnarTest(SolveBioTestCase):
+
+    def test_to_arrow(self):
+        fake = FakeQueryClient(RECORDS, fields=FIELDS)
+        table = Query(1, page_size=100, client=fake).to_arrow()
+
+        self.assertEqual(table.num_rows, 250)
+        self.assertEqual(table.column_names,
+                         [f['name'] for f in FIELDS] + ['_id'])
+        self.assertEqual(table.schema.field('gene').type, pa.string())
+        self.assertEqual(table.schema.field('position').type, pa.int64())
+        self.assertEqual(table.schema.field('score').type, pa.float64())
+        self.assertEqual(table.schema.field('tags').type,
+                         pa.list_(pa.string()))
+        self.assertEqual(table.schema.field('released').type, pa.date32())
+        self.assertEqual(table.column('info').to_pylist()[3], {'x': 3})
+        self.assertEqual(table.column('position').to_pylist(),
+                         [r['position'] for r in RECORDS])
+
+    def test_record_batches(self):
+        fake = FakeQueryClient(RECORDS, fields=FIELDS)
+        q = Query(1, page_size=100, fields=['gene', 'position'], client=fake)
+        batches = list(q[50:220].iter_record_batches())
+        self.assertEqual([b.num_rows for b in batches], [100, 70])
+        self.assertEqual(batches[0].schema.names, ['gene', 'position'])
+        self.assertEqual(batches[1].column(1).to_pylist(),
+                         [r['position'] for r in RECORDS[150:220]])
+
+        # Prefetching and limits are respected
+        q = Query(1, page_size=30, prefetch=2, limit=95, client=fake)
+        self.assertEqual([b.num_rows for b in q.iter_record_batches()],
+                         [30, 30, 30, 5])
+
+    def test_record_batches_schema(self):
+        records = [{'gene': 'G{}'.format(i),
+                    # Null on the first page only
+                    'note': 'n{}'.format(i) if i >= 10 else None,
+                    'count': i if i >= 10 else None,
+                    'depth': i if i % 2 else float(i)}
+                   for i in range(20)]
+        # A column missing from the first page
+        records[15]['late'] = 1
+
+        fake = FakeQueryClient(records, fields=FIELDS[:1])
+        batches = list(
+            Query(1, page_size=10, client=fake).iter_record_batches())
+        self.assertEqual(len(batches), 2)
+        # All batches have the same schema
+        self.assertEqual(batches[0].schema, batches[1].schema)
+        self.assertEqual(batches[1].schema.field('note').type, pa.string())
+        self.assertEqual(batches[1].column('note').to_pylist(),
+                         ['n{}'.format(i) for i in range(10, 20)])
+        self.assertEqual(batches[1].column('count').to_pylist()[:2],
+                         ['10', '11'])
+        self.assertEqual(batches[1].schema.field('depth').type, pa.float64())
+        self.assertNotIn('late', batches[1].schema.names)
+
+        # Tables promote columns across pages
+        table = Query(1, page_size=10, client=fake).to_arrow()
+        self.assertEqual(table.schema.field('count').type, pa.int64())
+        self.assertEqual(table.column('late').to_pylist()[15], 1)
+
+    def test_empty(self):
+        fake = FakeQueryClient([], fields=FIELDS)
+        table = Query(1, client=fake).to_arrow()
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.field('position').type, pa.int64())
+
+    def test_query_file(self):
+        fake = FakeQueryClient(RECORDS[:120], fields=FIELDS[:3])
+        table = QueryFile(1, page_size=50, client=fake).to_arrow()
+        self.assertEqual(table.num_rows, 120)
+        # Untyped columns are inferred (and promoted across pages)
+        self.assertEqual(table.schema.field('score').type, pa.float64())
+        self.assertEqual(table.column('gene').to_pylist(),
+                         [r['gene'] for r in RECORDS[:120]])
+
+        q = QueryFile(1, output_format='csv', client=fake)
+        self.assertRaises(Exception, q.to_arrow)
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_to_pandas(self):
+        fake = FakeQueryClient(RECORDS, fields=FIELDS)
+        df = Query(1, page_size=100, client=fake).to_pandas()
+        self.assertEqual(len(df), 250)
+        self.assertEqual(str(df['position'].dtype), 'int64')
+        self.assertEqual(list(df['gene'][:2]), ['GENE0', 'GENE1'])
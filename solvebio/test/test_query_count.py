@@ -0,0 +1,59 @@
+from solvebio import Query
+from solvebio.query import QueryFile
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'i': i} for i in range(250)]
+
+
+class QueryCountTest(SolveBioTestCase):
+
+    def test_count_only(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, fields=['i'], client=fake)
+        self.assertEqual(q.count(), 250)
+        self.assertEqual(len(q), 250)
+        self.assertEqual(len(q.limit(10)), 10)
+        self.assertEqual(len(q[200:210]), 10)
+
+        # One request, without any results
+        self.assertEqual(len(fake.requests), 1)
+        params = fake.requests[0][1]
+        self.assertEqual(params['limit'], 0)
+        self.assertNotIn('fields', params)
+        self.assertIsNone(q._response)
+
+    def test_count_filters(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, client=fake)
+        self.assertEqual(len(q.filter(i__gt=199)), 50)
+        self.assertEqual(len(q.filter(i__gt=199)), 50)
+        self.assertEqual(len(q), 250)
+        self.assertEqual(len(fake.requests), 2)
+
+    def test_count_after_page(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, client=fake)
+        self.assertEqual(list(q), RECORDS)
+        # The count of the fetched pages is used
+        self.assertEqual(len(q), 250)
+        self.assertEqual(fake.offsets, [0, 100, 200])
+
+        fake = FakeQueryClient(RECORDS)
+        q = QueryFile(1, client=fake)
+        self.assertEqual(len(q), 250)
+        self.assertEqual([d['limit'] for _, d in fake.requests], [0])
+
+    def test_repr(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, client=fake)
+        self.assertIn('249 more results', repr(q))
+        # A single request returns the first page and the count
+        self.assertEqual(len(fake.requests), 1)
+
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, client=fake)
+        q.filter(i__gt=1000).count()
+        self.assertEqual(repr(q.filter(i__gt=1000)), 'Query returned 0 results.')
+        self.assertEqual(len(fake.requests), 1)
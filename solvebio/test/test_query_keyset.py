@@ -0,0 +1,73 @@
+import random
+
+import mock
+
+from solvebio import Query
+from solvebio.test.client_mocks import fake_export_create
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'_id': i, 'value': str(i)} for i in range(1000)]
+
+
+class QueryKeysetTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(QueryKeysetTest, self).setUp()
+        records = list(RECORDS)
+        random.Random(0).shuffle(records)
+        self.fake = FakeQueryClient(records)
+
+    def test_keyset_iteration(self):
+        q = Query(1, keyset='_id', page_size=100, client=self.fake)
+        self.assertEqual(list(q), RECORDS)
+        self.assertEqual(len(q), 1000)
+        # Only the first page uses an offset, the rest resume after a key
+        self.assertEqual(self.fake.offsets, [0] * 10)
+        self.assertEqual(self.fake.requests[3][1]['filters'],
+                         [{'and': [('_id__gt', 299)]}])
+        self.assertEqual(self.fake.requests[3][1]['ordering'], ['_id'])
+
+    def test_keyset_descending(self):
+        q = Query(1, keyset='-_id', page_size=300, limit=500, client=self.fake)
+        self.assertEqual(list(q), RECORDS[::-1][:500])
+
+    def test_keyset_slice(self):
+        q = Query(1, keyset='_id', page_size=100, client=self.fake)
+        self.assertEqual(list(q[250:470]), RECORDS[250:470])
+        self.assertEqual(self.fake.offsets, [250, 0, 0])
+        self.assertEqual(q[42], RECORDS[42])
+
+    def test_keyset_resume(self):
+        q = Query(1, keyset='_id', page_size=100, fields=['value'], client=self.fake)
+        self.assertIsNone(q.keyset_cursor)
+
+        for i, r in enumerate(q):
+            if i == 349:
+                break
+
+        cursor = q.keyset_cursor
+        self.assertEqual(cursor, 349)
+
+        resumed = q.after(cursor)
+        self.assertEqual(resumed.keyset_cursor, 349)
+        self.assertEqual(len(resumed), 650)
+        self.assertEqual(list(resumed), RECORDS[350:])
+        self.assertEqual(resumed.keyset_cursor, 999)
+
+        resumed = Query(1, keyset='_id', after=cursor, client=self.fake)
+        self.assertEqual(resumed[0], RECORDS[350])
+
+    def test_keyset_errors(self):
+        self.assertRaises(Exception, Query, 1, after=10)
+        self.assertRaises(Exception, Query, 1, keyset='_id', ordering=['value'])
+        self.assertRaises(Exception, Query(1).after, 10)
+        self.assertEqual(Query(1, keyset='_id', ordering='_id')._ordering, ['_id'])
+
+    @mock.patch('solvebio.resource.DatasetExport.create')
+    def test_keyset_export(self, Create):
+        Create.side_effect = fake_export_create
+        q = Query(1, keyset='_id', after=349, client=self.client)
+        export = q.export(follow=False)
+        self.assertEqual(export.params['filters'], [('_id__gt', 349)])
@@ -0,0 +1,71 @@
+from solvebio import Query
+from solvebio.query import PageCache
+from solvebio.query import QueryFile
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'i': i} for i in range(1050)]
+
+
+class QueryPageCacheTest(SolveBioTestCase):
+
+    def test_indexing(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, client=fake)
+        self.assertEqual([q[0], q[1], q[99]], RECORDS[0:2] + [RECORDS[99]])
+        self.assertEqual(fake.offsets, [0])
+        self.assertEqual(fake.requests[0][1]['limit'], 100)
+
+        self.assertEqual(q[150], RECORDS[150])
+        self.assertEqual(q[0], RECORDS[0])
+        self.assertEqual(fake.offsets, [0, 100])
+        self.assertEqual(q.page_cache.hits, 3)
+
+        # Clones share the page cache
+        self.assertEqual(q.limit(500)[101], RECORDS[101])
+        self.assertEqual(q[100:300][5], RECORDS[105])
+        self.assertEqual(fake.offsets, [0, 100])
+
+        # Different filters use different pages
+        self.assertEqual(q.filter(i__gt=10)[0], RECORDS[11])
+        self.assertEqual(fake.offsets, [0, 100, 0])
+
+        self.assertRaises(IndexError, lambda: q[2000])
+
+    def test_small_slices(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, client=fake)
+        self.assertEqual(list(q[10:20]), RECORDS[10:20])
+        self.assertEqual(list(q[20:40]), RECORDS[20:40])
+        self.assertEqual(q[30], RECORDS[30])
+        self.assertEqual(fake.offsets, [0])
+
+        # Slices across pages are fetched as before
+        self.assertEqual(list(q[90:110]), RECORDS[90:110])
+        self.assertEqual(fake.offsets, [0, 90])
+
+        # Iteration does not use the page cache
+        self.assertEqual(list(q.limit(100)), RECORDS[:100])
+        self.assertEqual(fake.offsets, [0, 90, 0])
+
+    def test_lru(self):
+        fake = FakeQueryClient(RECORDS)
+        q = QueryFile(1, page_size=100, page_cache=2, client=fake)
+        for i in (0, 100, 0, 200, 100, 0):
+            self.assertEqual(q[i], RECORDS[i])
+        # The least recently used page is evicted
+        self.assertEqual(fake.offsets, [0, 100, 200, 100, 0])
+        self.assertEqual(len(q.page_cache), 2)
+
+        cache = PageCache(4)
+        q = Query(1, page_cache=cache, client=fake)
+        self.assertIs(q.filter(i=1).page_cache, cache)
+
+    def test_disabled(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, page_cache=0, client=fake)
+        self.assertIsNone(q.page_cache)
+        self.assertEqual([q[0], q[1]], RECORDS[:2])
+        self.assertEqual(fake.offsets, [0, 1])
+        self.assertEqual(fake.requests[0][1]['limit'], 1)
@@ -0,0 +1,108 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import mock
+
+from solvebio import Query
+from solvebio import SolveClient
+from solvebio.query import AdaptivePageSize
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+from .test_async_client import FakeAPIHandler
+from .test_async_client import RECORDS as API_RECORDS
+
+RECORDS = [{'i': i} for i in range(1050)]
+
+
+class AdaptivePageSizeTest(SolveBioTestCase):
+
+    def test_update(self):
+        sizer = AdaptivePageSize(page_size=100, target_ms=100,
+                                 max_page_size=1000)
+        # Fast pages grow (by at most 2x), slow pages shrink
+        self.assertEqual(sizer.update(100, 100, wall_ms=10), 200)
+        self.assertEqual(sizer.update(200, 200, wall_ms=80), 250)
+        self.assertEqual(sizer.update(250, 250, wall_ms=1000), 125)
+        # Partial pages are ignored
+        self.assertEqual(sizer.update(125, 7, wall_ms=1), 125)
+        # Falls back to the API "took" time
+        self.assertEqual(sizer.update(125, 125, took=50), 250)
+        self.assertEqual(len(sizer.history), 5)
+
+    def test_bounds(self):
+        sizer = AdaptivePageSize(page_size=100, target_ms=100,
+                                 max_bytes=1000, min_page_size=40,
+                                 max_page_size=150)
+        self.assertEqual(sizer.update(100, 100, wall_ms=1), 150)
+        # Pages are kept under max_bytes
+        self.assertEqual(sizer.update(150, 150, n_bytes=3000, wall_ms=1), 50)
+        self.assertEqual(sizer.update(50, 50, wall_ms=10000), 40)
+
+
+class QueryAutoPageSizeTest(SolveBioTestCase):
+
+    def test_auto_page_size(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size='auto', client=fake)
+        self.assertEqual(q._page_size, Query.DEFAULT_PAGE_SIZE)
+        self.assertEqual(list(q), RECORDS)
+
+        # The fake API is fast, so pages grow
+        limits = [data['limit'] for _, data in fake.requests]
+        self.assertEqual(limits[:3], [100, 200, 400])
+        self.assertGreater(q.page_sizer.page_size, 100)
+        self.assertTrue(q.page_sizer.history[0]['bytes'])
+
+        # Clones share the page sizer
+        self.assertIs(q.filter(i=1).page_sizer, q.page_sizer)
+        self.assertIs(q[10:20].page_sizer, q.page_sizer)
+        self.assertIsNone(Query(1, client=fake).page_sizer)
+
+    def test_auto_page_size_limit_slice(self):
+        sizer = AdaptivePageSize(page_size=30, max_page_size=500)
+        q = Query(1, page_size=sizer, client=FakeQueryClient(RECORDS))
+        self.assertEqual(list(q[120:900]), RECORDS[120:900])
+        self.assertEqual(list(q.limit(333)), RECORDS[:333])
+        self.assertEqual(q.page_sizer.page_size, 500)
+
+    def test_auto_page_size_prefetch(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size='auto', prefetch=3, client=fake)
+        self.assertEqual(list(q), RECORDS)
+        # Prefetched pages do not overlap or leave gaps
+        pages = sorted((d['offset'], d['limit']) for _, d in fake.requests)
+        for (offset, limit), (next_offset, _) in zip(pages, pages[1:]):
+            self.assertEqual(offset + limit, next_offset)
+
+    def test_auto_page_size_parallel_iter(self):
+        # Slow pages shrink the shared page size below the size of
+        # the ranges that parallel_iter() fetches
+        sizer = AdaptivePageSize(page_size=100, target_ms=1)
+        fake = FakeQueryClient(RECORDS, delay=0.01)
+        q = Query(1, page_size=sizer, client=fake)
+        self.assertEqual(list(q.parallel_iter(workers=4)), RECORDS)
+        self.assertLess(sizer.page_size, 100)
+        self.assertEqual(sorted(r['i'] for r in q.parallel_iter(
+            workers=4, ordered=False)), list(range(len(RECORDS))))
+
+    def test_auto_page_size_rate_limit(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeAPIHandler)
+        server.requests = []
+        # The first page request is rate limited (429)
+        server.rate_limited = False
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            client = SolveClient(
+                host='http://127.0.0.1:{}'.format(server.server_port),
+                token='abc')
+            with mock.patch('time.sleep'):
+                results = list(Query(1, page_size='auto', client=client))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(results, API_RECORDS)
+        self.assertTrue(server.rate_limited)
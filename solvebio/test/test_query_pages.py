@@ -0,0 +1,44 @@
+from solvebio import Query
+from solvebio.query import QueryFile
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'i': i} for i in range(1050)]
+
+
+class QueryPagesTest(SolveBioTestCase):
+
+    def test_iter_pages(self):
+        q = Query(1, page_size=100, client=FakeQueryClient(RECORDS))
+        pages = list(q.iter_pages())
+        self.assertEqual([len(p) for p in pages], [100] * 10 + [50])
+        self.assertEqual(sum(pages, []), RECORDS)
+
+        q = Query(1, page_size=100, limit=250, client=FakeQueryClient(RECORDS))
+        self.assertEqual([len(p) for p in q.iter_pages()], [100, 100, 50])
+
+        q = Query(1, page_size=100, client=FakeQueryClient(RECORDS))
+        self.assertEqual(sum(q[120:330].iter_pages(), []), RECORDS[120:330])
+        self.assertEqual(list(q.limit(0).iter_pages()), [])
+
+        fake = FakeQueryClient(RECORDS)
+        q = QueryFile(1, page_size=400, prefetch=2, client=fake)
+        self.assertEqual(sum(q.iter_pages(), []), RECORDS)
+        self.assertEqual(sorted(fake.offsets), [0, 400, 800])
+
+    def test_iter_batches(self):
+        q = Query(1, page_size=100, client=FakeQueryClient(RECORDS))
+        batches = list(q.iter_batches(batch_size=40))
+        self.assertEqual([len(b) for b in batches], [40] * 26 + [10])
+        self.assertEqual(sum(batches, []), RECORDS)
+
+        batches = list(q.limit(350).iter_batches(batch_size=300))
+        self.assertEqual([len(b) for b in batches], [300, 50])
+        self.assertEqual(len(list(q.iter_batches())), 11)
+        self.assertRaises(Exception, list, q.iter_batches(0))
+
+    def test_iter_results(self):
+        q = Query(1, page_size=64, client=FakeQueryClient(RECORDS))
+        self.assertEqual(list(q.iter_results()), list(q))
+        self.assertEqual(list(q[5:15].iter_results()), RECORDS[5:15])
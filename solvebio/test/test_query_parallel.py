@@ -0,0 +1,45 @@
+from solvebio import Query
+from solvebio import SolveError
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'i': i} for i in range(1050)]
+
+
+class QueryParallelIterTest(SolveBioTestCase):
+
+    def test_parallel_iter_ordered(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, client=fake)
+        self.assertEqual(list(q.parallel_iter(workers=4)), RECORDS)
+        # The first request is the count
+        self.assertEqual(sorted(fake.offsets[1:]), list(range(0, 1100, 100)))
+
+    def test_parallel_iter_unordered(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=64, client=fake)
+        results = list(q.parallel_iter(workers=3, ordered=False))
+        self.assertEqual(sorted(results, key=lambda r: r['i']), RECORDS)
+
+    def test_parallel_iter_limit_slice(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, limit=250, client=fake)
+        self.assertEqual(list(q.parallel_iter(workers=2)), RECORDS[:250])
+        # Pages are never larger than the remaining limit
+        self.assertEqual(fake.requests[-1][1]['limit'], 50)
+
+        q = Query(1, page_size=100, client=FakeQueryClient(RECORDS))
+        self.assertEqual(list(q[120:330].parallel_iter(workers=2)),
+                         RECORDS[120:330])
+        self.assertEqual(list(q[1000:].parallel_iter(workers=2)),
+                         RECORDS[1000:])
+        self.assertEqual(list(q.limit(0).parallel_iter()), [])
+
+    def test_parallel_iter_error(self):
+        error = SolveError('Bad page')
+        fake = FakeQueryClient(RECORDS, errors={500: error})
+        q = Query(1, page_size=100, client=fake)
+        with self.assertRaises(SolveError):
+            list(q.parallel_iter(workers=4))
+        self.assertIs(q._error, error)
@@ -0,0 +1,66 @@
+from solvebio import Query
+from solvebio import SolveError
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+RECORDS = [{'i': i} for i in range(1050)]
+
+
+class QueryPrefetchTest(SolveBioTestCase):
+
+    def test_prefetch_results(self):
+        fake = FakeQueryClient(RECORDS)
+        results = list(Query(1, page_size=100, prefetch=3, client=fake))
+        self.assertEqual(results, RECORDS)
+        self.assertEqual(sorted(fake.offsets), list(range(0, 1100, 100)))
+
+        fake = FakeQueryClient(RECORDS)
+        results = list(Query(1, page_size=100, prefetch=2, limit=250, client=fake))
+        self.assertEqual(results, RECORDS[:250])
+        self.assertEqual(sorted(fake.offsets), [0, 100, 200])
+
+        fake = FakeQueryClient(RECORDS)
+        results = list(Query(1, page_size=100, prefetch=2, client=fake)[120:330])
+        self.assertEqual(results, RECORDS[120:330])
+        self.assertEqual(sorted(fake.offsets), [120, 220, 320])
+
+    def test_prefetch_bounded(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, prefetch=2, client=fake)
+        for i, r in enumerate(q):
+            self.assertLessEqual(len(q._prefetcher), 2)
+            if i == 150:
+                break
+
+        # At most `prefetch` pages ahead of the current one were requested
+        self.assertLessEqual(max(fake.offsets), 100 + 2 * 100)
+        q._close_prefetcher()
+
+    def test_prefetch_restart(self):
+        fake = FakeQueryClient(RECORDS)
+        q = Query(1, page_size=100, prefetch=2, limit=300, client=fake)
+        self.assertEqual(list(q), RECORDS[:300])
+        self.assertIsNone(q._prefetcher)
+        self.assertEqual(list(q), RECORDS[:300])
+
+    def test_prefetch_error(self):
+        error = SolveError('Bad page')
+        fake = FakeQueryClient(RECORDS, errors={300: error})
+        q = Query(1, page_size=100, prefetch=2, client=fake)
+
+        results = []
+        with self.assertRaises(SolveError) as ctx:
+            for r in q:
+                results.append(r)
+
+        self.assertIs(ctx.exception, error)
+        self.assertIs(q._error, error)
+        # Every record before the failing page was returned
+        self.assertEqual(results, RECORDS[:300])
+        self.assertIsNone(q._prefetcher)
+
+    def test_prefetch_clone(self):
+        q = Query(1, prefetch=4, client=FakeQueryClient(RECORDS))
+        self.assertEqual(q.limit(10)._prefetch, 4)
+        self.assertRaises(Exception, Query, 1, prefetch=-1)
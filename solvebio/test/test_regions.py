@@ -0,0 +1,124 @@
+import io
+import os
+import tempfile
+
+from solvebio import Query
+from solvebio import RegionSet
+from solvebio.regions import read_bed
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+BED = """track name=panel
+# chrom start end
+chr1\t99\t200
+chr1\t150\t300
+chr1\t300\t400
+chr2\t9\t10
+chr10\t0\t5
+chrX\t1000\t2000
+"""
+
+
+def variant(i, chromosome, start, stop):
+    return {'_id': 'v{}'.format(i), 'genomic_coordinates': {
+        'chromosome': chromosome, 'start': start, 'stop': stop}}
+
+
+RECORDS = [
+    variant(0, '1', 50, 60),
+    variant(1, '1', 100, 100),
+    variant(2, '1', 390, 410),
+    # Overlaps the regions of the first and the second batch
+    variant(3, '2', 400, 3000),
+    variant(4, '2', 10, 10),
+    variant(5, '10', 1, 1),
+    variant(6, 'X', 1500, 1501),
+    variant(7, 'X', 2500, 2500),
+]
+
+
+class RegionSetTest(SolveBioTestCase):
+
+    def test_read_bed(self):
+        regions = read_bed(io.StringIO(BED))
+        self.assertEqual(regions[0], ('chr1', 100, 200))
+        self.assertEqual(len(regions), 6)
+
+        path = os.path.join(tempfile.mkdtemp(), 'panel.bed')
+        with open(path, 'w') as f:
+            f.write(BED)
+        self.assertEqual(read_bed(path), regions)
+        os.remove(path)
+
+        self.assertRaises(ValueError, read_bed, io.StringIO('chr1\tx\t1\n'))
+
+    def test_merge(self):
+        regions = RegionSet.from_bed(io.StringIO(BED))
+        # Overlapping and adjacent regions are merged
+        self.assertEqual(list(regions), [
+            ('1', 100, 400), ('2', 10, 10), ('10', 1, 5), ('X', 1001, 2000)])
+        self.assertEqual(regions.chromosomes, ['1', '2', '10', 'X'])
+
+        regions = RegionSet({'1': [(100, 200), (202, 300)]})
+        self.assertEqual(len(regions), 2)
+        regions = RegionSet(['chr1:100-200', 'chr1:150', ('1', 201, 201)])
+        self.assertEqual(list(regions), [('1', 100, 201)])
+
+    def test_batches(self):
+        regions = RegionSet.from_bed(io.StringIO(BED))
+        self.assertEqual([len(b) for b in regions.batches(3)], [3, 1])
+        self.assertEqual(len(regions.filters(2)), 2)
+        self.assertRaises(Exception, regions.batches, 0)
+
+
+class RegionQueryTest(SolveBioTestCase):
+
+    def test_query(self):
+        fake = FakeQueryClient(RECORDS)
+        regions = RegionSet([('1', 100, 400), ('2', 1, 500),
+                             ('X', 1000, 2000), ('2', 2000, 2000)])
+        query = Query(1, client=fake).regions(
+            regions, batch_size=2, workers=2)
+        self.assertEqual(len(query.queries), 2)
+
+        results = list(query)
+        self.assertEqual([r['_id'] for r in results],
+                         ['v1', 'v2', 'v3', 'v4', 'v6'])
+        self.assertEqual(len([url for url, _ in fake.requests
+                              if url.endswith('/data')]), 2)
+
+    def test_query_streaming(self):
+        records = [variant(i, '1', pos, pos)
+                   for i, pos in enumerate([100, 100, 100, 200, 200, 300])]
+        # Overlaps the regions of three batches
+        records.append(variant(9, '1', 50, 350))
+        fake = FakeQueryClient(records)
+        regions = RegionSet([('1', 100, 100), ('1', 200, 200),
+                             ('1', 300, 300)])
+        query = Query(1, client=fake, page_size=1).regions(
+            regions, batch_size=1, workers=1)
+
+        results = iter(query)
+        next(results)
+        # Only the first page of each pending batch is fetched ahead
+        self.assertLessEqual(len([url for url, _ in fake.requests
+                                  if url.endswith('/data')]), 2)
+
+        ids = ['v0'] + [r['_id'] for r in results]
+        self.assertEqual(ids, ['v0', 'v1', 'v2', 'v9', 'v3', 'v4', 'v5'])
+
+    def test_query_fields(self):
+        # Distinct records with the same coordinates
+        records = [variant(i, '1', 150, 150) for i in range(3)]
+        records.append(variant(9, '1', 50, 350))
+        fake = FakeQueryClient(records)
+        regions = RegionSet([('1', 100, 200), ('1', 300, 300)])
+        query = Query(1, client=fake, fields=['genomic_coordinates'])
+        results = list(query.regions(regions, batch_size=1))
+
+        # Records are deduplicated by _id, which is not returned
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(list(r) == ['genomic_coordinates']
+                            for r in results))
+        self.assertIn('_id', query.regions(regions).queries[0]._fields)
@@ -0,0 +1,93 @@
+import mock
+
+from solvebio import Dataset
+from solvebio import DatasetField
+from solvebio import Query
+from solvebio.cache import SchemaCache
+from solvebio.query import QueryFile
+
+from .client_mocks import FakeQueryClient
+from .helper import SolveBioTestCase
+
+FIELDS = [
+    {'name': 'gene', 'data_type': 'string', 'is_list': False},
+    {'name': 'position', 'data_type': 'long', 'is_list': False},
+]
+RECORDS = [{'gene': 'G{}'.format(i), 'position': i} for i in range(10)]
+
+
+class SchemaCacheTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(SchemaCacheTest, self).setUp()
+        self.fake = FakeQueryClient(RECORDS, fields=FIELDS)
+
+    def schema_requests(self):
+        return [url for url, _ in self.fake.requests
+                if not url.endswith('/data')]
+
+    def test_query_fields(self):
+        q = Query(1, client=self.fake)
+        self.assertEqual([f.name for f in q.fields()], ['gene', 'position'])
+        self.assertEqual(q.fields()[1].data_type, 'long')
+        # Clones (and other queries) share the client's schema cache
+        fields = q.filter(gene='G1').fields()
+        self.assertEqual([f.name for f in Query(1, fields=['gene'], client=self.fake)
+                          .fields()], ['gene'])
+        self.assertEqual(len(fields), 2)
+        self.assertEqual(self.schema_requests(),
+                         ['/v2/datasets/1', '/v2/datasets/1/fields'])
+
+        self.fake.schema_cache.invalidate('dataset', 1)
+        q.fields()
+        self.assertEqual(len(self.schema_requests()), 4)
+
+    def test_dataset_fields(self):
+        # Dataset.fields() is not cached
+        dataset = Dataset(1, client=self.fake)
+        self.assertEqual(len(list(dataset.fields())), 2)
+        self.assertEqual(len(list(dataset.fields())), 2)
+        self.assertEqual(self.schema_requests(),
+                         ['/v2/datasets/1', '/v2/datasets/1/fields',
+                          '/v2/datasets/1/fields'])
+
+    def test_dataset_field_invalidation(self):
+        q = Query(1, client=self.fake)
+        q.fields()
+        self.fake.schema_cache.set(('dataset', '2', 'all_fields'), [])
+
+        field = DatasetField(5, client=self.fake)
+        field['dataset_id'] = 1
+        field.description = 'Gene symbol'
+        with mock.patch.object(DatasetField, 'request',
+                               return_value={'id': 5, 'dataset_id': 1}):
+            field.save()
+            # Only the fields of the dataset are invalidated
+            self.assertEqual(len(self.fake.schema_cache), 1)
+            field.delete(force=True)
+
+        q.fields()
+        self.assertEqual(len(self.schema_requests()), 4)
+
+    def test_query_file_fields(self):
+        q = QueryFile(1, output_format='csv', page_size=4, client=self.fake)
+        rows = list(q)
+        self.assertEqual(rows[0], 'gene,position')
+        self.assertEqual(q.fields(), ['gene', 'position'])
+        self.assertEqual(self.schema_requests(), ['/v2/objects/1/fields'])
+
+    def test_ttl(self):
+        cache = SchemaCache(ttl=10)
+        with mock.patch('solvebio.cache.time.time', return_value=1000):
+            cache.set(('dataset', '1', 'fields'), ['a'])
+            self.assertEqual(cache.get_or_load(
+                ('dataset', '1', 'fields'), lambda: ['b']), ['a'])
+        with mock.patch('solvebio.cache.time.time', return_value=1011):
+            self.assertIsNone(cache.get(('dataset', '1', 'fields')))
+
+        cache.set(('dataset', '1', 'fields'), ['a'])
+        cache.set(('object', '1', 'fields'), ['a'])
+        cache.invalidate('object')
+        self.assertEqual(len(cache), 1)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import mock
+
+from solvebio.cache import ChecksumCache
+from solvebio.resource import Object
+from solvebio.transport import StorageTransport
+from solvebio.utils.md5sum import md5sum
+
+from .helper import SolveBioTestCase
+
+DATA = os.urandom(100000)
+
+
+class StorageHandler(BaseHTTPRequestHandler):
+    """A keep-alive server that stores PUT bodies and serves DATA."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.bodies[self.path] = body
+        self.send_response(200)
+        self.send_header('ETag', '"{0}"'.format(hashlib.md5(body).hexdigest()))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(DATA)))
+        self.end_headers()
+        self.wfile.write(DATA)
+
+
+class StorageTransportTest(SolveBioTestCase):
+
+    def setUp(self):
+        super(StorageTransportTest, self).setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StorageHandler)
+        self.server.bodies = {}
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{0}'.format(self.server.server_port)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_connection_reuse(self):
+        transport = StorageTransport(pool_maxsize=4)
+
+        def put(i):
+            response = transport.put('{0}/part/{1}'.format(self.url, i),
+                                     data=b'part %d' % i)
+            self.assertEqual(response.status_code, 200)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(put, range(100)))
+
+        stats = transport.stats()
+        self.assertEqual(stats['requests'], 100)
+        # Connections are reused across requests and threads
+        self.assertLessEqual(stats['connections'], 4)
+        pool, = stats['pools'].values()
+        self.assertEqual(pool['requests'], 100)
+        self.assertEqual(len(self.server.bodies), 100)
+        transport.close()
+
+    def test_default(self):
+        previous = StorageTransport._default
+        try:
+            StorageTransport.set_default(None)
+            self.assertIs(StorageTransport.default(),
+                          StorageTransport.default())
+
+            transport = StorageTransport(pool_maxsize=64)
+            StorageTransport.set_default(transport)
+            self.assertIs(StorageTransport.default(), transport)
+        finally:
+            StorageTransport.set_default(previous)
+
+        with self.assertRaises(Exception):
+            StorageTransport(pool_maxsize=0)
+
+    def test_download(self):
+        transport = StorageTransport()
+        cache = ChecksumCache(os.path.join(self.tmpdir, 'md5.sqlite3'))
+        obj = Object(1)
+        obj['filename'] = 'file.bin'
+        path = os.path.join(self.tmpdir, 'file.bin')
+
+        with mock.patch.object(Object, 'download_url',
+                               return_value=self.url + '/file.bin'):
+            for _ in range(3):
+                self.assertEqual(
+                    obj.download(path, transport=transport,
+                                 checksum_cache=cache),
+                    path)
+
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertEqual(transport.stats()['requests'], 3)
+        self.assertEqual(transport.stats()['connections'], 1)
+
+        # The checksum was computed as the file was written
+        self.assertEqual(md5sum(path, None, cache=cache)[0],
+                         hashlib.md5(DATA).hexdigest())
+        self.assertEqual(cache.hits, 1)
+        cache.close()
+
+    def test_upload_single_file_retry(self):
+        path = os.path.join(self.tmpdir, 'file.bin')
+        with open(path, 'wb') as f:
+            f.write(DATA)
+
+        responses = [mock.Mock(status_code=503), mock.Mock(status_code=200)]
+        transport = mock.Mock()
+
+        def put(url, data=None, headers=None):
+            self.assertEqual(b''.join(data), DATA)
+            return responses.pop(0)
+
+        transport.put.side_effect = put
+        obj = mock.MagicMock(upload_url=self.url + '/file.bin')
+        with mock.patch('time.sleep'):
+            Object._upload_single_file(obj, path,
+                                       hashlib.md5(DATA).hexdigest(),
+                                       checksum_cache=False,
+                                       transport=transport)
+
+        self.assertEqual(transport.put.call_count, 2)
+        self.assertFalse(obj.delete.called)
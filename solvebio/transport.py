@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+A shared HTTP transport for storage (presigned URL) requests.
+"""
+import logging
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests import adapters
+
+logger = logging.getLogger('solvebio')
+
+
+class StorageTransport(object):
+    """
+    A thread-safe, pooled HTTP session for file uploads and downloads
+    through presigned (e.g. S3) URLs, shared by all parts, files and
+    downloads so that connections (and TLS sessions) are reused:
+
+        transport = StorageTransport.default()
+        transport.put(upload_url, data=body, headers=headers)
+        transport.stats()
+
+    Connections are pooled by host: up to `pool_maxsize` connections
+    are kept per host, for up to `pool_connections` hosts. To tune the
+    pool of the shared transport:
+
+        StorageTransport.set_default(StorageTransport(pool_maxsize=64))
+
+    Requests are not retried by the transport: callers retry failed
+    requests (e.g. with a refreshed presigned URL). Cookies are never
+    stored, so requests do not share any state.
+    """
+    DEFAULT_POOL_CONNECTIONS = 10
+    DEFAULT_POOL_MAXSIZE = 32
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        if pool_maxsize < 1:
+            raise Exception('\'pool_maxsize\' parameter must be >= 1')
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._requests = 0
+        self._lock = threading.Lock()
+
+        self._adapter = adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            max_retries=0)
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+
+    def __repr__(self):
+        return '<StorageTransport ({0} requests, {1} connections)>'.format(
+            self._requests, self.stats()['connections'])
+
+    @classmethod
+    def default(cls):
+        """Returns the shared transport."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @classmethod
+    def set_default(cls, transport):
+        """Replaces (and closes) the shared transport."""
+        with cls._default_lock:
+            previous, cls._default = cls._default, transport
+        if previous is not None and previous is not transport:
+            previous.close()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self._requests += 1
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('put', url, **kwargs)
+
+    def stats(self):
+        """
+        Returns the number of requests sent, and of connections opened
+        (in total and for each host pool), e.g.:
+
+            {'requests': 1200, 'connections': 8, 'pools': {
+                'https://bucket.s3.amazonaws.com:443': {
+                    'connections': 8, 'requests': 1200, 'idle': 8}}}
+        """
+        pools = {}
+        poolmanager = self._adapter.poolmanager
+        for key in poolmanager.pools.keys():
+            pool = poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            name = '{0}://{1}:{2}'.format(pool.scheme, pool.host, pool.port)
+            pools[name] = {
+                'connections': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle': pool.pool.qsize() if pool.pool else 0,
+            }
+
+        with self._lock:
+            requests_count = self._requests
+
+        return {
+            'requests': requests_count,
+            'connections': sum(p['connections'] for p in pools.values()),
+            'pools': pools,
+        }
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
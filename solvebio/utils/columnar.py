@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar (Apache Arrow) conversion of query results.
+
+Requires: pip install solvebio[arrow]
+"""
+import json
+import logging
+from collections import OrderedDict
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+logger = logging.getLogger('solvebio')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            'Columnar query results require pyarrow. '
+            'Install it with: pip install solvebio[arrow]')
+
+
+def require_pandas():
+    require_pyarrow()
+    if pandas is None:
+        raise ImportError(
+            'DataFrame query results require pandas. '
+            'Install it with: pip install solvebio[arrow]')
+
+
+def arrow_type(data_type, is_list=False):
+    """
+    Returns the Arrow type of a dataset field data type,
+    or None if the type must be inferred from the values.
+    """
+    require_pyarrow()
+    types = {
+        'string': pa.string(),
+        'text': pa.string(),
+        'integer': pa.int64(),
+        'long': pa.int64(),
+        'float': pa.float64(),
+        'double': pa.float64(),
+        'boolean': pa.bool_(),
+        'date': pa.date32(),
+    }
+    _type = types.get(data_type)
+    if _type is not None and is_list:
+        _type = pa.list_(_type)
+    return _type
+
+
+class RecordBatchBuilder(object):
+    """
+    Builds Arrow record batches from pages of result dicts, one
+    column at a time.
+
+    Column types come from the (name, data_type, is_list) `fields`.
+    Columns without a known type (i.e. "auto" or "object" fields,
+    or keys that are not in `fields`) are inferred from the first
+    page, so that all batches have the same schema: columns without
+    any value on the first page are strings (other values are JSON
+    encoded), and keys that are not in the first page are ignored.
+
+    With `fixed_schema=False`, columns are inferred page by page
+    instead (see concat_batches()).
+    """
+
+    def __init__(self, fields=None, fixed_schema=True):
+        require_pyarrow()
+        self._types = OrderedDict()
+        for name, data_type, is_list in fields or []:
+            self._types[name] = arrow_type(data_type, is_list)
+        self._fixed_schema = fixed_schema
+        # The inferred columns (once the schema is fixed)
+        self._inferred = None
+        self._json_columns = set()
+
+    @property
+    def schema_fixed(self):
+        return self._inferred is not None
+
+    def build(self, records):
+        # Add any columns that are not part of the known fields
+        if records:
+            keys = set()
+            for record in records:
+                keys.update(record)
+            keys.difference_update(self._types)
+            if self.schema_fixed and keys:
+                logger.warning(
+                    'Ignoring columns missing from the first page of '
+                    'results: %s', ', '.join(sorted(keys)))
+            else:
+                for key in sorted(keys):
+                    self._types[key] = None
+
+        arrays = []
+        for name, _type in self._types.items():
+            values = [record.get(name) for record in records]
+            if name in self._json_columns:
+                values = [_json_value(v) for v in values]
+            if self.schema_fixed and name in self._inferred:
+                arrays.append(self._cast_array(name, values, _type))
+            else:
+                arrays.append(self._array(values, _type))
+
+        if self._fixed_schema and records and not self.schema_fixed:
+            arrays = self._fix_schema(arrays)
+
+        return pa.RecordBatch.from_arrays(arrays, names=list(self._types))
+
+    def _fix_schema(self, arrays):
+        """Fixes the types of the columns inferred from the first page."""
+        self._inferred = set()
+        for i, (name, _type) in enumerate(list(self._types.items())):
+            if _type is not None:
+                continue
+
+            self._inferred.add(name)
+            if pa.types.is_null(arrays[i].type):
+                self._json_columns.add(name)
+                arrays[i] = arrays[i].cast(pa.string())
+            self._types[name] = arrays[i].type
+        return arrays
+
+    def _cast_array(self, name, values, _type):
+        try:
+            return pa.array(values, type=_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+        # e.g. whole numbers in a column of floats
+        try:
+            return pa.array(values).cast(_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError,
+                pa.ArrowNotImplementedError):
+            raise Exception(
+                'Column \'{0}\' has values that are not of its type ({1}), '
+                'inferred from the first page of results'.format(name, _type))
+
+    @staticmethod
+    def _array(values, _type):
+        if _type is None:
+            return pa.array(values)
+
+        # Dates are returned as ISO 8601 strings
+        if _type == pa.date32():
+            return _parse_dates(pa.array(values, type=pa.string()), _type)
+        if _type == pa.list_(pa.date32()):
+            return _parse_dates(
+                pa.array(values, type=pa.list_(pa.string())), _type)
+
+        return pa.array(values, type=_type)
+
+
+def _json_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True)
+
+
+def _parse_dates(array, _type):
+    try:
+        return array.cast(_type)
+    except pa.ArrowInvalid:
+        # Dates with a time component
+        if pa.types.is_list(_type):
+            timestamps = pa.list_(pa.timestamp('ms'))
+        else:
+            timestamps = pa.timestamp('ms')
+        return array.cast(timestamps).cast(_type)
+
+
+def concat_batches(batches):
+    """
+    Concatenates record batches into a Table, promoting
+    columns whose inferred types differ between pages.
+    """
+    require_pyarrow()
+    tables = [pa.Table.from_batches([batch]) for batch in batches]
+    if not tables:
+        return pa.table({})
+
+    try:
+        return pa.concat_tables(tables, promote_options='permissive')
+    except TypeError:
+        # pyarrow < 14
+        return pa.concat_tables(tables, promote=True)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import collections
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+
+def ordered_map(fn, iterable, workers, ordered=True, max_pending=None,
+                thread_name_prefix='solvebio'):
+    """
+    Yields `fn(item)` for each item of `iterable`, computed concurrently
+    on a pool of `workers` threads.
+
+    Results are yielded in the order of the items (or, with
+    `ordered=False`, as soon as they are computed). The iterable is
+    consumed lazily, and at most `max_pending` items (2 * `workers` by
+    default) are submitted but not yet yielded, which bounds memory.
+    Pending items are cancelled when the generator is closed, and
+    exceptions raised by `fn` are raised when their result is yielded.
+    """
+    if workers < 1:
+        raise Exception('\'workers\' parameter must be >= 1')
+
+    max_pending = max(max_pending or 2 * workers, 1)
+    executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix=thread_name_prefix)
+    pending = collections.deque()
+
+    def _next_done():
+        if ordered:
+            return pending.popleft()
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        pending.remove(future)
+        return future
+
+    try:
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield _next_done().result()
+
+        while pending:
+            yield _next_done().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
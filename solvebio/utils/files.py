@@ -62,3 +62,72 @@ def edp_path(path: str):
     posix_path = pathlib.PurePosixPath('/', *win_path.parts)
     return posix_path.as_posix().removeprefix("/")
 
+
+class FileSlice(object):
+    """
+    A file-like request body of `length` bytes of a file, starting at
+    `offset` (e.g. a part of a multipart upload). The data is read as it
+    is sent, in blocks requested by the HTTP client (or iterated in
+    windows of `buffer_size` bytes), so a body never holds the whole
+    part in memory, and can be rewound to retry a request.
+
+    `path_or_file` is a path, or an open (binary) file, which is
+    shared and left open.
+    """
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, path_or_file, offset, length, buffer_size=BUFFER_SIZE):
+        if hasattr(path_or_file, 'read'):
+            self._file = path_or_file
+            self._owns_file = False
+        else:
+            self._file = open(path_or_file, 'rb')
+            self._owns_file = True
+
+        self.offset = offset
+        self.length = max(0, min(
+            length, os.fstat(self._file.fileno()).st_size - offset))
+        self.buffer_size = buffer_size
+        self._position = 0
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        remaining = self.length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b''
+
+        self._file.seek(self.offset + self._position)
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def __iter__(self):
+        chunk = self.read(self.buffer_size)
+        while chunk:
+            yield chunk
+            chunk = self.read(self.buffer_size)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self._position = max(0, min(offset, self.length))
+        return self._position
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Local evaluation of query filters (see Filter.compile()).
+
+Vectorized masks require: pip install solvebio[arrow]
+"""
+from .columnar import pa, require_pyarrow
+
+try:
+    import pyarrow.compute as pc
+except ImportError:
+    pc = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _values(value):
+    # Filters match any item of list fields
+    return value if isinstance(value, list) else [value]
+
+
+def _compare(op):
+    def matches(value, term):
+        try:
+            return any(v is not None and op(v, term) for v in _values(value))
+        except TypeError:
+            # Values that cannot be compared with the term do not match
+            return False
+    return matches
+
+
+def _exact(value, term):
+    if term is None:
+        return value is None or value == []
+    return any(v == term for v in _values(value))
+
+
+def _in(value, terms):
+    for v in _values(value):
+        if v is None:
+            continue
+        try:
+            if v in terms:
+                return True
+        except TypeError:
+            # Unhashable values (i.e. objects) are compared one by one
+            if any(v == t for t in terms):
+                return True
+    return False
+
+
+def _prefix(value, term):
+    return any(isinstance(v, str) and v.startswith(term)
+               for v in _values(value))
+
+
+def _contains(value, term):
+    return any(isinstance(v, str) and term in v for v in _values(value))
+
+
+# The Python implementation of each filter operator
+OPERATORS = {
+    'exact': _exact,
+    'in': _in,
+    'gt': _compare(lambda v, t: v > t),
+    'gte': _compare(lambda v, t: v >= t),
+    'lt': _compare(lambda v, t: v < t),
+    'lte': _compare(lambda v, t: v <= t),
+    'range': _compare(lambda v, t: t[0] <= v <= t[1]),
+    'between': _compare(lambda v, t: t[0] < v < t[1]),
+    'prefix': _prefix,
+    'contains': _contains,
+}
+
+
+def get_path(record, field):
+    """Returns the value of a (dotted) field in a record."""
+    value = record
+    for part in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def parse_filters(filters):
+    """
+    Returns the tree of a Filter (or a list of filters, as processed by
+    Query._process_filters()), as nested tuples:
+
+        ('and', [nodes]), ('or', [nodes]), ('not', node)
+        or ('term', field, operator, value)
+    """
+    from ..query import QueryBase
+
+    filters = QueryBase._process_filters(
+        filters if isinstance(filters, list) else [filters])
+    return _parse_list(filters)
+
+
+def _parse_list(filters):
+    nodes = [_parse(f) for f in filters]
+    return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+
+def _parse(f):
+    if isinstance(f, dict):
+        (conn, value), = f.items()
+        if conn == 'not':
+            if isinstance(value, (list, tuple)) and value and \
+                    not isinstance(value[0], str):
+                return ('not', _parse_list(value))
+            return ('not', _parse(value))
+        if conn not in ('and', 'or'):
+            raise Exception('Unsupported filter connector: {0}'.format(conn))
+        return (conn, [_parse(v) for v in value])
+
+    key, value = f
+    field, op = key, 'exact'
+    if '__' in key:
+        field, op = key.rsplit('__', 1)
+        if op not in OPERATORS:
+            raise Exception('Unsupported filter operator: {0}'.format(op))
+    if op in ('range', 'between') and len(value) != 2:
+        raise Exception('\'{0}\' filters require [start, end]'.format(op))
+    if op == 'in':
+        value = list(value)
+    return ('term', field, op, value)
+
+
+class CompiledFilter(object):
+    """
+    A filter compiled for local evaluation, as a Python predicate
+    on records:
+
+        f = (Filter(gene='BRCA2') & GenomicFilter('chr13', 32315474)).compile()
+        f({'gene': 'BRCA2', ...})  # True or False
+        matching = list(f.filter(records))
+
+    or as a vectorized mask of an Arrow Table/RecordBatch (or of a pandas
+    DataFrame or dict of NumPy arrays, as a NumPy array):
+
+        table.filter(f.mask(table))
+
+    Semantics follow the API: terms match any item of list fields,
+    comparisons never match missing (None) values, and `field=None`
+    matches missing values.
+    """
+
+    def __init__(self, filters):
+        self.tree = parse_filters(filters)
+        self._predicate = self._compile(self.tree)
+
+    def __repr__(self):
+        return '<CompiledFilter {0}>'.format(self.tree)
+
+    def __call__(self, record):
+        return self._predicate(record)
+
+    def filter(self, records):
+        """Returns the records that match the filter (lazily)."""
+        return (record for record in records if self._predicate(record))
+
+    def _compile(self, node):
+        kind = node[0]
+        if kind == 'and':
+            predicates = [self._compile(n) for n in node[1]]
+            return lambda r: all(p(r) for p in predicates)
+        if kind == 'or':
+            predicates = [self._compile(n) for n in node[1]]
+            return lambda r: any(p(r) for p in predicates)
+        if kind == 'not':
+            predicate = self._compile(node[1])
+            return lambda r: not predicate(r)
+
+        _, field, op, term = node
+        match = OPERATORS[op]
+        if op == 'in':
+            try:
+                term = frozenset(term)
+            except TypeError:
+                pass
+        return lambda r: match(get_path(r, field), term)
+
+    def mask(self, data):
+        """
+        Returns the boolean mask of the rows of `data` that match.
+
+        `data` may be an Arrow Table or RecordBatch (returns a pyarrow
+        BooleanArray), or a pandas DataFrame or dict of columns (returns
+        a NumPy array). Nested fields are read from struct columns or
+        from flattened ("a.b") column names.
+        """
+        require_pyarrow()
+        if isinstance(data, (pa.Table, pa.RecordBatch)):
+            return self._mask(self.tree, data)
+
+        if isinstance(data, dict):
+            # NaN values are missing (as in pandas)
+            table = pa.table(dict(
+                (name, pa.array(values, from_pandas=True))
+                for name, values in data.items()))
+        else:
+            table = pa.Table.from_pandas(data, preserve_index=False)
+        return self._mask(self.tree, table).to_numpy(zero_copy_only=False)
+
+    def _mask(self, node, table):
+        kind = node[0]
+        if kind in ('and', 'or'):
+            combine = pc.and_ if kind == 'and' else pc.or_
+            masks = [self._mask(n, table) for n in node[1]]
+            if not masks:
+                # As all() and any() of no predicates
+                return pa.array([kind == 'and'] * table.num_rows,
+                                type=pa.bool_())
+            mask = masks[0]
+            for other in masks[1:]:
+                mask = combine(mask, other)
+            return mask
+        if kind == 'not':
+            return pc.invert(self._mask(node[1], table))
+
+        _, field, op, term = node
+        column = _column(table, field)
+        if column is None:
+            # Missing fields only match `field=None`
+            matches = op == 'exact' and term is None
+            return pa.array([matches] * table.num_rows, type=pa.bool_())
+
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+
+        if pa.types.is_list(column.type) or \
+                pa.types.is_large_list(column.type):
+            return _list_mask(column, op, term)
+        return _array_mask(column, op, term)
+
+
+def _column(table, field):
+    """Returns the (possibly nested) column of a field, or None."""
+    names = table.schema.names
+    if field in names:
+        return table.column(field)
+
+    parts = field.split('.')
+    for i in range(len(parts) - 1, 0, -1):
+        name = '.'.join(parts[:i])
+        if name not in names:
+            continue
+
+        column = table.column(name)
+        for part in parts[i:]:
+            if not pa.types.is_struct(column.type) or \
+                    column.type.get_field_index(part) < 0:
+                return None
+            column = pc.struct_field(column, [part])
+        return column
+
+    return None
+
+
+def _list_mask(column, op, term):
+    """Matches any item of each list (empty lists are missing values)."""
+    if op == 'exact' and term is None:
+        return pc.fill_null(pc.equal(pc.list_value_length(column), 0), True)
+
+    items = pc.list_flatten(column)
+    parents = pc.list_parent_indices(column).to_numpy()
+    item_mask = _array_mask(items, op, term).to_numpy(zero_copy_only=False)
+
+    mask = numpy.zeros(len(column), dtype=bool)
+    numpy.logical_or.at(mask, parents[item_mask], True)
+    return pa.array(mask)
+
+
+def _array_mask(array, op, term):
+    if op == 'exact' and term is None:
+        return pc.is_null(array)
+
+    try:
+        mask = _compare_array(array, op, term)
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid,
+            pa.ArrowTypeError):
+        # Values that cannot be compared with the term do not match
+        mask = pa.array([False] * len(array), type=pa.bool_())
+
+    # Comparisons never match missing values
+    return pc.fill_null(mask, False)
+
+
+def _compare_array(array, op, term):
+    if pa.types.is_null(array.type):
+        return pa.array([False] * len(array), type=pa.bool_())
+
+    if op == 'exact':
+        mask = pc.equal(array, _scalar(term, array.type))
+    elif op == 'in':
+        values = pa.array(term)
+        if values.type != array.type:
+            values = values.cast(array.type)
+        mask = pc.is_in(array, value_set=values)
+    elif op in ('gt', 'gte', 'lt', 'lte'):
+        compare = {'gt': pc.greater, 'gte': pc.greater_equal,
+                   'lt': pc.less, 'lte': pc.less_equal}[op]
+        mask = compare(array, _scalar(term, array.type))
+    elif op in ('range', 'between'):
+        low, high = (pc.greater_equal, pc.less_equal) if op == 'range' \
+            else (pc.greater, pc.less)
+        mask = pc.and_(low(array, _scalar(term[0], array.type)),
+                       high(array, _scalar(term[1], array.type)))
+    elif not (pa.types.is_string(array.type) or
+              pa.types.is_large_string(array.type)):
+        # Prefix and substring filters only match strings
+        mask = pa.array([False] * len(array), type=pa.bool_())
+    elif op == 'prefix':
+        mask = pc.starts_with(array, pattern=term)
+    else:
+        mask = pc.match_substring(array, pattern=term)
+    return mask
+
+
+def _scalar(value, _type):
+    try:
+        return pa.scalar(value, type=_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        return pa.scalar(value)
@@ -1,39 +1,233 @@
 import os
 import hashlib
-import binascii
+import mmap
+from concurrent.futures import ThreadPoolExecutor
 
 # Default thresholds for multipart S3 files
 MULTIPART_THRESHOLD = 64 * 1024 * 1024
 MULTIPART_CHUNKSIZE = 64 * 1024 * 1024
+# Default number of threads that hash the blocks of multipart files
+MD5_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _cache_params(filesize, multipart_threshold, multipart_chunksize):
+    # Single-part checksums do not depend on the multipart parameters
+    if multipart_threshold and filesize > multipart_threshold:
+        return ['multipart', multipart_chunksize]
+    return None
+
+
+def _get_cache(cache):
+    if cache is True:
+        from solvebio.cache import ChecksumCache
+        return ChecksumCache.default()
+    if cache is False:
+        return None
+    return cache
 
 
 def md5sum(path, multipart_threshold=MULTIPART_THRESHOLD,
-           multipart_chunksize=MULTIPART_CHUNKSIZE):
+           multipart_chunksize=MULTIPART_CHUNKSIZE, cache=None,
+           workers=None):
+    """
+    Returns the (hex digest, block_count) MD5 checksum of a file. Files
+    larger than `multipart_threshold` get the S3-style multipart checksum
+    of their `multipart_chunksize` blocks; block_count is None otherwise.
+
+    The blocks of multipart checksums are hashed concurrently by up to
+    `workers` threads (MD5_WORKERS by default), from a memory map of the
+    file. Single-part checksums are computed with a plain read loop.
+
+    With `cache` (a ChecksumCache, or True for the default one), the
+    checksum is only computed again when the file changes.
+    """
+    cache = _get_cache(cache)
+    stat = os.stat(path)
+    params = _cache_params(stat.st_size, multipart_threshold,
+                           multipart_chunksize)
+    if cache is not None:
+        checksum = cache.get(path, params)
+        if checksum is not None:
+            return checksum
+
+    workers = MD5_WORKERS if workers is None else workers
+    if workers < 1:
+        raise Exception('\'workers\' parameter must be >= 1')
+
+    if params is None:
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in _read_blocks(f, multipart_chunksize):
+                md5.update(block)
+        checksum = md5.hexdigest(), None
+    elif workers > 1:
+        checksum = _multipart_md5sum(path, multipart_chunksize, workers)
+    else:
+        with open(path, "rb") as f:
+            digests = [hashlib.md5(block).digest()
+                       for block in _read_blocks(f, multipart_chunksize)]
+        checksum = hashlib.md5(b''.join(digests)).hexdigest(), len(digests)
+
+    # Files modified while they are hashed are not cached
+    if cache is not None and cache.file_key(path) == cache.file_key(
+            path, stat):
+        cache.set(path, checksum, params, stat=stat)
+
+    return checksum
+
+
+def _read_blocks(f, block_size):
+    block = f.read(block_size)
+    while block:
+        yield block
+        block = f.read(block_size)
+
+
+def _multipart_md5sum(path, multipart_chunksize, workers):
+    """
+    Hashes the blocks of a file concurrently (hashlib releases the GIL),
+    from zero-copy views of a memory map of the file.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        view = memoryview(mm)
+        try:
+            def _block_digest(start):
+                block = view[start:start + multipart_chunksize]
+                try:
+                    return hashlib.md5(block).digest()
+                finally:
+                    block.release()
+
+            with ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix='solvebio-md5sum') as executor:
+                digests = list(executor.map(
+                    _block_digest,
+                    range(0, len(mm), multipart_chunksize)))
+        finally:
+            view.release()
+    finally:
+        mm.close()
+
+    md5 = hashlib.md5(b''.join(digests))
+    return md5.hexdigest(), len(digests)
 
-    def _read_chunks(f, chunk_size):
-        chunk = f.read(chunk_size)
+
+class MD5Hasher(object):
+    """
+    Computes the MD5 checksum of a stream as it is read or written
+    (e.g. while a file is uploaded or downloaded). With `multipart=True`,
+    the S3-style multipart checksum of `multipart_chunksize` blocks is
+    also computed (which hashes the data twice). See md5sum().
+    """
+
+    def __init__(self, multipart_chunksize=MULTIPART_CHUNKSIZE,
+                 multipart=False):
+        self.multipart_chunksize = multipart_chunksize
+        self.multipart = multipart
+        self.size = 0
+        self._md5 = hashlib.md5()
+        self._block = hashlib.md5()
+        self._block_size = 0
+        self._block_digests = []
+
+    def update(self, data):
+        data = memoryview(data)
+        self._md5.update(data)
+        self.size += len(data)
+        if not self.multipart:
+            return
+
+        while len(data):
+            n = min(len(data), self.multipart_chunksize - self._block_size)
+            self._block.update(data[:n])
+            self._block_size += n
+            data = data[n:]
+            if self._block_size == self.multipart_chunksize:
+                self._block_digests.append(self._block.digest())
+                self._block = hashlib.md5()
+                self._block_size = 0
+
+    def hexdigest(self):
+        """Returns the (single-part) MD5 of the data."""
+        return self._md5.hexdigest()
+
+    def checksum(self, multipart_threshold=MULTIPART_THRESHOLD):
+        """Returns the (hex digest, block_count) of the data, as md5sum()."""
+        if not (multipart_threshold and self.size > multipart_threshold):
+            return self.hexdigest(), None
+        if not self.multipart:
+            raise Exception('Multipart checksums require '
+                            'MD5Hasher(multipart=True)')
+
+        digests = list(self._block_digests)
+        if self._block_size:
+            digests.append(self._block.digest())
+        md5 = hashlib.md5(b''.join(digests))
+        return md5.hexdigest(), len(digests)
+
+    def cache(self, path, cache=True,
+              multipart_threshold=MULTIPART_THRESHOLD, stat=None):
+        """
+        Caches the checksums of the file at `path`, which must
+        contain the hashed data.
+        """
+        cache = _get_cache(cache)
+        if cache is None:
+            return
+
+        stat = stat or os.stat(path)
+        if stat.st_size != self.size:
+            return
+
+        cache.set(path, (self.hexdigest(), None), None, stat=stat)
+        params = _cache_params(self.size, multipart_threshold,
+                               self.multipart_chunksize)
+        if params is not None and self.multipart:
+            cache.set(path, self.checksum(multipart_threshold), params,
+                      stat=stat)
+
+
+class HashingReader(object):
+    """
+    A file-like request body that hashes (with an MD5Hasher)
+    the data of a file as it is sent.
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, fileobj, hasher=None):
+        self._fileobj = fileobj
+        self.hasher = hasher or MD5Hasher()
+        self._size = os.fstat(fileobj.fileno()).st_size
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+    def __iter__(self):
+        chunk = self.read(self.CHUNK_SIZE)
         while chunk:
             yield chunk
-            chunk = f.read(chunk_size)
+            chunk = self.read(self.CHUNK_SIZE)
 
-    filesize = os.path.getsize(path)
+    def tell(self):
+        return self._fileobj.tell()
 
-    with open(path, "rb") as f:
-        if multipart_threshold and filesize > multipart_threshold:
-            block_count = 0
-            md5string = ""
-            for block in _read_chunks(f, multipart_chunksize):
-                md5 = hashlib.md5()
-                md5.update(block)
-                md5string += md5.hexdigest()
-                block_count += 1
-
-            md5 = hashlib.md5()
-            md5.update(binascii.unhexlify(md5string))
-        else:
-            block_count = None
-            md5 = hashlib.md5()
-            for block in _read_chunks(f, multipart_chunksize):
-                md5.update(block)
+    def seek(self, offset, whence=os.SEEK_SET):
+        # Rewinding (e.g. to retry a request) restarts the checksum
+        if offset != 0 or whence != os.SEEK_SET:
+            raise IOError('HashingReader can only be rewound')
+        self._fileobj.seek(0)
+        self.hasher = MD5Hasher(self.hasher.multipart_chunksize,
+                                multipart=self.hasher.multipart)
+        return 0
 
-    return md5.hexdigest(), block_count
+    def close(self):
+        self._fileobj.close()